@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Deterministic generators of extreme .osu and .osr inputs."""
+import math
+import random
+from array import array
+from itertools import accumulate
+from osupyparser import ReplayFile
+from osupyparser import ReplayFrames
+from osupyparser.judgement import Judge
+from osupyparser.osu.mods import PLAYFIELD_HEIGHT
+from osupyparser.judgement import SPINNER_CENTRE
+from osupyparser.osu.constants import Mods
+from osupyparser.osu.constants import ObjectType
+
+# Frame interval of a 60Hz replay, in ms.
+FRAME_INTERVAL = 16
+TWO_HOURS = 2 * 60 * 60 * 1000
+
+BEATMAP_HEADER = """osu file format v14
+
+[General]
+AudioFilename: audio.mp3
+AudioLeadIn: 0
+PreviewTime: -1
+Countdown: 0
+SampleSet: Soft
+StackLeniency: 0.7
+Mode: 0
+LetterboxInBreaks: 0
+WidescreenStoryboard: 0
+
+[Editor]
+DistanceSpacing: 1.2
+BeatDivisor: 4
+GridSize: 4
+TimelineZoom: 1
+
+[Metadata]
+Title:Benchmark
+TitleUnicode:Benchmark
+Artist:osupyparser
+ArtistUnicode:osupyparser
+Creator:generator
+Version:{version}
+Source:
+Tags:benchmark generated
+BeatmapID:0
+BeatmapSetID:-1
+
+[Difficulty]
+HPDrainRate:5
+CircleSize:4
+OverallDifficulty:8
+ApproachRate:9
+SliderMultiplier:1.4
+SliderTickRate:1
+
+[Events]
+//Background and Video events
+0,0,"bg.jpg",0,0
+//Break Periods
+//Storyboard Layer 0 (Background)
+
+"""
+
+
+def generate_beatmap(
+    objects: int = 10000,
+    sv_points: int = 2000,
+    slider_ratio: float = 0.3,
+    seed: int = 0,
+) -> bytes:
+    """Builds .osu data with given amount of hit objects and SV timing points.
+
+    `slider_ratio` of objects are sliders (bezier, perfect and linear, some
+    with repeats), a few are spinners, the rest circles.
+    """
+    rng = random.Random(seed)
+    beat_length = 60000 / 180
+    step = int(beat_length / 2)
+    end_time = 1000 + objects * step
+
+    lines = [BEATMAP_HEADER.format(version=f"{objects} objects, {sv_points} sv"), "[TimingPoints]\n"]
+    lines.append(f"1000,{beat_length},4,2,0,60,1,0\n")
+    for i in range(sv_points):
+        offset = 1000 + (end_time - 1000) * (i + 1) // (sv_points + 1)
+        sv = rng.choice((0.5, 0.75, 1.0, 1.25, 1.5, 2.0))
+        lines.append(f"{offset},{-100 / sv},4,2,0,60,0,{i % 2}\n")
+
+    lines.append("\n[HitObjects]\n")
+    time = 1000
+    for i in range(objects):
+        x, y = rng.randrange(512), rng.randrange(384)
+        new_combo = 4 if i % 8 == 0 else 0
+        roll = rng.random()
+        if roll < slider_ratio:
+            kind = rng.randrange(3)
+            if kind == 0:
+                points = "B|" + "|".join(
+                    f"{rng.randrange(512)}:{rng.randrange(384)}" for _ in range(rng.randrange(2, 6)))
+            elif kind == 1:
+                points = f"P|{min(511, x + 40)}:{min(383, y + 40)}|{min(511, x + 80)}:{y}"
+            else:
+                points = f"L|{rng.randrange(512)}:{rng.randrange(384)}"
+            repeats = rng.choice((1, 1, 1, 2, 3))
+            length = rng.choice((70, 140, 210, 280))
+            edges = "|".join("2" for _ in range(repeats + 1))
+            additions = "|".join("0:0" for _ in range(repeats + 1))
+            lines.append(
+                f"{x},{y},{time},{2 | new_combo},0,{points},{repeats},{length},{edges},{additions},0:0:0:0:\n")
+        elif roll > 0.998:
+            lines.append(f"256,192,{time},{8 | new_combo},0,{time + step * 4},0:0:0:0:\n")
+            time += step * 4
+        else:
+            lines.append(f"{x},{y},{time},{1 | new_combo},0,0:0:0:0:\n")
+        time += step
+
+    return "".join(lines).encode("utf-8")
+
+
+def generate_frames(mode: int, duration: int = TWO_HOURS, seed: int = 0) -> ReplayFrames:
+    """Builds replay frames of given mode covering `duration` ms."""
+    rng = random.Random(seed)
+    count = duration // FRAME_INTERVAL
+    deltas = array("i", [FRAME_INTERVAL]) * count
+
+    if mode == 0:
+        xs = array("d", (round(rng.uniform(0, 512), 4) for _ in range(count)))
+        ys = array("d", (round(rng.uniform(0, 384), 4) for _ in range(count)))
+        keys = array("i", (rng.choice((0, 0, 1, 2, 5, 10)) for _ in range(count)))
+    elif mode == 1:
+        xs = array("d", (320.0 for _ in range(count)))
+        ys = array("d", (0.0 for _ in range(count)))
+        keys = array("i", (rng.choice((0, 0, 1, 2, 4, 8)) for _ in range(count)))
+    elif mode == 2:
+        xs = array("d", (round(rng.uniform(0, 512), 4) for _ in range(count)))
+        ys = array("d", (0.0 for _ in range(count)))
+        keys = array("i", (rng.choice((0, 0, 1)) for _ in range(count)))
+    else:
+        # Mania keeps pressed columns as bitmask in x.
+        xs = array("d", (float(rng.randrange(128)) for _ in range(count)))
+        ys = array("d", (0.0 for _ in range(count)))
+        keys = array("i", (0 for _ in range(count)))
+
+    return ReplayFrames.from_columns(mode, {
+        "delta": deltas,
+        "x": xs,
+        "y": ys,
+        "keys": keys,
+        "time": array("q", accumulate(deltas)),
+    }, seed)
+
+
+def generate_replay(mode: int = 0, duration: int = TWO_HOURS, seed: int = 0) -> bytes:
+    """Builds .osr data of given mode with frames covering `duration` ms."""
+    replay = ReplayFile()
+    replay.mode = mode
+    replay.osu_version = 20210809
+    replay.map_md5 = f"{seed:032x}"
+    replay.player_name = "benchmark"
+    replay.replay_md5 = f"{seed + 1:032x}"
+    replay.n300 = duration // 500
+    replay.score = 1000000
+    replay.max_combo = duration // 500
+    replay.life_graph = ",".join(f"{time}|1" for time in range(0, duration, 60000)) + ","
+    replay.timestamp = 637654321000000000
+    replay.score_id = seed
+    replay.seed = seed
+    replay.frames = generate_frames(mode, duration, seed)
+    return replay.to_bytes()
+
+
+def generate_autoplay(beatmap, mods: int = 0, offset: int = 0) -> ReplayFile:
+    """Builds osu!standard replay hitting every object of beatmap perfectly.
+
+    Objects are assumed not to overlap in time, keys alternate between K1
+    and K2 so every object gets a fresh press. All frames are played
+    `offset` ms late (early if negative).
+    """
+    store = Judge(beatmap).store
+    events = beatmap.slider_events
+    flip = bool(mods & Mods.HARDROCK)
+    stacking = beatmap.calculate_stacking(mods)
+    # (time, x, y, stack shift, keys), sorted at the end.
+    points = []
+    key = 10
+    for i in range(len(store)):
+        kind, start, end = store.kind[i], store.start_time[i], store.end_time[i]
+        key = 5 if key == 10 else 10
+        # Stacking shift, applied after HR flip.
+        shift = stacking.heights[i] * stacking.offset
+        if kind == ObjectType.CIRCLE:
+            x, y = store.x[i], store.y[i]
+            points.append((start, x, y, shift, key))
+        elif kind == ObjectType.SLIDER:
+            path = beatmap.slider_paths.paths[i]
+            times = set(range(start, end, FRAME_INTERVAL))
+            times.update(events.time[event] for event in events.events_of(i))
+            for time in sorted(times):
+                progress = (time - start) / store.duration[i] if store.duration[i] else 1.0
+                x, y = path.position_along(progress, store.repeat_count[i])
+                points.append((time, x, y, shift, key))
+        elif kind == ObjectType.SPINNER:
+            for n, time in enumerate(range(start, end, FRAME_INTERVAL)):
+                x = SPINNER_CENTRE[0] + 50.0 * math.cos(n * 0.5)
+                y = SPINNER_CENTRE[1] + 50.0 * math.sin(n * 0.5)
+                points.append((time, x, y, 0.0, key))
+        else:
+            continue
+
+        points.append((end + 1, x, y, shift, 0))
+
+    points.sort(key=lambda point: point[0])
+    times = array("q", (int(point[0]) + offset for point in points))
+
+    replay = ReplayFile()
+    replay.mode = 0
+    replay.mods = mods
+    replay.osu_version = 20210809
+    replay.map_md5 = beatmap.md5
+    replay.player_name = "autoplay"
+    replay.frames = ReplayFrames.from_columns(0, {
+        "delta": array("i", (b - a for a, b in zip([0] + list(times), times))),
+        "x": array("d", (point[1] + point[3] for point in points)),
+        "y": array("d", ((PLAYFIELD_HEIGHT - point[2] if flip else point[2]) + point[3] for point in points)),
+        "keys": array("i", (point[4] for point in points)),
+        "time": times,
+    })
+    return replay
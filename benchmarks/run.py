@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Runs parser benchmarks on generated inputs and writes JSON results.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick  # Smaller inputs, for a fast check.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+from typing import Dict
+from typing import List
+from osupyparser import OsuFile
+from osupyparser import ReplayFile
+from osupyparser import Judge
+from .generators import generate_autoplay
+from .generators import generate_beatmap
+from .generators import generate_replay
+from .generators import TWO_HOURS
+
+# Bumped when result fields or cases change meaning.
+RESULTS_VERSION = 1
+
+# Name -> generate_beatmap arguments.
+BEATMAP_CASES = {
+    "objects-10k": {"objects": 10000, "sv_points": 2000},
+    "sv-heavy": {"objects": 10000, "sv_points": 10000},
+    "slider-heavy": {"objects": 10000, "sv_points": 2000, "slider_ratio": 0.9},
+}
+REPLAY_MODES = {0: "osu", 1: "taiko", 2: "catch", 3: "mania"}
+HEADER_SECTIONS = ("General", "Metadata", "Difficulty")
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Times func, then reruns it under tracemalloc for memory figures.
+
+    `retained_*` cover memory still held by the returned object.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        result = func()
+        retained, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "best_s": min(timings),
+        "mean_s": sum(timings) / len(timings),
+        "peak_bytes": peak,
+        "retained_bytes": retained,
+        "retained_blocks": blocks,
+    }
+
+
+def record(results: List[dict], case: str, function: str, data_size: int, items: int, figures: Dict[str, float]) -> None:
+    figures.update(
+        case=case,
+        function=function,
+        input_bytes=data_size,
+        items=items,
+        mb_per_s=data_size / figures["best_s"] / 1e6,
+        items_per_s=items / figures["best_s"],
+    )
+    results.append(figures)
+    print(
+        f"{case:<16} {function:<18} {figures['best_s'] * 1000:>9.1f}ms "
+        f"{figures['mb_per_s']:>8.1f}MB/s {figures['peak_bytes'] / 1e6:>8.1f}MB peak",
+        file=sys.stderr,
+    )
+
+
+def bench_beatmaps(directory: str, scale: float, repeat: int) -> List[dict]:
+    results = []
+    for case, arguments in BEATMAP_CASES.items():
+        arguments = {key: int(value * scale) if key != "slider_ratio" else value for key, value in arguments.items()}
+        data = generate_beatmap(**arguments)
+        path = os.path.join(directory, f"{case}.osu")
+        with open(path, "wb") as stream:
+            stream.write(data)
+
+        objects = arguments["objects"]
+        record(results, case, "parse_file", len(data), objects,
+               measure(lambda: OsuFile(path).parse_file(), repeat))
+        record(results, case, "parse_file_compact", len(data), objects,
+               measure(lambda: OsuFile(path).parse_file(compact=True), repeat))
+        record(results, case, "header", len(data), 1,
+               measure(lambda: OsuFile(path).parse_file(sections=HEADER_SECTIONS), repeat))
+
+        beatmap = OsuFile(path).parse_file()
+        replay = generate_autoplay(beatmap)
+        record(results, case, "judge", len(data), objects,
+               measure(lambda: Judge(beatmap).judge(replay), repeat))
+
+    return results
+
+
+def bench_replays(directory: str, duration: int, repeat: int) -> List[dict]:
+    results = []
+    for mode, name in REPLAY_MODES.items():
+        data = generate_replay(mode, duration)
+        case = f"replay-{name}"
+        path = os.path.join(directory, f"{case}.osr")
+        with open(path, "wb") as stream:
+            stream.write(data)
+
+        frames = duration // 16
+        record(results, case, "parse_data", len(data), frames,
+               measure(lambda: ReplayFile.from_bytes(data), repeat))
+        record(results, case, "from_file", len(data), frames,
+               measure(lambda: ReplayFile.from_file(path), repeat))
+        record(results, case, "header", len(data), 1,
+               measure(lambda: ReplayFile.from_bytes(data, frames="skip"), repeat))
+
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="JSON results path, printed to stdout if not given.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case, best one is reported.")
+    parser.add_argument("--quick", action="store_true", help="Use 10x smaller inputs.")
+    args = parser.parse_args(argv)
+
+    scale = 0.1 if args.quick else 1.0
+    with tempfile.TemporaryDirectory() as directory:
+        results = bench_beatmaps(directory, scale, args.repeat)
+        results += bench_replays(directory, int(TWO_HOURS * scale), args.repeat)
+
+    report = json.dumps({
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            stream.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,26 @@
 from .osu.osu_parser import OsuFile
+from .osu.timing import TimingTimeline
+from .osu.store import HitObjectStore
+from .osu.curves import SliderPath
+from .osu.curves import SliderPaths
+from .osu.slider_events import SliderEvents
+from .osu.cache import BeatmapCache
+from .osu.index import BeatmapIndex
+from .osu.constants import Mods
+from .osu.mods import ModdedBeatmap
+from .osu.mods import mod_variants
+from .osu.difficulty import DifficultyCalculator
+from .osu.performance import calculate_pp_many
 from .osr.osr_parser import ReplayFile
+from .osr.frames import ReplayFrames
+from .osr.timeline import ReplayTimeline
+from .osr.keys import KeyIntervals
+from .osr.batch import parse_many
+from .osr.batch import parse_many_async
+from .judgement import Judge
+from .judgement import judge_replay
+from .profiler import ParseObserver
+from .profiler import ParseProfiler
 from .osr.constants import OsuReplayFrame
 from .osr.constants import TaikoReplayFrame
 from .osr.constants import ManiaReplayFrame
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Helpers for the asyncio API, work is moved off the event loop."""
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Callable
+from typing import Optional
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+def read_file(file_path: str) -> bytes:
+    """Reads whole file."""
+    with open(file_path, "rb") as stream:
+        return stream.read()
+
+
+async def read_file_async(file_path: str) -> bytes:
+    """Reads whole file in the loop's default thread pool."""
+    return await run_in_executor(None, read_file, file_path)
+
+
+async def run_in_executor(executor: Optional[Executor], func: Callable[..., T], *args, **kwargs) -> T:
+    """Runs func in executor (loop's default one if None) and awaits result.
+
+    With a process pool, func and arguments must be picklable.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
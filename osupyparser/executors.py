@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""Executor kinds shared by batch replay parsing and beatmap indexing."""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+# Executor name -> executor class, for `executor` arguments given as str.
+EXECUTORS = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""Re-judges osu!standard replays against their beatmap.
+
+Frames are turned into button press events using absolute frame times,
+each press is matched to the first unjudged circle or slider head by a
+binary search over object start times. Frame times and skipped frames
+come from the replay's ReplayTimeline. Slider ticks, repeats and tails
+check the cursor state at their time, spinners sum up cursor rotation.
+
+Objects are hit tested at their stacked positions. This is an
+approximation of the game: notelock is simplified to "a press may only
+hit the earliest unjudged object" and spinners use lazer's rotation
+requirement.
+"""
+import math
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import List
+from typing import Tuple
+from .osu.constants import Mods
+from .osu.constants import ObjectType
+from .osu.mods import apply_mods
+from .osu.mods import PLAYFIELD_HEIGHT
+from .osu.store import HitObjectStore
+from .osu.slider_events import HEAD
+from .osu.slider_events import TAIL
+from .osr.timeline import ReplayTimeline
+
+# Key bits of osu!standard frames, keyboard keys also set the mouse bit.
+LEFT_BUTTONS = 1 | 4
+RIGHT_BUTTONS = 2 | 8
+BUTTONS = LEFT_BUTTONS | RIGHT_BUTTONS
+
+# Judgement values stored per object, MISS for objects never hit.
+MISS = 0
+HIT_50 = 50
+HIT_100 = 100
+HIT_300 = 300
+
+SPINNER_CENTRE = (256.0, 192.0)
+# Follow circle radius relative to hit circle radius.
+FOLLOW_RADIUS_SCALE = 2.4
+
+
+@dataclass
+class JudgementResult:
+    """Hit counts recomputed from replay frames."""
+    n300: int = 0
+    n100: int = 0
+    n50: int = 0
+    nmiss: int = 0
+    max_combo: int = 0
+    # Per hit object: MISS/HIT_50/HIT_100/HIT_300.
+    judgements: array = field(default_factory=lambda: array("H"))
+    # Per hit object: press time minus object time, 0 for objects not hit by a press.
+    hit_errors: array = field(default_factory=lambda: array("i"))
+
+    def mismatches(self, replay) -> Dict[str, Tuple[int, int]]:
+        """Fields differing from those stored in replay, as (replay, judged)."""
+        fields = {
+            "n300": replay.n300,
+            "n100": replay.n100,
+            "n50": replay.n50,
+            "nmiss": replay.nmiss,
+            "max_combo": replay.max_combo,
+        }
+        return {
+            name: (stored, getattr(self, name))
+            for name, stored in fields.items() if stored != getattr(self, name)
+        }
+
+
+def hit_windows(od: float) -> Tuple[float, float, float]:
+    """300, 100 and 50 hit windows (ms, either side) of OD."""
+    return 80.0 - 6.0 * od, 140.0 - 8.0 * od, 200.0 - 10.0 * od
+
+
+def circle_radius(cs: float) -> float:
+    """Hit circle radius in osu!pixels of CS."""
+    return 54.4 - 4.48 * cs
+
+
+def spinner_rotations_needed(od: float, duration: float) -> int:
+    """Full spins needed to clear spinner of given duration (ms)."""
+    if od > 5.0:
+        rps = 2.5 + (3.75 - 2.5) * (od - 5.0) / 5.0
+    else:
+        rps = 2.5 - (2.5 - 1.5) * (5.0 - od) / 5.0
+
+    return int(duration / 1000.0 * rps)
+
+
+def press_events(timeline: ReplayTimeline) -> Tuple[array, array, array]:
+    """Times and cursor positions of button presses in osu!standard frames.
+
+    A frame presses every button which was up in previous kept frame, so
+    pressing both buttons at once yields two events.
+    """
+    frames = timeline.frames
+    times, xs, ys = array("q"), array("d"), array("d")
+    previous = 0
+    for i in timeline.indices:
+        keys = frames.keys[i]
+        pressed = keys & ~previous
+        if pressed & LEFT_BUTTONS:
+            times.append(frames.time[i])
+            xs.append(frames.x[i])
+            ys.append(frames.y[i])
+        if pressed & RIGHT_BUTTONS:
+            times.append(frames.time[i])
+            xs.append(frames.x[i])
+            ys.append(frames.y[i])
+        previous = keys
+
+    return times, xs, ys
+
+
+class Judge:
+    """Judges replays of one beatmap, the beatmap columns are read once."""
+
+    def __init__(self, beatmap) -> None:
+        if beatmap.mode != 0:
+            raise ValueError(f"Judgement is only implemented for osu!standard! Excepted mode: 0, got {beatmap.mode}")
+
+        self.beatmap = beatmap
+        self.store: HitObjectStore = beatmap.hit_object_store or HitObjectStore.from_objects(beatmap.hit_objects)
+        # Circles and slider heads, in hit order.
+        self.hittable: List[int] = [
+            i for i in range(len(self.store)) if self.store.kind[i] in (ObjectType.CIRCLE, ObjectType.SLIDER)
+        ]
+        self.hittable_starts: List[int] = [self.store.start_time[i] for i in self.hittable]
+        self.events = beatmap.slider_events
+
+    def judge(self, replay) -> JudgementResult:
+        """Recomputes hit counts and max combo of replay."""
+        if replay.mode != 0:
+            raise ValueError(f"Judgement is only implemented for osu!standard! Excepted mode: 0, got {replay.mode}")
+
+        beatmap, store = self.beatmap, self.store
+        # Frames are in map time already, speed mods only change windows in real time.
+        stats = apply_mods(replay.mods & (Mods.HARDROCK | Mods.EASY), beatmap.ar, beatmap.od, beatmap.cs, beatmap.hp)
+        w300, w100, w50 = hit_windows(stats.od)
+        radius = circle_radius(stats.cs)
+        flip = bool(replay.mods & Mods.HARDROCK)
+        stacking = beatmap.calculate_stacking(replay.mods)
+        heights, offset = stacking.heights, stacking.offset
+
+        timeline = replay.timeline
+        frames = timeline.frames
+        count = len(store)
+        judgements = array("H", bytes(2 * count))
+        hit_errors = array("i", bytes(4 * count))
+        head_hit = bytearray(count)
+
+        # Presses, matched to the first unjudged circle or slider head.
+        starts, hittable = self.hittable_starts, self.hittable
+        pointer = 0
+        for time, x, y in zip(*press_events(timeline)):
+            index = bisect_left(starts, time - w50, pointer)
+            # Objects whose window passed stay misses.
+            pointer = index
+            if index >= len(starts) or starts[index] > time + w50:
+                continue
+
+            i = hittable[index]
+            # Stacking shifts objects after HR flip.
+            shift = heights[i] * offset
+            object_y = (PLAYFIELD_HEIGHT - store.y[i] if flip else store.y[i]) + shift
+            if (x - store.x[i] - shift) ** 2 + (y - object_y) ** 2 > radius * radius:
+                continue
+
+            error = time - starts[index]
+            hit_errors[i] = error
+            head_hit[i] = 1
+            if store.kind[i] == ObjectType.CIRCLE:
+                judgements[i] = HIT_300 if abs(error) <= w300 else HIT_100 if abs(error) <= w100 else HIT_50
+            pointer += 1
+
+        result = JudgementResult(judgements=judgements, hit_errors=hit_errors)
+        combo = 0
+        follow_radius = radius * FOLLOW_RADIUS_SCALE
+        # Timeline position of the state at last slider event, walked forward
+        # as events come in time order.
+        times, indices = timeline.times, timeline.indices
+        position = -1
+
+        for i in range(count):
+            kind = store.kind[i]
+            if kind == ObjectType.CIRCLE:
+                combo = combo + 1 if head_hit[i] else 0
+            elif kind == ObjectType.SLIDER:
+                combo = combo + 1 if head_hit[i] else 0
+                result.max_combo = max(result.max_combo, combo)
+
+                events = self.events
+                shift = heights[i] * offset
+                hits = 0
+                for event in events.events_of(i):
+                    if events.kind[event] == HEAD:
+                        hits += head_hit[i]
+                        continue
+
+                    time = events.time[event]
+                    if position >= 0 and times[position] > time:
+                        # Sliders out of time order, search back.
+                        position = timeline.position(time)
+                    while position + 1 < len(times) and times[position + 1] <= time:
+                        position += 1
+
+                    frame = indices[position] if position >= 0 else -1
+                    hit = False
+                    if frame >= 0 and frames.keys[frame] & BUTTONS:
+                        ball_x = events.x[event] + shift
+                        ball_y = (PLAYFIELD_HEIGHT - events.y[event] if flip else events.y[event]) + shift
+                        hit = (frames.x[frame] - ball_x) ** 2 + (frames.y[frame] - ball_y) ** 2 <= follow_radius * follow_radius
+
+                    if hit:
+                        hits += 1
+                        combo += 1
+                        result.max_combo = max(result.max_combo, combo)
+                    elif events.kind[event] != TAIL:
+                        # Missed tail does not break combo.
+                        combo = 0
+
+                parts = len(events.events_of(i))
+                if hits == parts:
+                    judgements[i] = HIT_300
+                elif hits * 2 >= parts:
+                    judgements[i] = HIT_100
+                elif hits:
+                    judgements[i] = HIT_50
+                continue
+            elif kind == ObjectType.SPINNER:
+                judgements[i] = self.judge_spinner(timeline, store.start_time[i], store.end_time[i], stats.od)
+                combo = combo + 1 if judgements[i] else 0
+            else:
+                continue
+
+            result.max_combo = max(result.max_combo, combo)
+
+        for value in judgements:
+            if value == HIT_300:
+                result.n300 += 1
+            elif value == HIT_100:
+                result.n100 += 1
+            elif value == HIT_50:
+                result.n50 += 1
+            else:
+                result.nmiss += 1
+
+        # Unknown objects are neither hit nor missed.
+        result.nmiss -= sum(1 for kind in store.kind if not kind)
+        return result
+
+    @staticmethod
+    def judge_spinner(timeline: ReplayTimeline, start: int, end: int, od: float) -> int:
+        """Judges spinner by cursor rotation around centre while a button is held."""
+        needed = spinner_rotations_needed(od, end - start)
+        frames = timeline.frames
+
+        centre_x, centre_y = SPINNER_CENTRE
+        rotation = 0.0
+        previous = None
+        for i in timeline.indices_between(start, end):
+            angle = math.atan2(frames.y[i] - centre_y, frames.x[i] - centre_x)
+            if previous is not None and frames.keys[i] & BUTTONS:
+                delta = angle - previous
+                if delta > math.pi:
+                    delta -= 2.0 * math.pi
+                elif delta < -math.pi:
+                    delta += 2.0 * math.pi
+                rotation += delta
+            previous = angle
+
+        if needed <= 0:
+            return HIT_300
+
+        progress = abs(rotation) / (2.0 * math.pi) / needed
+        if progress >= 1.0:
+            return HIT_300
+        if progress > 0.9:
+            return HIT_100
+        if progress > 0.75:
+            return HIT_50
+
+        return MISS
+
+
+def judge_replay(replay, beatmap) -> JudgementResult:
+    """Recomputes hit counts and max combo of osu!standard replay."""
+    return Judge(beatmap).judge(replay)
@@ -0,0 +1,70 @@
+from .osr_parser import ReplayFile
+from ..executors import EXECUTORS
+from concurrent.futures import Executor
+from concurrent.futures import as_completed
+import asyncio
+from typing import AsyncIterator
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+def _parse_path(file_path: str, frames: str) -> ReplayFile:
+	# Module level so process pools can pickle it.
+	return ReplayFile.from_file(file_path, frames= frames)
+
+def parse_many(
+	paths: Iterable[str],
+	workers: Optional[int] = None,
+	executor: Union[str, Executor] = "thread",
+	ordered: bool = True,
+	frames: str = "eager",
+) -> Iterator[Tuple[str, ReplayFile]]:
+	"""Parses many replay files in parallel, yields (path, replay) pairs.
+
+	`executor` is "thread", "process" or an existing executor. LZMA releases
+	the GIL, so threads already scale well with frame decompression. Results
+	come in order of `paths`, or as they complete when `ordered` is False.
+	Lazy frames are decoded in the worker when using processes.
+	"""
+	if isinstance(executor, Executor):
+		pool = executor
+	elif executor in EXECUTORS:
+		pool = EXECUTORS[executor](max_workers= workers)
+	else:
+		raise ValueError(f"Unknown executor! Excepted one of {tuple(EXECUTORS)}, got {executor}")
+
+	try:
+		futures = { pool.submit(_parse_path, path, frames): path for path in paths }
+		results = futures if ordered else as_completed(futures)
+		for future in results:
+			yield futures[future], future.result()
+	finally:
+		if pool is not executor:
+			pool.shutdown(cancel_futures= True)
+
+async def parse_many_async(
+	paths: Iterable[str],
+	concurrency: int = 8,
+	executor: Optional[Executor] = None,
+	frames: str = "eager",
+) -> AsyncIterator[Tuple[str, ReplayFile]]:
+	"""Parses many replay files without blocking event loop, yields (path, replay) pairs as they complete.
+
+	At most `concurrency` files are read or parsed at once, parsing runs
+	in `executor` (loop's default one if None).
+	"""
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def parse(path: str) -> Tuple[str, ReplayFile]:
+		async with semaphore:
+			return path, await ReplayFile.from_file_async(path, frames= frames, executor= executor)
+
+	tasks = [ asyncio.ensure_future(parse(path)) for path in paths ]
+	try:
+		for task in asyncio.as_completed(tasks):
+			yield await task
+	finally:
+		for task in tasks:
+			task.cancel()
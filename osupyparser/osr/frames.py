@@ -0,0 +1,311 @@
+from .constants import ReplayFrame
+from .constants import OsuReplayFrame
+from .constants import TaikoReplayFrame
+from .constants import CatchReplayFrame
+from .constants import ManiaReplayFrame
+from collections.abc import Sequence
+from itertools import accumulate
+from itertools import islice
+from typing import BinaryIO
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Union
+from array import array
+import lzma
+
+try:
+	import numpy
+except ImportError: # NumPy is optional.
+	numpy = None
+
+# Delta value of the frame holding the RNG seed.
+SEED_FRAME_DELTA = -12345
+# Replays newer than this have the seed frame.
+SEED_FRAME_VERSION = 20130319
+
+# Amount of bytes decompressed at once by streaming decoder.
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Amount of frames formatted into text at once by encoder.
+TEXT_BATCH_SIZE = 4096
+
+# Column name -> array typecode.
+FRAME_COLUMNS = {
+	"delta": "i",
+	"x": "d",
+	"y": "d",
+	"keys": "i",
+	"time": "q",
+}
+
+class ReplayFrames(Sequence):
+	"""Columnar, array backed storage of replay frames.
+
+	Each frame field is kept in its own `array.array` column, `time` being
+	the absolute time of a frame (running sum of deltas). Indexing still
+	returns the mode specific frame dataclasses, built on access.
+	"""
+
+	def __init__(self, mode: int = 0) -> None:
+		self.mode: int = mode
+
+		self.delta: array = array(FRAME_COLUMNS["delta"])
+		self.x: array = array(FRAME_COLUMNS["x"])
+		self.y: array = array(FRAME_COLUMNS["y"])
+		self.keys: array = array(FRAME_COLUMNS["keys"])
+		self.time: array = array(FRAME_COLUMNS["time"])
+
+		# RNG seed, if seed frame was found in frame data.
+		self.seed: Optional[int] = None
+
+	@classmethod
+	def from_columns(cls, mode: int, columns: dict, seed: Optional[int] = None) -> "ReplayFrames":
+		"""Builds frames over existing columns (arrays or memoryviews), without copying."""
+		frames = cls(mode)
+		for name in FRAME_COLUMNS:
+			setattr(frames, name, columns[name])
+		frames.seed = seed
+		return frames
+
+	@classmethod
+	def lazy(cls, mode: int, loader: Callable[["ReplayFrames"], None]) -> "ReplayFrames":
+		"""Creates frames which are filled by `loader` on first use."""
+		frames = cls(mode)
+		for name in FRAME_COLUMNS:
+			# Missing columns make attribute lookup fall to __getattr__.
+			delattr(frames, name)
+		frames._loader = loader
+		return frames
+
+	def __getattr__(self, name: str):
+		if name not in FRAME_COLUMNS or "_loader" not in self.__dict__:
+			raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+		loader = self.__dict__.pop("_loader")
+		for column, code in FRAME_COLUMNS.items():
+			setattr(self, column, array(code))
+		loader(self)
+		return getattr(self, name)
+
+	def __getstate__(self) -> dict:
+		# Loader can't be pickled, decode frames first.
+		if not self.loaded:
+			self.delta
+		return self.__dict__
+
+	@property
+	def loaded(self) -> bool:
+		"""Whether frame data was already decoded."""
+		return "_loader" not in self.__dict__
+
+	def __len__(self) -> int:
+		return len(self.delta)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [ self.frame_at(i) for i in range(*index.indices(len(self))) ]
+
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError("frame index out of range")
+
+		return self.frame_at(index)
+
+	def __iter__(self) -> Iterator[ReplayFrame]:
+		for i in range(len(self)):
+			yield self.frame_at(i)
+
+	def __repr__(self) -> str:
+		if not self.loaded:
+			return f"<ReplayFrames mode={self.mode} (not loaded)>"
+		return f"<ReplayFrames mode={self.mode} frames={len(self)}>"
+
+	def frame_at(self, index: int) -> ReplayFrame:
+		"""Builds frame dataclass for given index."""
+		if self.mode == 1:
+			return TaikoReplayFrame(self.delta[index], self.x[index], self.keys[index])
+		elif self.mode == 2:
+			return CatchReplayFrame(self.delta[index], self.x[index], self.keys[index] == 1)
+		elif self.mode == 3:
+			# Mania stores pressed columns as bitmask in x.
+			return ManiaReplayFrame(self.delta[index], int(self.x[index]))
+
+		return OsuReplayFrame(self.delta[index], self.x[index], self.y[index], self.keys[index])
+
+	def column(self, name: str) -> memoryview:
+		"""Returns zero-copy view of given column."""
+		if name not in FRAME_COLUMNS:
+			raise KeyError(f"Unknown frame column: {name}")
+
+		return memoryview(getattr(self, name))
+
+	def to_numpy(self, name: Optional[str] = None):
+		"""Returns zero-copy NumPy view of a column (or dict of all columns)."""
+		if numpy is None:
+			raise ImportError("NumPy is required for to_numpy().")
+
+		if name is None:
+			return { col: numpy.frombuffer(self.column(col), dtype= code) for col, code in FRAME_COLUMNS.items() }
+
+		return numpy.frombuffer(self.column(name), dtype= FRAME_COLUMNS[name])
+
+	def iter_text(self, seed: Optional[int] = None, batch_size: int = TEXT_BATCH_SIZE) -> Iterator[str]:
+		"""Yields replay frame text, `batch_size` frames at once, seed frame last."""
+		frame_format = "{}|{}|{}|{},".format
+		for start in range(0, len(self.delta), batch_size):
+			end = start + batch_size
+			yield "".join(map(
+				frame_format,
+				self.delta[start:end],
+				map(format_number, self.x[start:end]),
+				map(format_number, self.y[start:end]),
+				self.keys[start:end],
+			))
+
+		if seed is not None:
+			yield f"{SEED_FRAME_DELTA}|0|0|{seed},"
+
+	def extend_text(self, data: str, osu_version: int, start_time: Optional[int] = None) -> Optional[int]:
+		"""Appends frames from replay frame text, returns seed if found.
+
+		Absolute times continue from last stored frame unless `start_time` is given.
+		"""
+		tokens = data.replace("|", ",").split(",")
+		if tokens and not tokens[-1]:
+			tokens.pop() # Frame text ends with a comma.
+
+		if len(tokens) % 4:
+			# Some frame has odd amount of values, fallback to per frame parsing.
+			tokens = []
+			for frame in data.split(","):
+				action = frame.split("|")
+				if len(action) == 4:
+					tokens.extend(action)
+
+		deltas = list(map(int, tokens[0::4]))
+		xs = tokens[1::4]
+		ys = tokens[2::4]
+		keys = tokens[3::4]
+
+		seed = None
+		if osu_version >= SEED_FRAME_VERSION and SEED_FRAME_DELTA in deltas:
+			# After 20130319 replays started to have seeds.
+			for i in reversed([ i for i, d in enumerate(deltas) if d == SEED_FRAME_DELTA ]):
+				if seed is None:
+					seed = self.seed = int(keys[i])
+				del deltas[i], xs[i], ys[i], keys[i]
+
+		last_time = start_time
+		if last_time is None:
+			last_time = self.time[-1] if self.time else 0
+		self.delta.extend(deltas)
+		self.x.extend(map(float, xs))
+		self.y.extend(map(float, ys))
+		self.keys.extend(map(int, keys))
+		self.time.extend(islice(accumulate(deltas, initial= last_time), 1, None))
+
+		return seed
+
+def format_number(value: float) -> str:
+	"""Formats frame value like the game does, whole numbers without fraction."""
+	text = repr(value)
+	return text[:-2] if text.endswith(".0") else text
+
+def iter_byte_chunks(data: Union[bytes, memoryview], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[memoryview]:
+	"""Slices bytes data into chunks without copying."""
+	view = memoryview(data)
+	for offset in range(0, len(view), chunk_size):
+		yield view[offset:offset+chunk_size]
+
+def iter_stream_chunks(stream: BinaryIO, length: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+	"""Reads `length` bytes (rest of stream if None) of file object chunk by chunk."""
+	while length is None or length > 0:
+		chunk = stream.read(chunk_size if length is None else min(chunk_size, length))
+		if not chunk:
+			break
+		if length is not None:
+			length -= len(chunk)
+		yield chunk
+
+def iter_frame_text(data: Union[bytes, memoryview, Iterable[bytes]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+	"""Decompresses lzma frame data in chunks, yields text of whole frames.
+
+	`data` is either whole lzma data or an iterable of its chunks (see
+	`iter_stream_chunks`). Partial frame at the end of a chunk is carried
+	over to the next one.
+	"""
+	decompressor = lzma.LZMADecompressor(lzma.FORMAT_AUTO)
+	if isinstance(data, (bytes, bytearray, memoryview)):
+		data = iter_byte_chunks(data, chunk_size)
+	chunks = iter(data)
+	tail = ""
+
+	while not decompressor.eof:
+		if decompressor.needs_input:
+			chunk = next(chunks, None)
+			if chunk is None:
+				break # Truncated data, use what we have.
+		else:
+			chunk = b""
+
+		text = decompressor.decompress(chunk, max_length= chunk_size).decode("ascii")
+		if not text:
+			continue
+
+		text = tail + text
+		cut = text.rfind(",") + 1
+		tail = text[cut:]
+		if cut:
+			yield text[:cut]
+
+	if tail:
+		yield tail
+
+def iter_compressed_frames(
+	frames: ReplayFrames,
+	seed: Optional[int] = None,
+	preset: Optional[int] = None,
+	filters: Optional[list] = None,
+) -> Iterator[bytes]:
+	"""Compresses frame text as it is built, yields lzma data chunks.
+
+	Uses the lzma "alone" format osu! reads, `preset`/`filters` go to the compressor.
+	"""
+	compressor = lzma.LZMACompressor(lzma.FORMAT_ALONE, preset= preset, filters= filters)
+	for text in frames.iter_text(seed):
+		data = compressor.compress(text.encode("ascii"))
+		if data:
+			yield data
+
+	yield compressor.flush()
+
+def iter_frame_batches(
+	data: Union[bytes, memoryview, Iterable[bytes]],
+	mode: int = 0,
+	osu_version: int = 0,
+	chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[ReplayFrames]:
+	"""Yields decoded frames in batches, one per decompressed chunk.
+
+	Absolute times keep counting across batches.
+	"""
+	last_time = 0
+	for text in iter_frame_text(data, chunk_size):
+		batch = ReplayFrames(mode)
+		batch.extend_text(text, osu_version, last_time)
+		if batch.time:
+			last_time = batch.time[-1]
+		yield batch
+
+def iter_frames(
+	data: Union[bytes, memoryview, Iterable[bytes]],
+	mode: int = 0,
+	osu_version: int = 0,
+	chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[ReplayFrame]:
+	"""Yields decoded frames one by one."""
+	for batch in iter_frame_batches(data, mode, osu_version, chunk_size):
+		yield from batch
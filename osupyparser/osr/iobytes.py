@@ -1,53 +1,120 @@
+from typing import BinaryIO
+from typing import Optional
+from typing import Union
 import struct
+import mmap
+
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+I16 = struct.Struct("<h")
+U32 = struct.Struct("<I")
+I32 = struct.Struct("<i")
+U64 = struct.Struct("<Q")
+I64 = struct.Struct("<q")
+F32 = struct.Struct("<f")
+F64 = struct.Struct("<d")
+
+# (size, signed) -> layout, used by read_int.
+INT_LAYOUTS = {
+    (1, False): U8,
+    (1, True): struct.Struct("<b"),
+    (2, False): U16,
+    (2, True): I16,
+    (4, False): U32,
+    (4, True): I32,
+    (8, False): U64,
+    (8, True): I64,
+}
 
 class BinaryRotator:
-    """A class for bytes reading."""
+    """A class for bytes reading.
 
-    def __init__(self, data: bytes) -> None:
-        self.buffer: bytes = data
+    Reads straight from a memoryview over the data, so fields are unpacked
+    in place instead of being sliced into new bytes objects first.
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, mmap.mmap]) -> None:
+        self.buffer: memoryview = memoryview(data)
         self.offset: int = 0
+        self.__mmap = None
+
+    @classmethod
+    def from_mmap(cls, file: Union[str, int, BinaryIO]) -> "BinaryRotator":
+        """Memory maps file path, file descriptor or file object instead of reading it."""
+        if isinstance(file, str):
+            with open(file, "rb") as stream:
+                mapped = mmap.mmap(stream.fileno(), 0, access= mmap.ACCESS_READ)
+        else:
+            fd = file if isinstance(file, int) else file.fileno()
+            mapped = mmap.mmap(fd, 0, access= mmap.ACCESS_READ)
+
+        reader = cls(mapped)
+        reader.__mmap = mapped
+        return reader
+
+    def close(self) -> None:
+        """Releases buffer (and unmaps file if mapped)."""
+        self.buffer.release()
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def __enter__(self) -> "BinaryRotator":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def skip(self, offset: int) -> None:
+        """Moves offset forward without reading."""
+        self.offset += offset
 
     def read(self, offset: int) -> bytes:
         """Reads offseted data."""
+        return bytes(self.read_view(offset))
 
+    def read_view(self, offset: int) -> memoryview:
+        """Reads offseted data without copying it."""
         data = self.buffer[self.offset:self.offset+offset]
         self.offset += offset
         return data
 
+    def unpack(self, layout: struct.Struct) -> tuple:
+        """Reads all fields of a precompiled struct layout at once."""
+        data = layout.unpack_from(self.buffer, self.offset)
+        self.offset += layout.size
+        return data
+
     def read_int(self, size: int, signed: bool) -> int:
         """Read a int."""
-        return int.from_bytes(
-            self.read(size),
-            "little",
-            signed= signed
-        )
+        return self.unpack(INT_LAYOUTS[(size, signed)])[0]
 
     def read_u8(self) -> int:
-        return self.read_int(1, False)
-    
+        return self.unpack(U8)[0]
+
     def read_u16(self) -> int:
-        return self.read_int(2, False)
-    
+        return self.unpack(U16)[0]
+
     def read_i16(self) -> int:
-        return self.read_int(2, True)
-    
+        return self.unpack(I16)[0]
+
     def read_u32(self) -> int:
-        return self.read_int(4, False)
-    
+        return self.unpack(U32)[0]
+
     def read_i32(self) -> int:
-        return self.read_int(4, True)
+        return self.unpack(I32)[0]
 
     def read_u64(self) -> int:
-        return self.read_int(8, False)
-    
+        return self.unpack(U64)[0]
+
     def read_i64(self) -> int:
-        return self.read_int(8, True)
+        return self.unpack(I64)[0]
 
     def read_f32(self) -> float:
-        return struct.unpack("<f", self.read(4))
+        return self.unpack(F32)[0]
 
     def read_f64(self) -> float:
-        return struct.unpack("<f", self.read(8))
+        return self.unpack(F64)[0]
 
     def read_uleb128(self) -> int:
         """Reads a uleb bytes into int."""
@@ -56,7 +123,8 @@ class BinaryRotator:
 
         val = shift = 0
         while True:
-            b = self.read_u8()
+            b = self.buffer[self.offset]
+            self.offset += 1
             val |= (b & 0b01111111) << shift
             if (b & 0b10000000) == 0:
                 break
@@ -66,4 +134,58 @@ class BinaryRotator:
     def read_string(self) -> str:
         """Read string."""
         s_len = self.read_uleb128()
-        return self.read(s_len).decode()
+        return str(self.read_view(s_len), "utf-8")
+
+    def read_optional_string(self) -> Optional[str]:
+        """Read string, None if it is absent (0x00) rather than empty (0x0b 0x00)."""
+        if self.buffer[self.offset] != 0x0b:
+            self.offset += 1
+            return None
+        return self.read_string()
+
+
+class BinaryWriter:
+    """A class for bytes writing, counterpart of BinaryRotator."""
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self.stream: BinaryIO = stream
+
+    def pack(self, layout: struct.Struct, *values) -> None:
+        """Writes all fields of a precompiled struct layout at once."""
+        self.stream.write(layout.pack(*values))
+
+    def write_u8(self, value: int) -> None:
+        self.pack(U8, value)
+
+    def write_i32(self, value: int) -> None:
+        self.pack(I32, value)
+
+    def write_i64(self, value: int) -> None:
+        self.pack(I64, value)
+
+    def write_f64(self, value: float) -> None:
+        self.pack(F64, value)
+
+    def write_uleb128(self, value: int) -> None:
+        """Writes int as uleb bytes."""
+        data = bytearray()
+        while True:
+            b = value & 0b01111111
+            value >>= 7
+            if value:
+                data.append(b | 0b10000000)
+            else:
+                data.append(b)
+                break
+        self.stream.write(data)
+
+    def write_string(self, value: str, present: bool = False) -> None:
+        """Write string, empty one as a null string unless `present` is set."""
+        if not value and not present:
+            self.write_u8(0)
+            return
+
+        data = value.encode("utf-8")
+        self.write_u8(0x0b)
+        self.write_uleb128(len(data))
+        self.stream.write(data)
@@ -0,0 +1,211 @@
+from .timeline import ReplayTimeline
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+from array import array
+import math
+
+try:
+	import numpy
+except ImportError: # NumPy is optional.
+	numpy = None
+
+# Logical key names of each mode, bit i of decoded key state is key i.
+# Mania keys are named per column, see `mania_key_names`.
+KEY_NAMES = {
+	0: ("M1", "M2", "K1", "K2", "smoke"),
+	# Stable taiko frames reuse the mouse/key bits: M1, M2, K1, K2.
+	1: ("left_centre", "left_rim", "right_centre", "right_rim"),
+	2: ("dash",),
+}
+
+
+def decode_osu_keys(keys: int) -> int:
+	"""Decodes raw osu!standard key bits into M1, M2, K1, K2, smoke bits.
+
+	Keyboard keys also set the mouse button bit (K1 = 5, K2 = 10), so M1/M2
+	only count as held when their keyboard key is not.
+	"""
+	m1 = keys & 1 and not keys & 4
+	m2 = keys & 2 and not keys & 8
+	return (1 if m1 else 0) | (2 if m2 else 0) | (keys & 4) | (keys & 8) | (keys & 16)
+
+
+# Raw key bits (0-31) -> decoded osu!standard key state.
+OSU_KEY_TABLE = bytes(decode_osu_keys(keys) for keys in range(32))
+
+
+def mania_key_names(columns: int) -> Tuple[str, ...]:
+	"""Names of mania columns, "column1" being the leftmost."""
+	return tuple(f"column{i + 1}" for i in range(columns))
+
+
+@dataclass
+class KeyStats:
+	"""Press statistics of one key, times in ms."""
+	presses: int = 0
+	# Presses per second between first and last press.
+	key_rate: float = 0.0
+	mean_hold: float = 0.0
+	hold_deviation: float = 0.0
+	min_hold: int = 0
+	max_hold: int = 0
+	# Mean time between consecutive presses.
+	mean_interval: float = 0.0
+
+
+class KeyIntervals:
+	"""Press start/end times of every key of a replay, in per key arrays.
+
+	Built in one pass over the kept frames of a ReplayTimeline (or over
+	whole key columns with NumPy). Keys still held on the last frame end
+	at its time.
+	"""
+
+	def __init__(self, mode: int, names: Tuple[str, ...]) -> None:
+		self.mode: int = mode
+		self.names: Tuple[str, ...] = names
+		self.starts: List[array] = [ array("q") for _ in names ]
+		self.ends: List[array] = [ array("q") for _ in names ]
+
+	@classmethod
+	def from_replay(cls, replay) -> "KeyIntervals":
+		"""Key intervals of replay frames."""
+		return cls.from_timeline(replay.timeline)
+
+	@classmethod
+	def from_timeline(cls, timeline: ReplayTimeline) -> "KeyIntervals":
+		"""Extracts key intervals from kept frames of timeline."""
+		frames = timeline.frames
+		mode = frames.mode
+		if mode == 3:
+			# Mania stores pressed columns as bitmask in x.
+			states = array("I", [ int(frames.x[i]) for i in timeline.indices ])
+			combined = 0
+			for state in states:
+				combined |= state
+			names = mania_key_names(combined.bit_length())
+		else:
+			keys = frames.keys
+			if mode == 0:
+				states = array("I", [ OSU_KEY_TABLE[keys[i] & 31] for i in timeline.indices ])
+			elif mode == 1:
+				states = array("I", [ keys[i] & 15 for i in timeline.indices ])
+			elif mode == 2:
+				states = array("I", [ keys[i] & 1 for i in timeline.indices ])
+			else:
+				raise ValueError(f"Unknown replay mode! Excepted: 0-3, got {mode}")
+			names = KEY_NAMES[mode]
+
+		intervals = cls(mode, names)
+		if numpy is not None and states:
+			intervals.fill_numpy(numpy.frombuffer(states, dtype= numpy.uint32).astype(numpy.int64), numpy.frombuffer(timeline.times, dtype= numpy.int64))
+		else:
+			intervals.fill(states, timeline.times)
+
+		return intervals
+
+	def fill(self, states: array, times: array) -> None:
+		"""Appends intervals of decoded key states, touching only frames where keys change."""
+		starts, ends = self.starts, self.ends
+		previous = 0
+		for state, time in zip(states, times):
+			changed = state ^ previous
+			if not changed:
+				continue
+
+			key = 0
+			while changed:
+				if changed & 1:
+					if state >> key & 1:
+						starts[key].append(time)
+					else:
+						ends[key].append(time)
+				changed >>= 1
+				key += 1
+			previous = state
+
+		key = 0
+		while previous:
+			if previous & 1:
+				ends[key].append(times[-1])
+			previous >>= 1
+			key += 1
+
+	def fill_numpy(self, states, times) -> None:
+		"""Vectorised `fill`, diffing whole key columns at once."""
+		padding = numpy.zeros(1, dtype= numpy.int64)
+		for key in range(len(self.names)):
+			held = (states >> key) & 1
+			changes = numpy.diff(numpy.concatenate((padding, held, padding)))
+			self.starts[key].frombytes(times[changes[:-1] == 1].tobytes())
+			ends = numpy.flatnonzero(changes == -1)
+			# Keys held on last frame end at its time.
+			self.ends[key].frombytes(times[numpy.minimum(ends, len(times) - 1)].tobytes())
+
+	def __len__(self) -> int:
+		return len(self.names)
+
+	def __repr__(self) -> str:
+		presses = ", ".join(f"{name}={len(starts)}" for name, starts in zip(self.names, self.starts))
+		return f"<KeyIntervals mode={self.mode} {presses}>"
+
+	def key_index(self, key: Union[int, str]) -> int:
+		"""Index of key given by index or name."""
+		if isinstance(key, str):
+			if key not in self.names:
+				raise KeyError(f"Unknown key: {key}")
+			return self.names.index(key)
+
+		return key
+
+	def intervals(self, key: Union[int, str]) -> Tuple[array, array]:
+		"""(starts, ends) arrays of key presses."""
+		key = self.key_index(key)
+		return self.starts[key], self.ends[key]
+
+	def hold_durations(self, key: Union[int, str]) -> array:
+		"""Hold duration of every press of key."""
+		starts, ends = self.intervals(key)
+		return array("q", [ end - start for start, end in zip(starts, ends) ])
+
+	@property
+	def presses(self) -> int:
+		"""Total amount of presses of all keys."""
+		return sum(len(starts) for starts in self.starts)
+
+	@property
+	def key_rate(self) -> float:
+		"""Presses per second of all keys, between first and last press."""
+		firsts = [ starts[0] for starts in self.starts if starts ]
+		lasts = [ starts[-1] for starts in self.starts if starts ]
+		if not firsts or max(lasts) == min(firsts):
+			return 0.0
+
+		return (self.presses - 1) * 1000.0 / (max(lasts) - min(firsts))
+
+	def stats(self, key: Union[int, str]) -> KeyStats:
+		"""Press statistics of key."""
+		starts, _ = self.intervals(key)
+		holds = self.hold_durations(key)
+		if not holds:
+			return KeyStats()
+
+		presses = len(holds)
+		mean = sum(holds) / presses
+		span = starts[-1] - starts[0]
+		return KeyStats(
+			presses= presses,
+			key_rate= (presses - 1) * 1000.0 / span if span else 0.0,
+			mean_hold= mean,
+			hold_deviation= math.sqrt(sum((hold - mean) ** 2 for hold in holds) / presses),
+			min_hold= min(holds),
+			max_hold= max(holds),
+			mean_interval= span / (presses - 1) if presses > 1 else 0.0,
+		)
+
+	def all_stats(self) -> Dict[str, KeyStats]:
+		"""Statistics of every key, by name."""
+		return { name: self.stats(i) for i, name in enumerate(self.names) }
@@ -1,15 +1,43 @@
 from .iobytes import BinaryRotator
-from .constants import OsuReplayFrame
-from .constants import CatchReplayFrame
-from .constants import ManiaReplayFrame
-from .constants import TaikoReplayFrame
-import lzma
+from .iobytes import BinaryWriter
+from .frames import ReplayFrames
+from .timeline import ReplayTimeline
+from .keys import KeyIntervals
+from .constants import ReplayFrame
+from .frames import iter_frame_text
+from .frames import iter_frame_batches
+from .frames import iter_compressed_frames
+from .frames import iter_stream_chunks
+from .frames import SEED_FRAME_VERSION
+from .snapshot import write_replay
+from .snapshot import read_replay
+from ..snapshot import SnapshotReader
+from ..snapshot import KIND_REPLAY
+from ..aio import read_file_async
+from ..aio import run_in_executor
+from ..profiler import ParseObserver
+from concurrent.futures import Executor
+from typing import BinaryIO
+from typing import Iterator
+from typing import Optional
+from typing import Set
+from typing import Union
+import struct
+import time
+import io
+
+# Frame decoding modes of parse_data.
+FRAME_MODES = ("eager", "lazy", "skip")
+
+# Fixed run of header fields: hit counts, score, max combo, perfect and mods.
+SCORE_LAYOUT = struct.Struct("<6HiHBi")
 
 class ReplayFile:
 	"""A class representing replay file data."""
 	
 	def __init__(self) -> None:
 		self.__reader = None
+		self.__timeline = None
 
 		self.mode: int = 0
 		self.osu_version: int = 0
@@ -28,89 +56,233 @@ class ReplayFile:
 		self.mods: int = 0
 		self.life_graph: str = ""
 		self.timestamp: int = 0
-		self.frames: list = []
+		self.frames: ReplayFrames = ReplayFrames()
 		self.score_id: int = 0
 		self.seed: int = 0
 		self.target_practice_hits: float = 0.0
+		# Frame decoding mode frames were parsed with, see FRAME_MODES.
+		self.frames_mode: str = "eager"
+		# Header strings stored empty (0x0b 0x00) instead of absent (0x00).
+		self.empty_strings: Set[str] = set()
+
+		# Position of compressed frame data in replay.
+		self.lzma_offset: int = 0
+		self.lzma_length: int = 0
+
+	@property
+	def timeline(self) -> ReplayTimeline:
+		"""Frames indexed by absolute time, rebuilt when frames change."""
+		if self.__timeline is None or self.__timeline.frames is not self.frames or self.__timeline.frame_count != len(self.frames):
+			self.__timeline = ReplayTimeline(self.frames)
+
+		return self.__timeline
+
+	def key_intervals(self) -> KeyIntervals:
+		"""Press start/end times of every key (mania column), see osr.keys."""
+		return KeyIntervals.from_timeline(self.timeline)
 
 	@classmethod
-	def from_bytes(cls, bytedata: bytes, pure_lzma: bool = False):
-		"""Parses replay from bytes data."""
-		cls.__init__(cls)
+	def from_bytes(cls, bytedata: bytes, pure_lzma: bool = False, frames: str = "eager", observer: Optional[ParseObserver] = None):
+		"""Parses replay from bytes data.
+
+		`frames` controls frame decoding: "eager" decodes them right away,
+		"lazy" on first access of `frames`, "skip" never. Since the seed is
+		part of frame data, it is only set once frames are decoded.
 
-		cls.__reader = BinaryRotator(bytedata)
-		return cls.parse_data(cls, pure_lzma)
+		`observer` (see osupyparser.profiler) gets wall time of header
+		parsing, decompression and frame decoding, plus byte and frame counts.
+		"""
+		replay = cls()
+		replay.__reader = BinaryRotator(bytedata)
+		return replay.parse_data(pure_lzma, frames, observer)
 	
 	@classmethod
-	def from_file(cls, file_path: str, pure_lzma: bool = False):
-		"""Parses replay from file path."""
-		cls.__init__(cls)
-
+	def from_file(cls, file_path: str, pure_lzma: bool = False, frames: str = "eager", observer: Optional[ParseObserver] = None):
+		"""Parses replay from file path. See `from_bytes` for `frames` modes."""
+		replay = cls()
 		with open(file_path, "rb") as stream:
-			cls.__reader = BinaryRotator(stream.read())
-		return cls.parse_data(cls, pure_lzma)
+			replay.__reader = BinaryRotator(stream.read())
+		return replay.parse_data(pure_lzma, frames, observer)
+
+	@classmethod
+	def from_mmap(cls, file: Union[str, int, BinaryIO], pure_lzma: bool = False, frames: str = "eager", observer: Optional[ParseObserver] = None):
+		"""Parses replay from memory mapped file path, descriptor or file object.
+
+		File contents are never copied into bytes as a whole.
+		See `from_bytes` for `frames` modes.
+		"""
+		replay = cls()
+		reader = replay.__reader = BinaryRotator.from_mmap(file)
+		try:
+			return replay.parse_data(pure_lzma, frames, observer)
+		except Exception:
+			# Unmap file of broken replays too, parse_data only closes on success.
+			reader.close()
+			raise
+
+	@classmethod
+	async def from_bytes_async(cls, bytedata: bytes, pure_lzma: bool = False, frames: str = "eager", executor: Optional[Executor] = None):
+		"""Async `from_bytes`, parsing runs in `executor` (loop's default one if None)."""
+		return await run_in_executor(executor, cls.from_bytes, bytedata, pure_lzma, frames)
+
+	@classmethod
+	async def from_file_async(cls, file_path: str, pure_lzma: bool = False, frames: str = "eager", executor: Optional[Executor] = None):
+		"""Async `from_file`, event loop is not blocked by file reading nor LZMA.
+
+		File is read in a worker thread, parsing runs in `executor` (loop's
+		default one if None). Lazy frames are decoded in the worker when
+		using processes.
+		"""
+		bytedata = await read_file_async(file_path)
+		return await cls.from_bytes_async(bytedata, pure_lzma, frames, executor)
+
+	@classmethod
+	def from_snapshot(cls, source: Union[str, bytes, memoryview]):
+		"""Loads replay from `to_snapshot` data, or memory maps it from file path.
+
+		Frame columns are memoryviews over the snapshot buffer, not copies.
+		"""
+		return read_replay(cls(), SnapshotReader.from_source(source, KIND_REPLAY))
+
+	def to_snapshot(self) -> bytes:
+		"""Serialises parsed replay into a binary snapshot."""
+		return write_replay(self)
+
+	@classmethod
+	def iter_frames(
+		cls,
+		source: Union[str, bytes],
+		pure_lzma: bool = False,
+		batches: bool = False,
+		replay: Optional["ReplayFile"] = None,
+	) -> Iterator[Union[ReplayFrame, ReplayFrames]]:
+		"""Streams frames from replay file path or bytes data.
+
+		Frame data is decompressed chunk by chunk, so memory use stays flat
+		and stopping early skips decompressing the rest. Files are read in
+		chunks too, only their header is memory mapped. With `batches` set,
+		yields `ReplayFrames` batches instead of single frames, the seed is
+		then kept on the batch holding the seed frame.
+
+		Header fields and the seed are stored on `replay` (a new ReplayFile
+		if None), the seed once the seed frame was decoded.
+		"""
+		replay = cls() if replay is None else replay
+		if isinstance(source, str):
+			with open(source, "rb") as stream:
+				length = None
+				if not pure_lzma:
+					with BinaryRotator.from_mmap(stream) as reader:
+						length = replay.parse_stream_header(reader)
+					stream.seek(reader.offset)
+				yield from replay.iter_decoded(iter_stream_chunks(stream, length), batches)
+			return
+
+		reader = BinaryRotator(source)
+		if pure_lzma:
+			lzma_data = reader.buffer
+		else:
+			lzma_data = reader.read_view(replay.parse_stream_header(reader))
+		yield from replay.iter_decoded(lzma_data, batches)
+
+	def parse_stream_header(self, reader: BinaryRotator) -> int:
+		"""Parses header from reader, returns length of frame data following it."""
+		self.__reader = reader
+		try:
+			self.parse_header()
+			self.lzma_length = reader.read_i32()
+			self.lzma_offset = reader.offset
+		finally:
+			self.__reader = None
+		return self.lzma_length
+
+	def iter_decoded(self, lzma_data, batches: bool) -> Iterator[Union[ReplayFrame, ReplayFrames]]:
+		"""Decodes frame data (bytes or byte chunks) in batches, recording the seed."""
+		for batch in iter_frame_batches(lzma_data, self.mode, self.osu_version):
+			if batch.seed is not None:
+				self.seed = batch.seed
+			if batches:
+				yield batch
+			else:
+				yield from batch
+
+	def parse_frames(self, lzma_data: bytes, observer: Optional[ParseObserver] = None) -> None:
+		"""Decompresses and parses frame data."""
+		self.frames = ReplayFrames(self.mode)
+		self.load_frames(self.frames, lzma_data, observer)
 
-	def parse_lzma(self) -> None:
+	def load_frames(self, frames: ReplayFrames, lzma_data: bytes, observer: Optional[ParseObserver] = None) -> None:
+		"""Decompresses frame data into given frames."""
+		if observer is not None:
+			return self.load_frames_observed(frames, lzma_data, observer)
+
+		for data in iter_frame_text(lzma_data):
+			seed = frames.extend_text(data, self.osu_version)
+			if seed is not None:
+				self.seed = seed
+
+	def load_frames_observed(self, frames: ReplayFrames, lzma_data: bytes, observer: ParseObserver) -> None:
+		"""`load_frames` timing decompression and frame decoding apart."""
+		texts = iter_frame_text(lzma_data)
+		decompress_time = decode_time = 0.0
+		decompressed = 0
+		while True:
+			start = time.perf_counter()
+			data = next(texts, None)
+			decoded = time.perf_counter()
+			decompress_time += decoded - start
+			if data is None:
+				break
+
+			decompressed += len(data)
+			seed = frames.extend_text(data, self.osu_version)
+			if seed is not None:
+				self.seed = seed
+			decode_time += time.perf_counter() - decoded
+
+		observer.on_stage("lzma", decompress_time)
+		observer.on_stage("frames", decode_time)
+		observer.on_count("bytes_compressed", len(lzma_data))
+		observer.on_count("bytes_decompressed", decompressed)
+		observer.on_count("frames", len(frames))
+
+	def parse_lzma(self, observer: Optional[ParseObserver] = None) -> None:
 		"""Parses only lzma data from replay."""
-		data = lzma.decompress(self.__reader.buffer, format= lzma.FORMAT_AUTO).decode("ascii")
-		frames = [ frame.split("|") for frame in data.split(",")[:-1] ]
-
-		for action in frames:
-			if self.osu_version >= 20130319 and action[0] == "-12345":
-				# After 20130319 replays started to have seeds.
-				self.seed = int(action[3])
-				continue
-
-			# We dont know what mode is it so we assume its standard.
-			frame = OsuReplayFrame(int(action[0]), float(action[1]), float(action[2]), int(action[3]))
-			self.frames.append(frame)
+		# We dont know what mode is it so we assume its standard.
+		self.mode = 0
+		self.parse_frames(self.__reader.buffer, observer)
 	
-	def parse_data(self, only_lzma: bool):
+	def parse_data(self, only_lzma: bool, frames: str = "eager", observer: Optional[ParseObserver] = None):
 		"""Parses all replay data."""
+		if frames not in FRAME_MODES:
+			raise ValueError(f"Unknown frames mode! Excepted one of {FRAME_MODES}, got {frames}")
+
+		self.frames_mode = "eager" if only_lzma else frames
 		if only_lzma:
-			self.parse_lzma(self)
+			self.parse_lzma(observer)
+			self.__reader.close()
+			self.__reader = None
 			return self
 		
-		self.mode = self.__reader.read_u8()
-		self.osu_version = self.__reader.read_i32()
-		self.map_md5 = self.__reader.read_string()
-		self.player_name = self.__reader.read_string()
-		self.replay_md5 = self.__reader.read_string()
-		self.n300 = self.__reader.read_u16()
-		self.n100 = self.__reader.read_u16()
-		self.n50 = self.__reader.read_u16()
-		self.ngeki = self.__reader.read_u16()
-		self.nkatu = self.__reader.read_u16()
-		self.nmiss = self.__reader.read_u16()
-		self.score = self.__reader.read_i32()
-		self.max_combo = self.__reader.read_u16()
-		self.perfect = self.__reader.read_u8() == 1
-		self.mods = self.__reader.read_i32()
-		self.life_graph = self.__reader.read_string()
-		self.timestamp = self.__reader.read_i64()
+		start = time.perf_counter() if observer is not None else 0.0
+		self.parse_header()
+		if observer is not None:
+			observer.on_stage("header", time.perf_counter() - start)
 
-		lzma_len = self.__reader.read_i32()
-		lzma_data = self.__reader.read(lzma_len)
-
-		data = lzma.decompress(lzma_data, format= lzma.FORMAT_AUTO).decode("ascii")
-		frames = [ frame.split("|") for frame in data.split(",")[:-1] ]
-
-		for action in frames:
-			if self.osu_version >= 20130319 and action[0] == "-12345":
-				# After 20130319 replays started to have seeds.
-				self.seed = int(action[3])
-				continue
-
-			if self.mode == 0:
-				frame = OsuReplayFrame(int(action[0]), float(action[1]), float(action[2]), int(action[3]))
-			elif self.mode == 1:
-				frame = TaikoReplayFrame(int(action[0]), float(action[1]), int(action[3]))
-			elif self.mode == 2:
-				frame = CatchReplayFrame(int(action[0]), float(action[1]), action[3] == "1")
-			elif self.mode == 3:
-				frame = ManiaReplayFrame(int(action[0]), int(action[1]))
-			
-			self.frames.append(frame)
+		self.lzma_length = self.__reader.read_i32()
+		self.lzma_offset = self.__reader.offset
+
+		if frames == "skip":
+			self.frames = ReplayFrames(self.mode)
+			self.__reader.skip(self.lzma_length)
+		elif frames == "lazy":
+			lzma_data = self.__reader.read(self.lzma_length)
+			self.frames = ReplayFrames.lazy(
+				self.mode, lambda lazy_frames: self.load_frames(lazy_frames, lzma_data, observer)
+			)
+		else:
+			with self.__reader.read_view(self.lzma_length) as lzma_data:
+				self.parse_frames(lzma_data, observer)
 
 		# Reference: https://github.com/ppy/osu/blob/84e1ff79a0736aa6c7a44804b585ab1c54a84399/osu.Game/Scoring/Legacy/LegacyScoreDecoder.cs#L78-L81
 		if self.osu_version >= 20140721:
@@ -121,4 +293,90 @@ class ReplayFile:
 		if self.mods & 8388608:
 			self.target_practice_hits = self.__reader.read_f64()
 
-		return self
\ No newline at end of file
+		# Reader is not needed anymore, let the buffer go.
+		self.__reader.close()
+		self.__reader = None
+		return self
+
+	def parse_header(self) -> None:
+		"""Parses replay header (everything before frame data)."""
+		self.mode = self.__reader.read_u8()
+		self.osu_version = self.__reader.read_i32()
+		self.empty_strings = set()
+		self.map_md5 = self.read_header_string("map_md5")
+		self.player_name = self.read_header_string("player_name")
+		self.replay_md5 = self.read_header_string("replay_md5")
+		(
+			self.n300, self.n100, self.n50, self.ngeki, self.nkatu, self.nmiss,
+			self.score, self.max_combo, perfect, self.mods,
+		) = self.__reader.unpack(SCORE_LAYOUT)
+		self.perfect = perfect == 1
+		self.life_graph = self.read_header_string("life_graph")
+		self.timestamp = self.__reader.read_i64()
+
+	def read_header_string(self, name: str) -> str:
+		"""Reads header string, remembering whether an empty one was stored as present."""
+		value = self.__reader.read_optional_string()
+		if value == "":
+			self.empty_strings.add(name)
+		return value or ""
+
+	def to_bytes(self, preset: Optional[int] = None, filters: Optional[list] = None) -> bytes:
+		"""Encodes replay into .osr bytes, see `write`."""
+		stream = io.BytesIO()
+		self.write(stream, preset, filters)
+		return stream.getvalue()
+
+	def write(self, stream: BinaryIO, preset: Optional[int] = None, filters: Optional[list] = None) -> None:
+		"""Encodes replay into binary file object, inverse of `from_bytes`.
+
+		Frames are compressed while being written, `preset`/`filters` are
+		passed to lzma. Seekable streams get frame data length patched in
+		afterwards, others have frame data buffered first.
+		"""
+		if self.frames_mode == "skip":
+			raise ValueError("Replay frames were not decoded! Expected frames= \"eager\" or \"lazy\", got \"skip\"")
+
+		writer = BinaryWriter(stream)
+		self.write_header(writer)
+
+		seed = self.seed if self.osu_version >= SEED_FRAME_VERSION else None
+		chunks = iter_compressed_frames(self.frames, seed, preset, filters)
+		if stream.seekable():
+			length_offset = stream.tell()
+			writer.write_i32(0)
+			length = 0
+			for chunk in chunks:
+				stream.write(chunk)
+				length += len(chunk)
+			end = stream.tell()
+			stream.seek(length_offset)
+			writer.write_i32(length)
+			stream.seek(end)
+		else:
+			lzma_data = b"".join(chunks)
+			writer.write_i32(len(lzma_data))
+			stream.write(lzma_data)
+
+		if self.osu_version >= 20140721:
+			writer.write_i64(self.score_id)
+		elif self.osu_version >= 20121008:
+			writer.write_i32(self.score_id)
+
+		if self.mods & 8388608:
+			writer.write_f64(self.target_practice_hits)
+
+	def write_header(self, writer: BinaryWriter) -> None:
+		"""Writes replay header (everything before frame data)."""
+		writer.write_u8(self.mode)
+		writer.write_i32(self.osu_version)
+		writer.write_string(self.map_md5, "map_md5" in self.empty_strings)
+		writer.write_string(self.player_name, "player_name" in self.empty_strings)
+		writer.write_string(self.replay_md5, "replay_md5" in self.empty_strings)
+		writer.pack(
+			SCORE_LAYOUT,
+			self.n300, self.n100, self.n50, self.ngeki, self.nkatu, self.nmiss,
+			self.score, self.max_combo, int(self.perfect), self.mods,
+		)
+		writer.write_string(self.life_graph, "life_graph" in self.empty_strings)
+		writer.write_i64(self.timestamp)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import struct
+from .frames import ReplayFrames
+from .frames import FRAME_COLUMNS
+from ..snapshot import SnapshotReader
+from ..snapshot import SnapshotWriter
+from ..snapshot import KIND_REPLAY
+
+# Scalar fields of ReplayFile, (attribute, struct code).
+REPLAY_FIELDS = (
+	("mode", "B"),
+	("osu_version", "i"),
+	("n300", "H"),
+	("n100", "H"),
+	("n50", "H"),
+	("ngeki", "H"),
+	("nkatu", "H"),
+	("nmiss", "H"),
+	("score", "i"),
+	("max_combo", "H"),
+	("perfect", "?"),
+	("mods", "i"),
+	("timestamp", "q"),
+	("score_id", "q"),
+	("seed", "q"),
+	("target_practice_hits", "d"),
+	("lzma_offset", "q"),
+	("lzma_length", "q"),
+)
+REPLAY_LAYOUT = struct.Struct("<" + "".join(code for _, code in REPLAY_FIELDS))
+
+REPLAY_STRINGS = ("map_md5", "player_name", "replay_md5", "life_graph")
+
+def write_replay(replay) -> bytes:
+	"""Lays parsed ReplayFile out into a snapshot."""
+	writer = SnapshotWriter(KIND_REPLAY)
+	writer.add_struct("fields", REPLAY_LAYOUT, tuple(
+		getattr(replay, name) or 0 for name, _ in REPLAY_FIELDS))
+	writer.add_strings("strings", [getattr(replay, name) for name in REPLAY_STRINGS])
+	# Names of empty header strings stored present, see ReplayFile.empty_strings.
+	writer.add_strings("present", [ name for name in REPLAY_STRINGS if name in replay.empty_strings ])
+	for name in FRAME_COLUMNS:
+		writer.add_array(name, getattr(replay.frames, name))
+
+	return writer.to_bytes()
+
+def read_replay(replay, reader: SnapshotReader):
+	"""Fills ReplayFile from snapshot, frames stay in the buffer."""
+	for (name, _), value in zip(REPLAY_FIELDS, reader.read_struct("fields", REPLAY_LAYOUT)):
+		setattr(replay, name, value)
+	for name, value in zip(REPLAY_STRINGS, reader.read_strings("strings")):
+		setattr(replay, name, value)
+	if "present" in reader.sections:
+		replay.empty_strings = set(reader.read_strings("present"))
+
+	replay.frames = ReplayFrames.from_columns(replay.mode, {
+		name: reader.read_array(name, code) for name, code in FRAME_COLUMNS.items()
+	}, replay.seed)
+	return replay
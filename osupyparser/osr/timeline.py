@@ -0,0 +1,149 @@
+from .frames import ReplayFrames
+from .constants import ReplayFrame
+from bisect import bisect_left
+from bisect import bisect_right
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from array import array
+
+try:
+	import numpy
+except ImportError: # NumPy is optional.
+	numpy = None
+
+# Position of the two placeholder frames stable writes at replay start.
+PLACEHOLDER_POSITION = (256.0, -500.0)
+
+
+class ReplayTimeline:
+	"""Playable replay frames indexed by absolute time, for O(log n) queries.
+
+	Absolute times are the prefix sums of deltas (`ReplayFrames.time`, the
+	seed frame is already removed by the parser). Like the game, the two
+	leading (256, -500) placeholder frames and frames with negative delta
+	(skips) only count towards time. Frames going back before an already
+	kept frame are dropped too, so kept times never decrease.
+	"""
+
+	def __init__(self, frames: ReplayFrames) -> None:
+		self.frames: ReplayFrames = frames
+		# Amount of frames timeline was built from, skipped ones included.
+		self.frame_count: int = len(frames)
+		# Index into `frames` of every kept frame.
+		self.indices: array = array("I")
+		# Absolute time of every kept frame, non decreasing.
+		self.times: array = array("q")
+
+		times, deltas, xs, ys = frames.time, frames.delta, frames.x, frames.y
+		last_time = None
+		for i in range(len(frames)):
+			time = times[i]
+			if deltas[i] < 0 or (i < 2 and (xs[i], ys[i]) == PLACEHOLDER_POSITION):
+				continue
+			if last_time is not None and time < last_time:
+				continue
+
+			self.indices.append(i)
+			self.times.append(time)
+			last_time = time
+
+	@classmethod
+	def from_replay(cls, replay) -> "ReplayTimeline":
+		"""Timeline of replay frames."""
+		return cls(replay.frames)
+
+	def __len__(self) -> int:
+		return len(self.times)
+
+	def __repr__(self) -> str:
+		if not self.times:
+			return "<ReplayTimeline frames=0>"
+		return f"<ReplayTimeline frames={len(self)} start={self.times[0]} end={self.times[-1]}>"
+
+	@property
+	def start(self) -> Optional[int]:
+		"""Time of first kept frame."""
+		return self.times[0] if self.times else None
+
+	@property
+	def end(self) -> Optional[int]:
+		"""Time of last kept frame."""
+		return self.times[-1] if self.times else None
+
+	def position(self, time: float) -> int:
+		"""Timeline position of last kept frame at or before time, -1 if none."""
+		return bisect_right(self.times, time) - 1
+
+	def index_at(self, time: float) -> int:
+		"""Frame index of the state at time (last kept frame at or before it), -1 if none."""
+		position = bisect_right(self.times, time) - 1
+		return self.indices[position] if position >= 0 else -1
+
+	def frame_at(self, time: float) -> Optional[ReplayFrame]:
+		"""Frame in effect at time, None before the first one."""
+		index = self.index_at(time)
+		return self.frames.frame_at(index) if index >= 0 else None
+
+	def keys_at(self, time: float) -> int:
+		"""Keys held at time, the column bitmask (x) for mania."""
+		index = self.index_at(time)
+		if index < 0:
+			return 0
+		if self.frames.mode == 3:
+			return int(self.frames.x[index])
+
+		return self.frames.keys[index]
+
+	def position_at(self, time: float) -> Tuple[float, float]:
+		"""Cursor position at time, linearly interpolated between kept frames.
+
+		Times outside of the timeline give the first or last position.
+		"""
+		times, indices, xs, ys = self.times, self.indices, self.frames.x, self.frames.y
+		if not times:
+			raise ValueError("Replay has no playable frames! Excepted: at least 1, got 0")
+
+		position = bisect_right(times, time)
+		if position == 0:
+			return xs[indices[0]], ys[indices[0]]
+		if position == len(times):
+			return xs[indices[-1]], ys[indices[-1]]
+
+		a, b = indices[position - 1], indices[position]
+		start, end = times[position - 1], times[position]
+		# Equal times can not be bracketed by bisect_right, end > start here.
+		w = (time - start) / (end - start)
+		return xs[a] + (xs[b] - xs[a]) * w, ys[a] + (ys[b] - ys[a]) * w
+
+	def positions_at(self, times: Iterable[float]) -> Tuple[List[float], List[float]]:
+		"""Batched `position_at`, vectorised with NumPy when installed."""
+		if numpy is not None and self.times:
+			indices = numpy.asarray(self.indices, dtype=numpy.int64)
+			frame_times = numpy.asarray(self.times, dtype=numpy.float64)
+			queries = numpy.asarray(list(times), dtype=numpy.float64)
+			xs = numpy.interp(queries, frame_times, numpy.asarray(self.frames.x)[indices])
+			ys = numpy.interp(queries, frame_times, numpy.asarray(self.frames.y)[indices])
+			return xs.tolist(), ys.tolist()
+
+		xs, ys = [], []
+		for time in times:
+			x, y = self.position_at(time)
+			xs.append(x)
+			ys.append(y)
+
+		return xs, ys
+
+	def span(self, start: float, end: float) -> Tuple[int, int]:
+		"""Timeline positions [first, last) of kept frames with start <= time <= end."""
+		return bisect_left(self.times, start), bisect_right(self.times, end)
+
+	def indices_between(self, start: float, end: float) -> array:
+		"""Frame indices of kept frames with start <= time <= end."""
+		first, last = self.span(start, end)
+		return self.indices[first:last]
+
+	def frames_between(self, start: float, end: float) -> List[ReplayFrame]:
+		"""Frames with start <= time <= end."""
+		return [ self.frames.frame_at(i) for i in self.indices_between(start, end) ]
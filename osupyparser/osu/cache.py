@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from .osu_parser import OsuFile
+from .constants import PARSER_VERSION
+
+# Disk entry header: magic and parser version.
+DISK_HEADER = struct.Struct("<4sI")
+DISK_MAGIC = b"OPBC"
+
+
+@dataclass
+class CacheStats:
+    """Counters of a BeatmapCache."""
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class BeatmapCache:
+    """Two tier cache of parsed beatmaps keyed by md5.
+
+    First tier is an in-process LRU bounded by entry count and (optionally)
+    by bytes, second an optional directory of pickled beatmaps. Disk
+    entries written by another parser version are dropped on read.
+    Returned beatmaps are shared, they should not be mutated. Disk entries
+    are pickles, so the directory must only be writable by trusted code.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        max_bytes: Optional[int] = None,
+        directory: Optional[str] = None,
+        compact: bool = False,
+    ) -> None:
+        self.max_entries: int = max_entries
+        self.max_bytes: Optional[int] = max_bytes
+        self.directory: Optional[str] = directory
+        self.compact: bool = compact
+        self.stats: CacheStats = CacheStats()
+
+        # md5 -> (beatmap, size in bytes).
+        self.__entries: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, md5: str) -> bool:
+        return md5 in self.__entries
+
+    def get(self, md5: str) -> Optional[OsuFile]:
+        """Finds beatmap by md5 in memory, then on disk."""
+        with self.__lock:
+            entry = self.__entries.get(md5)
+            if entry is not None:
+                self.__entries.move_to_end(md5)
+                self.stats.hits += 1
+                return entry[0]
+
+        data = self.__read_disk(md5)
+        if data is None:
+            with self.__lock:
+                self.stats.misses += 1
+            return None
+
+        beatmap = pickle.loads(data)
+        with self.__lock:
+            self.stats.disk_hits += 1
+            self.__insert(md5, beatmap, len(data))
+        return beatmap
+
+    def put(self, beatmap: OsuFile) -> None:
+        """Stores parsed beatmap under its md5."""
+        data = pickle.dumps(beatmap, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.__lock:
+            self.__insert(beatmap.md5, beatmap, len(data))
+        self.__write_disk(beatmap.md5, data)
+
+    def parse_bytes(self, data: bytes) -> OsuFile:
+        """Returns cached beatmap for bytes data, parsing it on miss."""
+        beatmap = self.get(hashlib.md5(data).hexdigest())
+        if beatmap is None:
+            beatmap = OsuFile.from_bytes(data, compact=self.compact)
+            self.put(beatmap)
+
+        return beatmap
+
+    def parse_file(self, file_path: str) -> OsuFile:
+        """Returns cached beatmap for file path, parsing it on miss."""
+        with open(file_path, "rb") as stream:
+            return self.parse_bytes(stream.read())
+
+    def clear(self, disk: bool = False) -> None:
+        """Drops memory entries (and disk entries if `disk` is set)."""
+        with self.__lock:
+            self.__entries.clear()
+            self.stats.entries = self.stats.bytes = 0
+
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".osu.cache"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def __insert(self, md5: str, beatmap: OsuFile, size: int) -> None:
+        previous = self.__entries.pop(md5, None)
+        if previous is not None:
+            self.stats.bytes -= previous[1]
+
+        self.__entries[md5] = (beatmap, size)
+        self.stats.bytes += size
+
+        while self.__entries and (
+            len(self.__entries) > self.max_entries
+            or (self.max_bytes is not None and self.stats.bytes > self.max_bytes)
+        ):
+            _, (_, evicted_size) = self.__entries.popitem(last=False)
+            self.stats.bytes -= evicted_size
+            self.stats.evictions += 1
+
+        self.stats.entries = len(self.__entries)
+
+    def __disk_path(self, md5: str) -> str:
+        return os.path.join(self.directory, f"{md5}.osu.cache")
+
+    def __read_disk(self, md5: str) -> Optional[bytes]:
+        if self.directory is None:
+            return None
+
+        path = self.__disk_path(md5)
+        try:
+            with open(path, "rb") as stream:
+                data = stream.read()
+        except FileNotFoundError:
+            return None
+
+        if len(data) < DISK_HEADER.size or DISK_HEADER.unpack_from(data) != (DISK_MAGIC, PARSER_VERSION):
+            # Written by other parser version (or broken), drop it.
+            with self.__lock:
+                self.stats.invalidations += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+        return data[DISK_HEADER.size:]
+
+    def __write_disk(self, md5: str, data: bytes) -> None:
+        if self.directory is None:
+            return
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(DISK_HEADER.pack(DISK_MAGIC, PARSER_VERSION))
+            stream.write(data)
+        # Replace is atomic, readers never see half written entry.
+        os.replace(temp_path, self.__disk_path(md5))
@@ -6,10 +6,81 @@ class ObjectType:
   COMBO_OFFSET = (1 << 4) | (1 << 5) | (1 << 6)
   HOLD = 1 << 7
 
+class Mods:
+  NOMOD = 0
+  NOFAIL = 1
+  EASY = 1 << 1
+  TOUCH_DEVICE = 1 << 2
+  HIDDEN = 1 << 3
+  HARDROCK = 1 << 4
+  SUDDEN_DEATH = 1 << 5
+  DOUBLE_TIME = 1 << 6
+  RELAX = 1 << 7
+  HALF_TIME = 1 << 8
+  NIGHTCORE = 1 << 9
+  FLASHLIGHT = 1 << 10
+  AUTOPLAY = 1 << 11
+  SPUN_OUT = 1 << 12
+  AUTOPILOT = 1 << 13
+  PERFECT = 1 << 14
+  TARGET_PRACTICE = 1 << 23
+
+  SPEED_CHANGING = DOUBLE_TIME | HALF_TIME | NIGHTCORE
+  MAP_CHANGING = EASY | HARDROCK | SPEED_CHANGING
+  # Mods changing difficulty (star rating) of osu!standard map.
+  DIFFICULTY_CHANGING = MAP_CHANGING | TOUCH_DEVICE
+
 OSU_FILE_HEADER = "osu file format v"
+# Bump whenever parsed OsuFile contents change, invalidates cached beatmaps.
+PARSER_VERSION = 5
 CURVE_TYPES = {
     "C": "Catmull",
     "B": "Bezier",
     "L": "Linear",
     "P": "Pass-Through"
+}
+
+def parse_flag(value: str) -> bool:
+  """Converts "0"/"1" field into bool."""
+  return value == "1"
+
+# Key/value sections: section -> key -> (attribute, converter).
+SECTION_SCHEMA = {
+    "general": {
+        "AudioFilename": ("audio_filename", str),
+        "AudioLeadIn": ("audio_lead_in", int),
+        "PreviewTime": ("preview_time", int),
+        "Countdown": ("countdown", int),
+        "SampleSet": ("sample_set", str),
+        "StackLeniency": ("stack_leniency", float),
+        "Mode": ("mode", int),
+        "LetterboxInBreaks": ("letterbox_in_breaks", parse_flag),
+        "WidescreenStoryboard": ("widescreen_storyboard", parse_flag),
+    },
+    "editor": {
+        "DistanceSpacing": ("distance_spacing", float),
+        "BeatDivisor": ("beat_divisor", int),
+        "GridSize": ("grid_size", int),
+        "TimelineZoom": ("timeline_zoom", float),
+    },
+    "metadata": {
+        "Title": ("title", str),
+        "TitleUnicode": ("title_unicode", str),
+        "Artist": ("artist", str),
+        "ArtistUnicode": ("artist_unicode", str),
+        "Creator": ("creator", str),
+        "Version": ("version", str),
+        "Source": ("source", str),
+        "Tags": ("tags", str),
+        "BeatmapID": ("beatmap_id", int),
+        "BeatmapSetID": ("beatmap_set_id", int),
+    },
+    "difficulty": {
+        "HPDrainRate": ("hp", float),
+        "CircleSize": ("cs", float),
+        "OverallDifficulty": ("od", float),
+        "ApproachRate": ("ar", float),
+        "SliderMultiplier": ("slider_multiplier", float),
+        "SliderTickRate": ("slider_tick_rate", float),
+    },
 }
\ No newline at end of file
@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+import math
+from array import array
+from bisect import bisect_left
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from .constants import CURVE_TYPES
+from .constants import ObjectType
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional.
+    numpy = None
+
+Point = Tuple[float, float]
+
+# Curve name -> letter used in .osu files.
+CURVE_LETTERS = {name: letter for letter, name in CURVE_TYPES.items()}
+
+# Approximation constants, same as the game uses.
+# Reference: https://github.com/ppy/osu-framework/blob/master/osu.Framework/Utils/PathApproximator.cs
+BEZIER_TOLERANCE = 0.25
+CIRCULAR_ARC_TOLERANCE = 0.1
+CATMULL_DETAIL = 50
+
+
+def _bezier_is_flat_enough(points: List[Point]) -> bool:
+    for i in range(1, len(points) - 1):
+        x = points[i - 1][0] - 2 * points[i][0] + points[i + 1][0]
+        y = points[i - 1][1] - 2 * points[i][1] + points[i + 1][1]
+        if x * x + y * y > BEZIER_TOLERANCE * BEZIER_TOLERANCE * 4:
+            return False
+
+    return True
+
+
+def _bezier_subdivide(points: List[Point]) -> Tuple[List[Point], List[Point]]:
+    count = len(points)
+    midpoints = list(points)
+    left = [None] * count
+    right = [None] * count
+
+    for i in range(count):
+        left[i] = midpoints[0]
+        right[count - i - 1] = midpoints[count - i - 1]
+        for j in range(count - i - 1):
+            midpoints[j] = (
+                (midpoints[j][0] + midpoints[j + 1][0]) / 2,
+                (midpoints[j][1] + midpoints[j + 1][1]) / 2,
+            )
+
+    return left, right
+
+
+def _bezier_approximate(points: List[Point], output: List[Point]) -> None:
+    count = len(points)
+    left, right = _bezier_subdivide(points)
+    left = left + right[1:]
+
+    output.append(points[0])
+    for i in range(1, count - 1):
+        index = 2 * i
+        output.append((
+            0.25 * (left[index - 1][0] + 2 * left[index][0] + left[index + 1][0]),
+            0.25 * (left[index - 1][1] + 2 * left[index][1] + left[index + 1][1]),
+        ))
+
+
+def approximate_bezier(points: List[Point]) -> List[Point]:
+    """Flattens bezier curve into polyline by adaptive subdivision."""
+    output = []
+    if not points:
+        return output
+
+    to_flatten = [list(points)]
+    while to_flatten:
+        parent = to_flatten.pop()
+        if _bezier_is_flat_enough(parent):
+            _bezier_approximate(parent, output)
+            continue
+
+        left, right = _bezier_subdivide(parent)
+        to_flatten.append(right)
+        to_flatten.append(left)
+
+    output.append(points[-1])
+    return output
+
+
+def _catmull_point(v1: Point, v2: Point, v3: Point, v4: Point, t: float) -> Point:
+    t2 = t * t
+    t3 = t * t2
+    return tuple(
+        0.5 * (
+            2 * v2[i] + (-v1[i] + v3[i]) * t
+            + (2 * v1[i] - 5 * v2[i] + 4 * v3[i] - v4[i]) * t2
+            + (-v1[i] + 3 * v2[i] - 3 * v3[i] + v4[i]) * t3
+        )
+        for i in (0, 1)
+    )
+
+
+def approximate_catmull(points: List[Point]) -> List[Point]:
+    """Flattens catmull-rom curve into polyline."""
+    output = []
+    count = len(points)
+
+    for i in range(count - 1):
+        v1 = points[i - 1] if i > 0 else points[i]
+        v2 = points[i]
+        v3 = points[i + 1] if i < count - 1 else (2 * v2[0] - v1[0], 2 * v2[1] - v1[1])
+        v4 = points[i + 2] if i < count - 2 else (2 * v3[0] - v2[0], 2 * v3[1] - v2[1])
+
+        for c in range(CATMULL_DETAIL):
+            output.append(_catmull_point(v1, v2, v3, v4, c / CATMULL_DETAIL))
+            output.append(_catmull_point(v1, v2, v3, v4, (c + 1) / CATMULL_DETAIL))
+
+    return output
+
+
+def approximate_circular_arc(points: List[Point]) -> List[Point]:
+    """Flattens arc through 3 points, empty list if points are degenerate."""
+    (ax, ay), (bx, by), (cx, cy) = points
+
+    a_sq = (bx - cx) ** 2 + (by - cy) ** 2
+    b_sq = (ax - cx) ** 2 + (ay - cy) ** 2
+    c_sq = (ax - bx) ** 2 + (ay - by) ** 2
+    if min(a_sq, b_sq, c_sq) < 1e-3:
+        return []
+
+    s = a_sq * (b_sq + c_sq - a_sq)
+    t = b_sq * (a_sq + c_sq - b_sq)
+    u = c_sq * (a_sq + b_sq - c_sq)
+    total = s + t + u
+    if abs(total) < 1e-3:
+        return []  # Points are on a line.
+
+    centre_x = (s * ax + t * bx + u * cx) / total
+    centre_y = (s * ay + t * by + u * cy) / total
+    radius = math.hypot(ax - centre_x, ay - centre_y)
+
+    theta_start = math.atan2(ay - centre_y, ax - centre_x)
+    theta_end = math.atan2(cy - centre_y, cx - centre_x)
+    while theta_end < theta_start:
+        theta_end += 2 * math.pi
+
+    direction = 1
+    theta_range = theta_end - theta_start
+    # Arc goes the other way if b is on the other side of a -> c line.
+    if (cy - ay) * (bx - ax) - (cx - ax) * (by - ay) < 0:
+        direction = -1
+        theta_range = 2 * math.pi - theta_range
+
+    if 2 * radius <= CIRCULAR_ARC_TOLERANCE:
+        amount = 2
+    else:
+        amount = max(2, math.ceil(
+            theta_range / (2 * math.acos(1 - CIRCULAR_ARC_TOLERANCE / radius))))
+
+    output = []
+    for i in range(amount):
+        theta = theta_start + direction * i / (amount - 1) * theta_range
+        output.append((
+            centre_x + radius * math.cos(theta),
+            centre_y + radius * math.sin(theta),
+        ))
+
+    return output
+
+
+def split_segments(points: List[Point]) -> List[List[Point]]:
+    """Splits control points on repeated (red) anchors."""
+    segments = [[points[0]]]
+    for previous, point in zip(points, points[1:]):
+        if point == previous:
+            segments.append([point])
+        else:
+            segments[-1].append(point)
+
+    return segments
+
+
+def flatten_curve(curve_type: str, points: List[Point]) -> List[Point]:
+    """Flattens control points of given curve type (letter) into polyline."""
+    if len(points) < 2:
+        return list(points)
+
+    if curve_type == "C":
+        # Catmull sliders have no segments.
+        return approximate_catmull(points)
+
+    if curve_type == "P" and len(points) == 3:
+        arc = approximate_circular_arc(points)
+        if arc:
+            return arc
+        curve_type = "B"  # Degenerate arc falls back to bezier.
+
+    output = []
+    for segment in split_segments(points):
+        if curve_type == "L":
+            flat = segment
+        else:
+            flat = approximate_bezier(segment)
+
+        for point in flat:
+            if not output or output[-1] != point:
+                output.append(point)
+
+    return output
+
+
+class SliderPath:
+    """Flattened slider path truncated (or extended) to its pixel length.
+
+    Cumulative arc lengths are cached, so positions along the path are
+    found by binary search.
+    """
+
+    def __init__(self, curve_type: str, points: Sequence[Point], pixel_length: Optional[float] = None) -> None:
+        self.curve_type: str = CURVE_LETTERS.get(curve_type, curve_type)
+        self.control_points: List[Point] = [(float(x), float(y)) for x, y in points]
+
+        path = flatten_curve(self.curve_type, self.control_points)
+        self.xs: array = array("d", (point[0] for point in path))
+        self.ys: array = array("d", (point[1] for point in path))
+        self.lengths: array = array("d")
+        self.__calculate_length(pixel_length)
+
+    @classmethod
+    def from_slider(cls, slider) -> "SliderPath":
+        """Builds path of a parsed Slider."""
+        points = [(slider.pos.x, slider.pos.y)]
+        points.extend((point.x, point.y) for point in slider.points)
+        return cls(slider.curve_type or "B", points, slider.pixel_length)
+
+    # Reference: https://github.com/ppy/osu/blob/master/osu.Game/Rulesets/Objects/SliderPath.cs
+    def __calculate_length(self, expected: Optional[float]) -> None:
+        xs, ys, lengths = self.xs, self.ys, self.lengths
+        total = 0.0
+        lengths.append(0.0)
+        for i in range(1, len(xs)):
+            total += math.hypot(xs[i] - xs[i - 1], ys[i] - ys[i - 1])
+            lengths.append(total)
+
+        if expected is None or expected <= 0 or total == expected:
+            return
+
+        points = self.control_points
+        if len(points) >= 2 and points[-1] == points[-2] and expected > total:
+            # The game doesn't extend sliders ending on a red anchor.
+            return
+
+        # Last length is always replaced.
+        lengths.pop()
+        end = len(xs) - 1
+        if total > expected:
+            while lengths and lengths[-1] >= expected:
+                lengths.pop()
+                xs.pop()
+                ys.pop()
+                end -= 1
+
+        if end <= 0:
+            del xs[1:], ys[1:]
+            self.lengths = array("d", [0.0])
+            return
+
+        # Move last point along its segment to match the length.
+        dx = xs[end] - xs[end - 1]
+        dy = ys[end] - ys[end - 1]
+        norm = math.hypot(dx, dy) or 1.0
+        remaining = expected - lengths[-1]
+        xs[end] = xs[end - 1] + dx / norm * remaining
+        ys[end] = ys[end - 1] + dy / norm * remaining
+        lengths.append(expected)
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    @property
+    def distance(self) -> float:
+        """Length of path in osu!pixels."""
+        return self.lengths[-1] if self.lengths else 0.0
+
+    @property
+    def end_position(self) -> Point:
+        """Position at the end of one slider pass."""
+        return self.position_at(1.0)
+
+    def position_at(self, progress: float) -> Point:
+        """Position at given progress (0-1) of one pass along the path."""
+        xs, ys, lengths = self.xs, self.ys, self.lengths
+        if len(xs) == 1:
+            return xs[0], ys[0]
+
+        d = min(1.0, max(0.0, progress)) * self.distance
+        index = min(max(bisect_left(lengths, d), 1), len(lengths) - 1)
+
+        start, end = lengths[index - 1], lengths[index]
+        w = 0.0 if end == start else (d - start) / (end - start)
+        return (
+            xs[index - 1] + (xs[index] - xs[index - 1]) * w,
+            ys[index - 1] + (ys[index] - ys[index - 1]) * w,
+        )
+
+    def position_along(self, progress: float, repeat_count: int) -> Point:
+        """Position at progress (0-1) of whole slider, going back on repeats."""
+        span = min(1.0, max(0.0, progress)) * repeat_count
+        span_index = min(int(span), repeat_count - 1)
+        span_progress = span - span_index
+        if span_index % 2:
+            span_progress = 1 - span_progress
+
+        return self.position_at(span_progress)
+
+
+class SliderPaths:
+    """Paths of all sliders of a map in flat arrays, for batched evaluation.
+
+    Indexed by hit object index, objects which are not sliders have an
+    empty path. Batched lookups use NumPy when it is installed.
+    """
+
+    def __init__(self, paths: List[Optional[SliderPath]]) -> None:
+        self.paths: List[Optional[SliderPath]] = paths
+        self.offsets: array = array("I", [0])
+        self.xs: array = array("d")
+        self.ys: array = array("d")
+        self.lengths: array = array("d")
+        self.distances: array = array("d")
+
+        for path in paths:
+            if path is not None:
+                self.xs.extend(path.xs)
+                self.ys.extend(path.ys)
+                self.lengths.extend(path.lengths)
+            self.offsets.append(len(self.xs))
+            self.distances.append(path.distance if path is not None else 0.0)
+
+    @classmethod
+    def from_beatmap(cls, beatmap) -> "SliderPaths":
+        """Builds paths of every slider of parsed OsuFile."""
+        store = beatmap.hit_object_store
+        if store is None:
+            return cls([
+                SliderPath.from_slider(hitobject) if hasattr(hitobject, "curve_type") else None
+                for hitobject in beatmap.hit_objects
+            ])
+
+        paths = []
+        for i in range(len(store)):
+            if store.kind[i] != ObjectType.SLIDER:
+                paths.append(None)
+                continue
+
+            start, end = store.point_offsets[i], store.point_offsets[i + 1]
+            points = [(store.x[i], store.y[i])]
+            points.extend(zip(store.point_x[start:end], store.point_y[start:end]))
+            curve_type = chr(store.curve_type[i]) if store.curve_type[i] else "B"
+            paths.append(SliderPath(curve_type, points, store.pixel_length[i]))
+
+        return cls(paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, index: int) -> Optional[SliderPath]:
+        return self.paths[index]
+
+    def path_of(self, index: int) -> SliderPath:
+        """Path of slider at hit object index, which has to be a slider."""
+        if not 0 <= index < len(self.paths):
+            raise IndexError(f"Hit object index out of range! Expected: 0-{len(self.paths) - 1}, got {index}")
+
+        path = self.paths[index]
+        if path is None:
+            raise ValueError(f"Hit object is not a slider! Expected: slider index, got {index}")
+        return path
+
+    def positions_at(self, indices: Sequence[int], progresses: Sequence[float]):
+        """Positions of many (object index, progress) pairs at once.
+
+        Returns (xs, ys), NumPy arrays if NumPy is installed. Indices of
+        objects which are not sliders raise ValueError, out of range ones
+        IndexError.
+        """
+        if numpy is None:
+            xs, ys = array("d"), array("d")
+            for index, progress in zip(indices, progresses):
+                x, y = self.path_of(index).position_at(progress)
+                xs.append(x)
+                ys.append(y)
+            return xs, ys
+
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        progresses = numpy.clip(numpy.asarray(progresses, dtype=numpy.float64), 0.0, 1.0)
+        offsets = numpy.frombuffer(self.offsets, dtype=numpy.uint32).astype(numpy.int64)
+
+        # Same errors as path_of, raised by it for the first bad index.
+        bad = (indices < 0) | (indices >= len(self.paths))
+        if not bad.any():
+            bad = offsets[indices + 1] == offsets[indices]
+        if bad.any():
+            self.path_of(int(indices[bad][0]))
+        distances = numpy.frombuffer(self.distances, dtype=numpy.float64)
+        lengths = numpy.frombuffer(self.lengths, dtype=numpy.float64)
+        xs = numpy.frombuffer(self.xs, dtype=numpy.float64)
+        ys = numpy.frombuffer(self.ys, dtype=numpy.float64)
+
+        # Shift every path's lengths past the previous one, so all of them
+        # can be searched at once.
+        bases = numpy.concatenate(([0.0], numpy.cumsum(distances + 1.0)[:-1]))
+        counts = numpy.diff(offsets)
+        flat = lengths + numpy.repeat(bases, counts)
+
+        start = offsets[indices]
+        end = offsets[indices + 1]
+        d = progresses * distances[indices]
+        found = numpy.searchsorted(flat, bases[indices] + d, side="left")
+        found = numpy.minimum(numpy.maximum(found, start + 1), end - 1)
+        # Single point paths stay on their only point.
+        single = end - start < 2
+        found[single] = start[single]
+        previous = numpy.where(single, found, found - 1)
+
+        span = lengths[found] - lengths[previous]
+        weights = numpy.divide(
+            d - lengths[previous], span, out=numpy.zeros_like(span), where=span > 0)
+        return (
+            xs[previous] + (xs[found] - xs[previous]) * weights,
+            ys[previous] + (ys[found] - ys[previous]) * weights,
+        )
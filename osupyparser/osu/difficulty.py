@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+import math
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+from .constants import Mods
+from .constants import ObjectType
+from .mods import apply_mods
+from .store import object_kind
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional.
+    numpy = None
+
+# Reference https://github.com/Francesco149/pyttanko/blob/master/pyttanko.py#L732
+PLAYFIELD_WIDTH = 512.0
+# Circle radius below which small circles get buffed.
+CIRCLESIZE_BUFF_THRESHOLD = 30.0
+STAR_SCALING_FACTOR = 0.0675
+# Part of aim/speed difference added to stars, for aim or speed only maps.
+EXTREME_SCALING_FACTOR = 0.5
+
+# Strain peaks are taken per interval of this many ms (scaled by speed).
+STRAIN_STEP = 400.0
+# Weight decay of sorted strain peaks.
+DECAY_WEIGHT = 0.9
+SPEED_DECAY_BASE = 0.3
+AIM_DECAY_BASE = 0.15
+SPEED_WEIGHT_SCALING = 1400.0
+AIM_WEIGHT_SCALING = 26.25
+
+MIN_SPEED_BONUS = 75.0  # ~200BPM 1/4 streams.
+MAX_SPEED_BONUS = 45.0  # ~330BPM 1/4 streams.
+ANGLE_BONUS_SCALE = 90.0
+AIM_TIMING_THRESHOLD = 107.0
+SPEED_ANGLE_BONUS_BEGIN = 5 * math.pi / 6
+AIM_ANGLE_BONUS_BEGIN = math.pi / 3
+# Spacing above which a stream is hard to alternate.
+SINGLE_SPACING = 125.0
+
+
+@dataclass
+class DifficultyAttributes:
+    """osu!standard star rating of a beatmap with given mods."""
+    mods: int = 0
+    stars: float = 0.0
+    aim: float = 0.0
+    speed: float = 0.0
+    # Sums of strain peaks ** 1.2, input of length bonuses.
+    aim_difficulty: float = 0.0
+    speed_difficulty: float = 0.0
+    aim_length_bonus: float = 0.0
+    speed_length_bonus: float = 0.0
+    # Difficulty settings with mods applied.
+    ar: float = 0.0
+    od: float = 0.0
+    cs: float = 0.0
+    hp: float = 0.0
+    speed_multiplier: float = 1.0
+    max_combo: int = 0
+    ncircles: int = 0
+    nsliders: int = 0
+    nspinners: int = 0
+    nobjects: int = 0
+
+
+def aim_weight(distance: float, delta_time: float, prev_distance: float, prev_delta_time: float, angle: float) -> float:
+    """Aim spacing weight of an object, angle is NaN if unknown."""
+    strain_time = max(delta_time, 50.0)
+    prev_strain_time = max(prev_delta_time, 50.0)
+
+    result = 0.0
+    if angle > AIM_ANGLE_BONUS_BEGIN:
+        angle_bonus = math.sqrt(
+            max(prev_distance - ANGLE_BONUS_SCALE, 0.0)
+            * math.sin(angle - AIM_ANGLE_BONUS_BEGIN) ** 2
+            * max(distance - ANGLE_BONUS_SCALE, 0.0)
+        )
+        result = 1.5 * angle_bonus ** 0.99 / max(AIM_TIMING_THRESHOLD, prev_strain_time)
+
+    weighted_distance = distance ** 0.99
+    return max(
+        result + weighted_distance / max(AIM_TIMING_THRESHOLD, strain_time),
+        weighted_distance / strain_time,
+    )
+
+
+def speed_weight(distance: float, delta_time: float, angle: float) -> float:
+    """Speed spacing weight of an object, angle is NaN if unknown."""
+    strain_time = max(delta_time, 50.0)
+    distance = min(distance, SINGLE_SPACING)
+    delta_time = max(delta_time, MAX_SPEED_BONUS)
+
+    speed_bonus = 1.0
+    if delta_time < MIN_SPEED_BONUS:
+        speed_bonus += ((MIN_SPEED_BONUS - delta_time) / 40.0) ** 2
+
+    angle_bonus = 1.0
+    if angle < SPEED_ANGLE_BONUS_BEGIN:
+        angle_bonus += math.sin(1.5 * (SPEED_ANGLE_BONUS_BEGIN - angle)) ** 2 / 3.57
+        if angle < math.pi / 2.0:
+            angle_bonus = 1.28
+            if distance < ANGLE_BONUS_SCALE and angle < math.pi / 4.0:
+                angle_bonus += (1.0 - angle_bonus) * min((ANGLE_BONUS_SCALE - distance) / 10.0, 1.0)
+            elif distance < ANGLE_BONUS_SCALE:
+                angle_bonus += (
+                    (1.0 - angle_bonus)
+                    * min((ANGLE_BONUS_SCALE - distance) / 10.0, 1.0)
+                    * math.sin((math.pi / 2.0 - angle) * 4.0 / math.pi)
+                )
+
+    return (
+        (1 + (speed_bonus - 1) * 0.75) * angle_bonus
+        * (0.95 + speed_bonus * (distance / SINGLE_SPACING) ** 3.5)
+    ) / strain_time
+
+
+def object_values(
+    times: Sequence[int],
+    xs: Sequence[int],
+    ys: Sequence[int],
+    kinds: Sequence[int],
+    scaling: float,
+    rate: float,
+) -> Tuple[List[float], List[float], List[float]]:
+    """Scaled delta times, aim and speed strain values of every object."""
+    if numpy is not None:
+        return object_values_numpy(times, xs, ys, kinds, scaling, rate)
+
+    count = len(times)
+    center = PLAYFIELD_WIDTH / 2 * scaling  # Spinners sit at (256, 256) like in pyttanko.
+    norm_x = [center if kind == ObjectType.SPINNER else x * scaling for x, kind in zip(xs, kinds)]
+    norm_y = [center if kind == ObjectType.SPINNER else y * scaling for y, kind in zip(ys, kinds)]
+    hits = [kind in (ObjectType.CIRCLE, ObjectType.SLIDER) for kind in kinds]
+
+    deltas = [0.0] + [(time - prev) / rate for prev, time in zip(times, times[1:])]
+    distances = [0.0] + [
+        math.hypot(norm_x[i] - norm_x[i - 1], norm_y[i] - norm_y[i - 1]) if hits[i] else 0.0
+        for i in range(1, count)
+    ]
+    angles = [math.nan, math.nan][:count]
+    for i in range(2, count):
+        x1, y1 = norm_x[i - 2] - norm_x[i - 1], norm_y[i - 2] - norm_y[i - 1]
+        x2, y2 = norm_x[i] - norm_x[i - 1], norm_y[i] - norm_y[i - 1]
+        angles.append(abs(math.atan2(x1 * y2 - y1 * x2, x1 * x2 + y1 * y2)))
+
+    aim = [0.0] + [
+        aim_weight(distances[i], deltas[i], distances[i - 1], deltas[i - 1], angles[i]) * AIM_WEIGHT_SCALING
+        if hits[i] else 0.0
+        for i in range(1, count)
+    ]
+    speed = [0.0] + [
+        speed_weight(distances[i], deltas[i], angles[i]) * SPEED_WEIGHT_SCALING if hits[i] else 0.0
+        for i in range(1, count)
+    ]
+    return deltas, aim, speed
+
+
+def object_values_numpy(times, xs, ys, kinds, scaling: float, rate: float):
+    """`object_values` computed over whole columns with NumPy."""
+    count = len(times)
+    times = numpy.asarray(times, dtype=numpy.float64)
+    kinds = numpy.asarray(kinds)
+    spinners = kinds == ObjectType.SPINNER
+    hits = (kinds == ObjectType.CIRCLE) | (kinds == ObjectType.SLIDER)
+    center = PLAYFIELD_WIDTH / 2 * scaling
+    norm_x = numpy.where(spinners, center, numpy.asarray(xs, dtype=numpy.float64) * scaling)
+    norm_y = numpy.where(spinners, center, numpy.asarray(ys, dtype=numpy.float64) * scaling)
+
+    deltas = numpy.zeros(count)
+    deltas[1:] = numpy.diff(times) / rate
+    distances = numpy.zeros(count)
+    distances[1:] = numpy.hypot(numpy.diff(norm_x), numpy.diff(norm_y))
+    distances[~hits] = 0.0
+
+    angles = numpy.full(count, numpy.nan)
+    if count > 2:
+        x1, y1 = norm_x[:-2] - norm_x[1:-1], norm_y[:-2] - norm_y[1:-1]
+        x2, y2 = norm_x[2:] - norm_x[1:-1], norm_y[2:] - norm_y[1:-1]
+        angles[2:] = numpy.abs(numpy.arctan2(x1 * y2 - y1 * x2, x1 * x2 + y1 * y2))
+
+    prev_distances = numpy.concatenate(([0.0], distances[:-1]))
+    prev_deltas = numpy.concatenate(([0.0], deltas[:-1]))
+
+    with numpy.errstate(invalid="ignore"):
+        # Aim.
+        strain_times = numpy.maximum(deltas, 50.0)
+        prev_strain_times = numpy.maximum(prev_deltas, 50.0)
+        angle_bonus = numpy.sqrt(
+            numpy.maximum(prev_distances - ANGLE_BONUS_SCALE, 0.0)
+            * numpy.sin(angles - AIM_ANGLE_BONUS_BEGIN) ** 2
+            * numpy.maximum(distances - ANGLE_BONUS_SCALE, 0.0)
+        )
+        result = numpy.where(
+            angles > AIM_ANGLE_BONUS_BEGIN,
+            1.5 * angle_bonus ** 0.99 / numpy.maximum(AIM_TIMING_THRESHOLD, prev_strain_times),
+            0.0,
+        )
+        weighted = distances ** 0.99
+        aim = numpy.maximum(
+            result + weighted / numpy.maximum(AIM_TIMING_THRESHOLD, strain_times),
+            weighted / strain_times,
+        )
+
+        # Speed.
+        speed_distances = numpy.minimum(distances, SINGLE_SPACING)
+        speed_deltas = numpy.maximum(deltas, MAX_SPEED_BONUS)
+        speed_bonus = 1.0 + numpy.where(
+            speed_deltas < MIN_SPEED_BONUS, ((MIN_SPEED_BONUS - speed_deltas) / 40.0) ** 2, 0.0)
+        close = numpy.minimum((ANGLE_BONUS_SCALE - speed_distances) / 10.0, 1.0)
+        sharp = angles < math.pi / 2.0
+        near = speed_distances < ANGLE_BONUS_SCALE
+        angle_bonus = numpy.where(
+            angles < SPEED_ANGLE_BONUS_BEGIN,
+            1.0 + numpy.sin(1.5 * (SPEED_ANGLE_BONUS_BEGIN - angles)) ** 2 / 3.57,
+            1.0,
+        )
+        angle_bonus = numpy.where(sharp, 1.28, angle_bonus)
+        angle_bonus = numpy.where(
+            sharp & near & (angles < math.pi / 4.0),
+            1.28 - 0.28 * close,
+            numpy.where(
+                sharp & near,
+                1.28 - 0.28 * close * numpy.sin((math.pi / 2.0 - angles) * 4.0 / math.pi),
+                angle_bonus,
+            ),
+        )
+        speed = (
+            (1 + (speed_bonus - 1) * 0.75) * angle_bonus
+            * (0.95 + speed_bonus * (speed_distances / SINGLE_SPACING) ** 3.5)
+        ) / strain_times
+
+    aim = numpy.where(hits, aim * AIM_WEIGHT_SCALING, 0.0)
+    speed = numpy.where(hits, speed * SPEED_WEIGHT_SCALING, 0.0)
+    aim[0] = speed[0] = 0.0
+    return deltas.tolist(), aim.tolist(), speed.tolist()
+
+
+def strain_peaks(times: Sequence[int], deltas: List[float], values: List[float], decay_base: float, rate: float) -> List[float]:
+    """Highest strain of every STRAIN_STEP interval."""
+    strain_step = STRAIN_STEP * rate
+    interval_end = math.ceil(times[0] / strain_step) * strain_step
+    peaks = []
+    max_strain = prev_strain = 0.0
+
+    for i in range(1, len(times)):
+        strain = prev_strain * decay_base ** (deltas[i] / 1000.0) + values[i]
+        while times[i] > interval_end:
+            peaks.append(max_strain)
+            # Last object's strain, decayed until the next interval.
+            max_strain = prev_strain * decay_base ** ((interval_end - times[i - 1]) / 1000.0)
+            interval_end += strain_step
+
+        max_strain = max(max_strain, strain)
+        prev_strain = strain
+
+    peaks.append(max_strain)
+    return peaks
+
+
+def weigh_peaks(peaks: List[float]) -> Tuple[float, float]:
+    """Weighted sum of peaks (highest first) and sum of peaks ** 1.2."""
+    peaks = sorted(peaks, reverse=True)
+    difficulty = sum(peak * DECAY_WEIGHT ** i for i, peak in enumerate(peaks))
+    total = sum(peak ** 1.2 for peak in peaks)
+    return difficulty, total
+
+
+def length_bonus(stars: float, difficulty: float) -> float:
+    if stars <= 0:
+        return 0.0
+
+    return 0.32 + 0.5 * (math.log10(difficulty + stars) - math.log10(stars))
+
+
+def object_columns(beatmap) -> Tuple[Sequence[int], Sequence[int], Sequence[int], Sequence[int]]:
+    """Start times, x, y and kinds of beatmap hit objects."""
+    store = beatmap.hit_object_store
+    if store is not None:
+        return store.start_time, store.x, store.y, store.kind
+
+    objects = beatmap.hit_objects
+    return (
+        [hitobject.start_time for hitobject in objects],
+        [hitobject.pos.x for hitobject in objects],
+        [hitobject.pos.y for hitobject in objects],
+        [object_kind(hitobject) for hitobject in objects],
+    )
+
+
+class DifficultyCalculator:
+    """osu!standard aim/speed strain difficulty of a parsed beatmap.
+
+    Object columns are read once, results are cached per difficulty
+    changing mods (Mods.DIFFICULTY_CHANGING). Element-wise strain values
+    are computed over whole columns (with NumPy when installed), only the
+    strain decay and interval peaks run object by object.
+    """
+
+    def __init__(self, beatmap) -> None:
+        if beatmap.mode != 0:
+            raise ValueError(f"Difficulty is only implemented for osu!standard! Excepted mode: 0, got {beatmap.mode}")
+
+        self.beatmap = beatmap
+        self.times, self.xs, self.ys, self.kinds = object_columns(beatmap)
+        self.__cache: Dict[int, DifficultyAttributes] = {}
+
+    def calculate(self, mods: int = 0) -> DifficultyAttributes:
+        """Difficulty with mods, computed once per difficulty changing mods."""
+        mods &= Mods.DIFFICULTY_CHANGING
+        attributes = self.__cache.get(mods)
+        if attributes is None:
+            attributes = self.__cache[mods] = self.__calculate(mods)
+
+        return attributes
+
+    def __calculate(self, mods: int) -> DifficultyAttributes:
+        beatmap = self.beatmap
+        stats = apply_mods(mods, beatmap.ar, beatmap.od, beatmap.cs, beatmap.hp)
+        attributes = DifficultyAttributes(
+            mods=mods,
+            ar=stats.ar,
+            od=stats.od,
+            cs=stats.cs,
+            hp=stats.hp,
+            speed_multiplier=stats.speed_multiplier,
+            max_combo=beatmap.max_combo,
+            ncircles=beatmap.ncircles,
+            nsliders=beatmap.nsliders,
+            nspinners=beatmap.nspinners,
+            nobjects=len(self.times),
+        )
+        if not self.times:
+            return attributes
+
+        radius = PLAYFIELD_WIDTH / 16.0 * (1.0 - 0.7 * (stats.cs - 5.0) / 5.0)
+        # Positions are normalised on circle radius, as if all maps had same CS.
+        scaling = 52.0 / radius
+        if radius < CIRCLESIZE_BUFF_THRESHOLD:
+            scaling *= 1.0 + min(CIRCLESIZE_BUFF_THRESHOLD - radius, 5.0) / 50.0
+
+        rate = stats.speed_multiplier
+        deltas, aim_values, speed_values = object_values(
+            self.times, self.xs, self.ys, self.kinds, scaling, rate)
+
+        speed, attributes.speed_difficulty = weigh_peaks(
+            strain_peaks(self.times, deltas, speed_values, SPEED_DECAY_BASE, rate))
+        aim, attributes.aim_difficulty = weigh_peaks(
+            strain_peaks(self.times, deltas, aim_values, AIM_DECAY_BASE, rate))
+
+        attributes.aim_length_bonus = length_bonus(aim, attributes.aim_difficulty)
+        attributes.speed_length_bonus = length_bonus(speed, attributes.speed_difficulty)
+        attributes.aim = math.sqrt(aim) * STAR_SCALING_FACTOR
+        attributes.speed = math.sqrt(speed) * STAR_SCALING_FACTOR
+        if mods & Mods.TOUCH_DEVICE:
+            attributes.aim **= 0.8
+
+        attributes.stars = (
+            attributes.aim + attributes.speed
+            + abs(attributes.speed - attributes.aim) * EXTREME_SCALING_FACTOR
+        )
+        return attributes
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import fields
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Union
+from .osu_parser import OsuFile
+from .constants import PARSER_VERSION
+from ..executors import EXECUTORS
+
+# Bumped when BeatmapRecord fields change, older index files are rescanned.
+INDEX_VERSION = 1
+# Sections read per file, the rest is only hashed.
+INDEX_SECTIONS = ("General", "Metadata", "Difficulty")
+
+
+@dataclass
+class BeatmapRecord:
+    """Metadata of one indexed .osu file."""
+    path: str
+    md5: str
+    mtime_ns: int
+    size: int
+    mode: int = 0
+    title: str = ""
+    artist: str = ""
+    creator: str = ""
+    version: str = ""
+    beatmap_id: int = 0
+    beatmap_set_id: int = 0
+    hp: float = 0.0
+    cs: float = 0.0
+    od: float = 0.0
+    ar: float = 0.0
+
+
+@dataclass
+class ScanStats:
+    """Counters of last BeatmapIndex.scan."""
+    scanned: int = 0
+    reused: int = 0
+    removed: int = 0
+    failed: int = 0
+
+
+def scan_file(file_path: str) -> Optional[BeatmapRecord]:
+    """Hashes .osu file and reads its metadata, None if it is not a beatmap."""
+    try:
+        stat = os.stat(file_path)
+        beatmap = OsuFile(file_path).parse_file(sections=INDEX_SECTIONS, full_md5=True)
+    except (OSError, ValueError):
+        return None
+
+    return BeatmapRecord(
+        path=file_path,
+        md5=beatmap.md5,
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        mode=beatmap.mode,
+        title=beatmap.title,
+        artist=beatmap.artist,
+        creator=beatmap.creator,
+        version=beatmap.version,
+        beatmap_id=beatmap.beatmap_id,
+        beatmap_set_id=beatmap.beatmap_set_id,
+        hp=beatmap.hp,
+        cs=beatmap.cs,
+        od=beatmap.od,
+        ar=beatmap.ar,
+    )
+
+
+def iter_beatmap_files(directory: str) -> Iterator[os.DirEntry]:
+    """Walks directory tree, yields entries of .osu files."""
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(".osu") and entry.is_file():
+                        yield entry
+        except OSError:
+            continue  # Unreadable directory, skip it.
+
+
+class BeatmapIndex:
+    """md5 -> beatmap index of a Songs folder.
+
+    Each .osu file is hashed and its metadata read with the header-only
+    parse path. Records keep file mtime and size, so later scans only
+    reparse changed files. With `index_path` set, the index is loaded from
+    and saved to that JSON file.
+    """
+
+    def __init__(self, index_path: Optional[str] = None) -> None:
+        self.index_path: Optional[str] = index_path
+        self.stats: ScanStats = ScanStats()
+
+        # Path -> record, md5 -> path -> record (duplicate files share md5).
+        self.__records: Dict[str, BeatmapRecord] = {}
+        self.__by_md5: Dict[str, Dict[str, BeatmapRecord]] = {}
+        self.__lock = threading.Lock()
+
+        if index_path is not None and os.path.exists(index_path):
+            self.load(index_path)
+
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def __contains__(self, md5: str) -> bool:
+        return md5 in self.__by_md5
+
+    def __iter__(self) -> Iterator[BeatmapRecord]:
+        return iter(list(self.__records.values()))
+
+    def get(self, md5: str) -> Optional[BeatmapRecord]:
+        """Finds record (path and metadata) of beatmap by md5, last added one of duplicates."""
+        records = self.__by_md5.get(md5)
+        return list(records.values())[-1] if records else None
+
+    def scan(
+        self,
+        directory: str,
+        workers: Optional[int] = None,
+        executor: Union[str, Executor] = "process",
+    ) -> ScanStats:
+        """Indexes .osu files under directory in parallel.
+
+        Files whose mtime and size match the index are not reparsed, records
+        of files gone from directory are dropped. `executor` is "process",
+        "thread" or an existing executor, md5 hashing and parsing hold the
+        GIL so processes scale better.
+        """
+        if isinstance(executor, Executor):
+            pool = executor
+        elif executor in EXECUTORS:
+            pool = None
+        else:
+            raise ValueError(f"Unknown executor! Excepted one of {tuple(EXECUTORS)}, got {executor}")
+
+        directory = os.path.abspath(directory)
+        stats = ScanStats()
+        seen = set()
+        changed: List[str] = []
+
+        for entry in iter_beatmap_files(directory):
+            seen.add(entry.path)
+            record = self.__records.get(entry.path)
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if record is not None and (record.mtime_ns, record.size) == (stat.st_mtime_ns, stat.st_size):
+                stats.reused += 1
+            else:
+                changed.append(entry.path)
+
+        if changed:
+            if pool is None:
+                pool = EXECUTORS[executor](max_workers=workers)
+            try:
+                # Bigger chunks keep process pool overhead per file low.
+                chunksize = max(1, len(changed) // ((workers or os.cpu_count() or 1) * 4))
+                for path, record in zip(changed, pool.map(scan_file, changed, chunksize=chunksize)):
+                    if record is None:
+                        stats.failed += 1
+                        self.remove(path)
+                    else:
+                        stats.scanned += 1
+                        self.add(record)
+            finally:
+                if pool is not executor:
+                    pool.shutdown()
+
+        prefix = os.path.join(directory, "")
+        for path in [path for path in self.__records if path.startswith(prefix) and path not in seen]:
+            self.remove(path)
+            stats.removed += 1
+
+        self.stats = stats
+        if self.index_path is not None:
+            self.save(self.index_path)
+        return stats
+
+    def add(self, record: BeatmapRecord) -> None:
+        """Adds or replaces record of a file."""
+        with self.__lock:
+            self.__remove(record.path)
+            self.__records[record.path] = record
+            self.__by_md5.setdefault(record.md5, {})[record.path] = record
+
+    def remove(self, path: str) -> None:
+        """Drops record of a file, if indexed."""
+        with self.__lock:
+            self.__remove(path)
+
+    def save(self, index_path: str) -> None:
+        """Writes index to JSON file, atomically."""
+        data = {
+            "version": INDEX_VERSION,
+            "parser_version": PARSER_VERSION,
+            "records": [asdict(record) for record in self],
+        }
+        directory = os.path.dirname(os.path.abspath(index_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as stream:
+            json.dump(data, stream, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+
+    def load(self, index_path: str) -> None:
+        """Reads index from JSON file, index of other version is ignored."""
+        with open(index_path, encoding="utf-8") as stream:
+            data = json.load(stream)
+
+        if (data.get("version"), data.get("parser_version")) != (INDEX_VERSION, PARSER_VERSION):
+            return
+
+        names = {field.name for field in fields(BeatmapRecord)}
+        for record in data["records"]:
+            self.add(BeatmapRecord(**{key: value for key, value in record.items() if key in names}))
+
+    def __remove(self, path: str) -> None:
+        record = self.__records.pop(path, None)
+        if record is None:
+            return
+
+        # Duplicates of the file keep the md5 indexed.
+        records = self.__by_md5[record.md5]
+        del records[path]
+        if not records:
+            del self.__by_md5[record.md5]
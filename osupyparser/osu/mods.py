@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+import math
+from array import array
+from dataclasses import dataclass
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+from .constants import Mods
+from .store import HitObjectStore
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional.
+    numpy = None
+
+# Playfield height, HR flips objects vertically.
+PLAYFIELD_HEIGHT = 384
+
+# Hit window of 300 (ms) at OD 0/10 and approach time (ms) at AR 0/5/10.
+OD0_MS = 80
+OD10_MS = 20
+AR0_MS = 1800
+AR5_MS = 1200
+AR10_MS = 450
+
+OD_MS_STEP = (OD0_MS - OD10_MS) / 10.0
+AR_MS_STEP1 = (AR0_MS - AR5_MS) / 5.0
+AR_MS_STEP2 = (AR5_MS - AR10_MS) / 5.0
+
+
+@dataclass
+class ModStats:
+    """Difficulty settings with mods applied."""
+    ar: float
+    od: float
+    cs: float
+    hp: float
+    # Playback rate, 1.5 with DT/NC, 0.75 with HT.
+    speed_multiplier: float = 1.0
+
+
+def speed_multiplier(mods: int) -> float:
+    """Playback rate of given mods."""
+    multiplier = 1.0
+    if mods & (Mods.DOUBLE_TIME | Mods.NIGHTCORE):
+        multiplier = 1.5
+    if mods & Mods.HALF_TIME:
+        multiplier *= 0.75
+
+    return multiplier
+
+
+def ar_to_ms(ar: float) -> float:
+    """Approach (preempt) time of AR, in ms."""
+    if ar < 5.0:
+        return AR0_MS - AR_MS_STEP1 * ar
+
+    return AR5_MS - AR_MS_STEP2 * (ar - 5.0)
+
+
+def ms_to_ar(ms: float) -> float:
+    """AR of approach time in ms."""
+    if ms > AR5_MS:
+        return (AR0_MS - ms) / AR_MS_STEP1
+
+    return 5.0 + (AR5_MS - ms) / AR_MS_STEP2
+
+
+# Reference https://github.com/Francesco149/pyttanko/blob/master/pyttanko.py#L640
+def apply_mods(mods: int, ar: float, od: float, cs: float, hp: float) -> ModStats:
+    """Applies HR/EZ/DT/NC/HT to difficulty settings.
+
+    AR and OD are capped to 0-10 before speed changes, so DT/HT results
+    range from -5 to 11 (AR) and -4.42 to 11.08 (OD).
+    """
+    if not mods & Mods.MAP_CHANGING:
+        return ModStats(ar, od, cs, hp)
+
+    rate = speed_multiplier(mods)
+    multiplier = 1.0
+    if mods & Mods.HARDROCK:
+        multiplier = 1.4
+    if mods & Mods.EASY:
+        multiplier *= 0.5
+
+    ar_ms = min(AR0_MS, max(AR10_MS, ar_to_ms(ar * multiplier))) / rate
+
+    od_ms = OD0_MS - math.ceil(OD_MS_STEP * od * multiplier)
+    od_ms = min(OD0_MS, max(OD10_MS, od_ms)) / rate
+
+    if mods & Mods.HARDROCK:
+        cs *= 1.3
+    if mods & Mods.EASY:
+        cs *= 0.5
+
+    return ModStats(
+        ar=ms_to_ar(ar_ms),
+        od=(OD0_MS - od_ms) / OD_MS_STEP,
+        cs=min(10.0, cs),
+        hp=min(10.0, hp * multiplier),
+        speed_multiplier=rate,
+    )
+
+
+class ModColumns:
+    """Hit object columns transformed by mods, each transform computed once.
+
+    Shared by all ModdedBeatmap views of one beatmap, so twelve mod
+    combinations still scale times once per playback rate and flip y once.
+    Transformed columns are NumPy arrays when NumPy is installed, unchanged
+    columns are the store's own arrays. Maps parsed without `compact` get
+    their store packed on first column access.
+    """
+
+    def __init__(self, beatmap) -> None:
+        self.beatmap = beatmap
+        self.__store: Optional[HitObjectStore] = beatmap.hit_object_store
+        self.__cache: Dict[Tuple[str, float], object] = {}
+
+    @property
+    def store(self) -> HitObjectStore:
+        """Hit objects as typed columns, packed once if the map is not compact."""
+        if self.__store is None:
+            self.__store = HitObjectStore.from_objects(self.beatmap.hit_objects)
+
+        return self.__store
+
+    def scaled(self, name: str, rate: float):
+        """Time column divided by playback rate."""
+        if rate == 1.0:
+            return getattr(self.store, name)
+
+        column = self.__cache.get((name, rate))
+        if column is None:
+            if numpy is not None:
+                column = self.store.to_numpy(name) / rate
+            else:
+                column = array("d", [time / rate for time in getattr(self.store, name)])
+            self.__cache[(name, rate)] = column
+
+        return column
+
+    def flipped_y(self):
+        """y column flipped for HR."""
+        column = self.__cache.get(("y", -1.0))
+        if column is None:
+            if numpy is not None:
+                column = PLAYFIELD_HEIGHT - self.store.to_numpy("y")
+            else:
+                column = array("i", [PLAYFIELD_HEIGHT - y for y in self.store.y])
+            self.__cache[("y", -1.0)] = column
+
+        return column
+
+
+class ModdedBeatmap:
+    """Read-only view of a parsed beatmap played with mods.
+
+    AR/OD/CS/HP have mods applied, times are in real (playback) time and
+    HR flips y. Transformed columns are built on first access, no hit
+    object is copied. Other attributes, including `hit_objects` as they
+    are in the file, come from the underlying beatmap.
+    """
+
+    def __init__(self, beatmap, mods: int = 0, columns: Optional[ModColumns] = None) -> None:
+        self.beatmap = beatmap
+        self.mods: int = mods
+        self.stats: ModStats = apply_mods(mods, beatmap.ar, beatmap.od, beatmap.cs, beatmap.hp)
+        self.ar: float = self.stats.ar
+        self.od: float = self.stats.od
+        self.cs: float = self.stats.cs
+        self.hp: float = self.stats.hp
+        # Real ms per map ms, 2/3 with DT.
+        self.time_scale: float = 1.0 / self.stats.speed_multiplier
+        self.flip_y: bool = bool(mods & Mods.HARDROCK)
+        self.columns: ModColumns = columns or ModColumns(beatmap)
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes the view does not override.
+        if name == "beatmap":
+            raise AttributeError(name)
+        return getattr(self.beatmap, name)
+
+    def __repr__(self) -> str:
+        return f"<ModdedBeatmap mods={self.mods} ar={self.ar:.2f} od={self.od:.2f} cs={self.cs:.2f} hp={self.hp:.2f}>"
+
+    @property
+    def start_times(self):
+        """Start time of every hit object, in real time."""
+        return self.columns.scaled("start_time", self.stats.speed_multiplier)
+
+    @property
+    def end_times(self):
+        """End time of every hit object, in real time."""
+        return self.columns.scaled("end_time", self.stats.speed_multiplier)
+
+    @property
+    def x(self):
+        """x of every hit object."""
+        return self.columns.store.x
+
+    @property
+    def y(self):
+        """y of every hit object, flipped with HR."""
+        return self.columns.flipped_y() if self.flip_y else self.columns.store.y
+
+    def position_of(self, index: int) -> Tuple[int, int]:
+        """(x, y) of one hit object, without building columns."""
+        store = self.columns.store
+        return store.x[index], PLAYFIELD_HEIGHT - store.y[index] if self.flip_y else store.y[index]
+
+    def start_time_of(self, index: int) -> float:
+        """Real start time of one hit object, without building columns."""
+        return self.columns.store.start_time[index] / self.stats.speed_multiplier
+
+    def calculate_difficulty(self):
+        """Star rating with the view's mods."""
+        return self.beatmap.calculate_difficulty(self.mods)
+
+    def calculate_pp(self, accuracy: Optional[float] = None, **score):
+        """ppv2 of a score with the view's mods."""
+        return self.beatmap.calculate_pp(self.mods, accuracy, **score)
+
+    def calculate_stacking(self):
+        """Stacked positions with the view's mods (not flipped)."""
+        return self.beatmap.calculate_stacking(self.mods)
+
+
+def mod_variants(beatmap, mods: Iterable[int]) -> Dict[int, ModdedBeatmap]:
+    """Views of beatmap with every given mod combination, sharing one ModColumns.
+
+    Columns are transformed once per distinct playback rate (and once for
+    the HR flip) no matter how many combinations need them.
+    """
+    columns = ModColumns(beatmap)
+    return {combination: ModdedBeatmap(beatmap, combination, columns) for combination in mods}
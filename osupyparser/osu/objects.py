@@ -3,14 +3,18 @@ from typing import List
 from typing import Optional
 from typing import Any
 from dataclasses import dataclass
+import sys
 
-@dataclass
+# Slotted dataclasses need python 3.10, older versions keep __dict__.
+DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**DATACLASS_OPTIONS)
 class Position:
     """A (x, y) coordinates class."""
     x: int
     y: int
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class Additions:
     """Represents a additions to hitobject class."""
     normal: Optional[str] = ""
@@ -19,13 +23,13 @@ class Additions:
     volume: Optional[int] = 0
     filename: Optional[Any] = None
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class Edge:
     """A additional class for slider edges."""
     sound_types: List[str]
     additions: Optional[Additions]
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class TimingPoint:
     """Represents a standalone timing point."""
     offset: float
@@ -39,7 +43,7 @@ class TimingPoint:
     velocity: Optional[float] = None
     bpm: Optional[float] = None
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class HitObject:
     """Subclass representing standalone hitobject."""
     pos: Position
@@ -47,20 +51,20 @@ class HitObject:
     new_combo: bool
     sound_enum: int
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class Circle(HitObject):
     """Represents one circle object."""
     # Circle is basically normal hitobject
     # but I wanted it to be its own type.
     additions: Optional[Additions] = None
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class Spinner(HitObject):
     """Represents one spinner object."""
     end_time: int
     additions: Optional[Additions] = None
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class Slider(HitObject):
     """Represents one slider object."""
     repeat_count: int
@@ -1,20 +1,53 @@
 # -*- coding: utf-8 -*-
+import itertools
 import hashlib
 import math
+import time
+import io
 from typing import List
 from typing import Dict
 from typing import Optional
+from typing import Iterable
+from typing import Set
+from typing import Union
+from typing import BinaryIO
+from typing import Sequence
 from .objects import Position
 from .objects import Circle
 from .objects import Slider
 from .objects import Spinner
 from .objects import HitObject
 from .objects import Additions
-from .objects import Edge
 from .objects import TimingPoint
+from .timing import TimingTimeline
+from .store import HitObjectStore
+from .store import parse_addition
+from .store import parse_edges
+from .curves import SliderPaths
+from .difficulty import DifficultyCalculator
+from .difficulty import DifficultyAttributes
+from .performance import PerformanceResult
+from .performance import calculate_pp
+from .stacking import StackedPositions
+from .slider_events import SliderEvents
+from .slider_events import count_combo
+from .stacking import apply_stacking
+from .mods import apply_mods
+from .mods import ModdedBeatmap
+from .constants import Mods
+from .snapshot import write_beatmap
+from .snapshot import read_beatmap
 from .constants import ObjectType
 from .constants import OSU_FILE_HEADER
 from .constants import CURVE_TYPES
+from .constants import SECTION_SCHEMA
+from ..snapshot import SnapshotReader
+from ..snapshot import KIND_BEATMAP
+from ..aio import read_file_async
+from ..profiler import ParseObserver
+from ..profiler import SectionTimer
+from ..aio import run_in_executor
+from concurrent.futures import Executor
 
 
 class OsuFile:
@@ -22,8 +55,8 @@ class OsuFile:
     https://osu.ppy.sh/wiki/en/Client/File_formats/Osu_%28file_format%29
     """
 
-    def __init__(self, file_path: str):
-        self.__file_path: str = file_path
+    def __init__(self, file_path: Optional[str] = None):
+        self.__file_path: Optional[str] = file_path
 
         # Header of file.
         self.file_version: int = 0
@@ -80,7 +113,9 @@ class OsuFile:
         self.colours: Dict[str, tuple] = {}
 
         # HitObjects section.
-        self.hit_objects: List[HitObject] = []
+        self.hit_objects: Sequence[HitObject] = []
+        # Set when parsed with compact=True, hit_objects is then the same store.
+        self.hit_object_store: Optional[HitObjectStore] = None
 
         # External data.
         self.md5: str = ""
@@ -93,118 +128,224 @@ class OsuFile:
         self.nsliders: int = 0
         self.nspinners: int = 0
 
-    def parse_file(self):
-        """Parses sections and set them to class variables."""
+        # Key/value fields unknown to SECTION_SCHEMA, by section.
+        self.extra_fields: Dict[str, Dict[str, str]] = {}
+
+        # Names (lowercase) of sections found while parsing.
+        self.parsed_sections: Set[str] = set()
+
+        self.__timeline: Optional[TimingTimeline] = None
+        self.__slider_paths: Optional[SliderPaths] = None
+        self.__difficulty: Optional[DifficultyCalculator] = None
+        self.__slider_events: Optional[SliderEvents] = None
+        # HR/EZ mods -> stacked positions.
+        self.__stacking: Dict[int, StackedPositions] = {}
+
+    def __setstate__(self, state: dict) -> None:
+        # Beatmaps pickled by older versions miss lazy caches added since.
+        self.__timeline = None
+        self.__slider_paths = None
+        self.__difficulty = None
+        self.__slider_events = None
+        self.__stacking = {}
+        self.__dict__.update(state)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, sections: Optional[Iterable[str]] = None, compact: bool = False, observer: Optional[ParseObserver] = None, full_md5: bool = False) -> "OsuFile":
+        """Parses beatmap from bytes data."""
+        return cls().parse_lines(io.BytesIO(data), sections, compact, observer, full_md5)
+
+    @classmethod
+    def from_stream(cls, stream: BinaryIO, sections: Optional[Iterable[str]] = None, compact: bool = False, observer: Optional[ParseObserver] = None, full_md5: bool = False) -> "OsuFile":
+        """Parses beatmap from binary file object, line by line."""
+        return cls().parse_lines(stream, sections, compact, observer, full_md5)
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[Union[str, bytes]], sections: Optional[Iterable[str]] = None, compact: bool = False, observer: Optional[ParseObserver] = None, full_md5: bool = False) -> "OsuFile":
+        """Parses beatmap from iterable of lines (str or bytes).
+
+        Lines should keep their line endings for md5 to match the file's.
+        """
+        return cls().parse_lines(lines, sections, compact, observer, full_md5)
+
+    @classmethod
+    def from_snapshot(cls, source: Union[str, bytes, memoryview]) -> "OsuFile":
+        """Loads beatmap from `to_snapshot` data, or memory maps it from file path.
+
+        Hit objects are a HitObjectStore over the snapshot buffer, not a copy.
+        """
+        return read_beatmap(cls(), SnapshotReader.from_source(source, KIND_BEATMAP))
+
+    def to_snapshot(self) -> bytes:
+        """Serialises parsed beatmap into a binary snapshot."""
+        return write_beatmap(self)
+
+    def parse_file(self, sections: Optional[Iterable[str]] = None, compact: bool = False, observer: Optional[ParseObserver] = None, full_md5: bool = False):
+        """Parses sections and set them to class variables.
+
+        If `sections` is given (e.g. {"Metadata", "Difficulty"}), only those
+        are parsed. Other sections are skipped without being decoded and the
+        file stops being parsed once all requested sections were read. md5
+        needs the whole file, so it is then left empty unless `full_md5` is
+        set, which reads and hashes the rest of the file.
+
+        With `compact` set, hit objects are kept in a `HitObjectStore`
+        (typed arrays) which builds the dataclasses only on access.
+
+        `observer` (see osupyparser.profiler) gets line counts and wall time
+        of every section, derived calculations and object counts.
+        """
+        if not self.__file_path:
+            raise ValueError("No file path given, use from_bytes/from_stream/from_lines instead.")
 
         with open(self.__file_path, "rb") as stream:
-            buffer = stream.read()
-        # Strip lines.
-        lines = list(
-            map(lambda x: x.strip(), buffer.decode("utf-8-sig").split("\n")))
-        self.md5 = hashlib.md5(buffer).digest().hex()
+            return self.parse_lines(stream, sections, compact, observer, full_md5)
+
+    async def parse_async(self, sections: Optional[Iterable[str]] = None, compact: bool = False, executor: Optional[Executor] = None, full_md5: bool = False):
+        """Async `parse_file`, event loop is not blocked by file reading nor parsing.
+
+        File is read in a worker thread, parsing runs in `executor` (loop's
+        default one if None). With a process pool, the beatmap parsed in the
+        worker is copied into this instance.
+        """
+        if not self.__file_path:
+            raise ValueError("No file path given, use from_bytes/from_stream/from_lines instead.")
+
+        data = await read_file_async(self.__file_path)
+        parsed = await run_in_executor(executor, type(self).from_bytes, data, sections, compact, None, full_md5)
+        file_path = self.__file_path
+        self.__dict__.update(parsed.__dict__)
+        self.__file_path = file_path
+        return self
+
+    def parse_lines(self, lines: Iterable[Union[str, bytes]], sections: Optional[Iterable[str]] = None, compact: bool = False, observer: Optional[ParseObserver] = None, full_md5: bool = False):
+        """Parses beatmap line by line. See `parse_file` for arguments."""
+        if compact:
+            self.hit_object_store = self.hit_objects = HitObjectStore()
+
+        lines = iter(lines)
+        header = next(lines, b"")
+        if isinstance(header, str):
+            lines = map(str.encode, itertools.chain((header,), lines))
+            header = next(lines)
 
-        header_line = lines[0]
+        wanted = None
+        if sections is not None:
+            wanted = {section.lower() for section in sections}
+        remaining = set(wanted or ())
+        md5 = hashlib.md5(header)
+
+        header_line = header.decode("utf-8-sig").strip()
         if header_line[:len(OSU_FILE_HEADER)] != OSU_FILE_HEADER:
             # First line should have osu special header.
             raise ValueError(
                 f"Unknown file error! Excepted: {OSU_FILE_HEADER}, got {header_line}")
         self.file_version = int(header_line[len(OSU_FILE_HEADER):])
 
-        section_name = ""
-        for line in lines[1:]:
-            if not line:
+        timer = None
+        if observer is not None:
+            timer = SectionTimer(observer)
+            timer.bytes = len(header)
+            lines = timer.count(lines)
+
+        section_parser = None
+        stopped = False
+        for raw_line in lines:
+            md5.update(raw_line)
+            raw_line = raw_line.strip()
+            if not raw_line:
                 continue  # Just continue looping.
 
-            if line[0] == "[" and line[-1] == "]":
-                section_name = line[1:-1].lower()
+            if raw_line[:1] == b"[" and raw_line[-1:] == b"]":
+                section_name = raw_line[1:-1].decode("utf-8").lower()
+                if wanted is not None and section_name not in wanted:
+                    if not remaining:
+                        stopped = True
+                        break  # Everything requested was parsed.
+                    if timer is not None:
+                        timer.enter(section_name)
+                    section_parser = None
+                    continue
+
+                if timer is not None:
+                    timer.enter(section_name)
+                remaining.discard(section_name)
+                self.parsed_sections.add(section_name)
+                section_parser = getattr(self, f"{section_name}_parser", None)
                 continue
 
             # Call parser to take care of it.
-            section_parser = getattr(self, f"{section_name}_parser", None)
-            if not section_parser:
-                continue
-            section_parser(line)
+            if section_parser:
+                section_parser(raw_line.decode("utf-8"))
 
-        self.calculate_minor_things()
-        self.calculate_max_combo()
+        if timer is not None:
+            timer.close()
+
+        if stopped and not full_md5:
+            # Rest of the file is never read, md5 of a part would be wrong.
+            self.md5 = ""
+        else:
+            for raw_line in lines:
+                md5.update(raw_line)
+            self.md5 = md5.hexdigest()
+        self.calculate_derived(observer)
+        if observer is not None:
+            observer.on_count("bytes", timer.bytes)
+            observer.on_count("hit_objects", len(self.hit_objects))
+            observer.on_count("timing_points", len(self.timing_points))
         # Return self as some people would want to make one line parsing.
         return self
 
+    def calculate_derived(self, observer: Optional[ParseObserver] = None) -> None:
+        """Runs calculations whose input sections were parsed."""
+        if "hitobjects" not in self.parsed_sections or not self.hit_objects:
+            return
+
+        start = time.perf_counter() if observer is not None else 0.0
+        self.calculate_minor_things()
+        if observer is not None:
+            observer.on_stage("minor_things", time.perf_counter() - start)
+
+        if {"timingpoints", "difficulty"} <= self.parsed_sections:
+            start = time.perf_counter() if observer is not None else 0.0
+            self.calculate_max_combo()
+            if observer is not None:
+                observer.on_stage("max_combo", time.perf_counter() - start)
+
+    def parse_key_value(self, section_name: str, line: str) -> None:
+        """Parses `Key: value` line of a section described in SECTION_SCHEMA.
+
+        Keys not in the schema are kept as strings in `extra_fields`.
+        """
+        key, separator, value = line.partition(":")
+        if not separator:
+            return
+
+        key = key.strip()
+        value = value.strip()
+        field = SECTION_SCHEMA[section_name].get(key)
+        if field is None:
+            self.extra_fields.setdefault(section_name, {})[key] = value
+            return
+
+        attribute, converter = field
+        setattr(self, attribute, converter(value))
+
     def general_parser(self, line: str) -> None:
         """Parses [General] header data."""
-        if line.startswith("AudioFilename"):
-            self.audio_filename = line.split("AudioFilename:")[1].strip()
-        elif line.startswith("AudioLeadIn"):
-            self.audio_lead_in = int(line.split("AudioLeadIn:")[1].strip())
-        elif line.startswith("PreviewTime"):
-            self.preview_time = int(line.split("PreviewTime:")[1].strip())
-        elif line.startswith("Countdown"):
-            self.countdown = int(line.split("Countdown:")[1].strip())
-        elif line.startswith("SampleSet"):
-            self.sample_set = line.split("SampleSet:")[1].strip()
-        elif line.startswith("StackLeniency"):
-            self.stack_leniency = float(
-                line.split("StackLeniency:")[1].strip())
-        elif line.startswith("Mode"):
-            self.mode = int(line.split("Mode:")[1].strip())
-        elif line.startswith("LetterboxInBreaks"):  # Making it bool.
-            self.letterbox_in_breaks = "1" == line.split(
-                "LetterboxInBreaks:")[1].strip()
-        elif line.startswith("WidescreenStoryboard"):  # Same here.
-            self.widescreen_storyboard = "1" == line.split(
-                "WidescreenStoryboard:")[1].strip()
+        self.parse_key_value("general", line)
 
     def editor_parser(self, line: str) -> None:
         """Parses [Editor] header data."""
-        if line.startswith("DistanceSpacing"):
-            self.distance_spacing = float(
-                line.split("DistanceSpacing:")[1].strip())
-        elif line.startswith("BeatDivisor"):
-            self.beat_divisor = int(line.split("BeatDivisor:")[1].strip())
-        elif line.startswith("GridSize"):
-            self.grid_size = int(line.split("GridSize:")[1].strip())
-        elif line.startswith("TimelineZoom"):
-            self.timeline_zoom = float(line.split("TimelineZoom:")[1].strip())
+        self.parse_key_value("editor", line)
 
     def metadata_parser(self, line: str) -> None:
         """Parses [Metadata] header data."""
-        if line.startswith("Title:"):
-            self.title = line.split("Title:")[1].strip()
-        elif line.startswith("TitleUnicode"):
-            self.title_unicode = line.split("TitleUnicode:")[1].strip()
-        elif line.startswith("Artist:"):
-            self.artist = line.split("Artist:")[1].strip()
-        elif line.startswith("ArtistUnicode"):
-            self.artist_unicode = line.split("ArtistUnicode:")[1].strip()
-        elif line.startswith("Creator"):
-            self.creator = line.split("Creator:")[1].strip()
-        elif line.startswith("Version"):
-            self.version = line.split("Version:")[1].strip()
-        elif line.startswith("Source"):
-            self.source = line.split("Source:")[1].strip()
-        elif line.startswith("Tags"):
-            self.tags = line.split("Tags:")[1].strip()
-        elif line.startswith("BeatmapID"):
-            self.beatmap_id = int(line.split("BeatmapID:")[1].strip())
-        elif line.startswith("BeatmapSetID"):
-            self.beatmap_set_id = int(line.split("BeatmapSetID:")[1].strip())
+        self.parse_key_value("metadata", line)
 
     def difficulty_parser(self, line: str) -> None:
         """Parses [Difficulty] header data."""
-        if line.startswith("HPDrainRate"):
-            self.hp = float(line.split("HPDrainRate:")[1].strip())
-        elif line.startswith("CircleSize"):
-            self.cs = float(line.split("CircleSize:")[1].strip())
-        elif line.startswith("OverallDifficulty"):
-            self.od = float(line.split("OverallDifficulty:")[1].strip())
-        elif line.startswith("ApproachRate"):
-            self.ar = float(line.split("ApproachRate:")[1].strip())
-        elif line.startswith("SliderMultiplier"):
-            self.slider_multiplier = float(
-                line.split("SliderMultiplier:")[1].strip())
-        elif line.startswith("SliderTickRate"):
-            self.slider_tick_rate = float(
-                line.split("SliderTickRate:")[1].strip())
+        self.parse_key_value("difficulty", line)
 
     def events_parser(self, line: str) -> None:
         """Parses [Events] header data."""
@@ -266,11 +407,32 @@ class OsuFile:
 
         _type = int(data[3])
         sound = int(data[4])
+        self.total_hits += 1
+
+        duration = 0
+        if not _type & (ObjectType.CIRCLE | ObjectType.SPINNER) and _type & ObjectType.SLIDER:
+            timeline = self.timeline
+            if timeline and self.slider_multiplier:
+                start_time = int(data[2])
+                px_per_beat = self.slider_multiplier * 100 * timeline.sv_at(start_time)
+                beats_count = (float(data[7]) * int(data[6])) / px_per_beat
+                duration = math.ceil(beats_count * timeline.beat_length_at(start_time))
+
+        if _type & ObjectType.CIRCLE:
+            self.ncircles += 1
+        elif _type & ObjectType.SPINNER:
+            self.nspinners += 1
+        elif _type & ObjectType.SLIDER:
+            self.nsliders += 1
+
+        if self.hit_object_store is not None:
+            self.hit_object_store.append_fields(data, duration)
+            return
+
         new_combo = (_type & ObjectType.NEW_COMBO) == 4
         pos = Position(int(data[0]), int(data[1]))
 
         if _type & ObjectType.CIRCLE:
-            self.ncircles += 1
             hitobject = Circle(
                 pos=pos,
                 start_time=int(data[2]),
@@ -280,7 +442,6 @@ class OsuFile:
             if len(data) > 5:
                 hitobject.additions = self.parse_addition(data[5])
         elif _type & ObjectType.SPINNER:
-            self.nspinners += 1
             hitobject = Spinner(
                 pos=pos,
                 start_time=int(data[2]),
@@ -291,17 +452,8 @@ class OsuFile:
             if len(data) > 6:
                 hitobject.additions = self.parse_addition(data[6])
         elif _type & ObjectType.SLIDER:
-            self.nsliders += 1
-            duration = 0
             curve_type = ""
             points_list = []
-            edges = []
-
-            timing = self.get_timing_point(int(data[2]))
-            if timing:
-                px_per_beat = self.slider_multiplier * 100 * timing.velocity
-                beats_count = (float(data[7]) * int(data[6])) / px_per_beat
-                duration = math.ceil(beats_count * timing.beat_length)
 
             points = ('' if not len(data) > 5 else data[5]).split("|")
             if points:
@@ -310,22 +462,14 @@ class OsuFile:
                     x, y = point.split(":")
                     points_list.append(Position(int(x), int(y)))
 
-            edge_sounds = ('' if not len(data) > 8 else data[8]).split("|")
-            edge_additions = ('' if not len(data) > 9 else data[9]).split("|")
-
-            for i in range(0, int(data[6]) + 1):
-                additions = None
-                sound_edge_enum = None
-                if i < len(edge_additions):
-                    additions = self.parse_addition(edge_additions[i])
-
-                if i < len(edge_sounds):
-                    sound_edge_enum = edge_sounds[i]
-
-                edges.append(Edge(sound_edge_enum, additions))
+            edges = parse_edges(
+                int(data[6]),
+                '' if not len(data) > 8 else data[8],
+                '' if not len(data) > 9 else data[9]
+            )
 
             hitobject = Slider(
-                pos=Position(int(data[0]), int(data[1])),
+                pos=pos,
                 start_time=int(data[2]),
                 new_combo=new_combo,
                 sound_enum=sound,
@@ -343,100 +487,81 @@ class OsuFile:
         else:
             # Might be some hitobject I dont know about..
             hitobject = HitObject(
-                pos=Position(int(data[0]), int(data[1])),
+                pos=pos,
                 start_time=int(data[2]),
                 new_combo=new_combo,
                 sound_enum=sound
             )
 
-        self.total_hits += 1
         self.hit_objects.append(hitobject)
 
     def parse_addition(self, line: str) -> Optional[Additions]:
         """Parses addictional hitobject data."""
-        if not line:
-            return None
-
-        samples = {
-            "1": 'Normal',
-            "2": "Soft",
-            "3": "Drum"
-        }
-        data = line.split(":")
-        addition = {}
-        if not data:
-            return None
-        if len(data) > 0:
-            addition['normal'] = samples.get(data[0], None)
-        if len(data) > 1:
-            addition['additional'] = samples.get(data[1], None)
-        if len(data) > 2:
-            addition['custom_sample_index'] = int(data[2])
-        if len(data) > 3:
-            addition['volume'] = max(0, int(data[3]))
-        if len(data) > 4:
-            addition['filename'] = data[4]
-
-        additional = Additions(**addition)
-        return additional
-
-    def get_timing_point(self, offset: int) -> TimingPoint:
-        """Finds a timing point with given offset."""
-        for timing in self.timing_points:
-            if timing.offset <= offset:
-                return timing
-
-        return self.timing_points[0]
-
-    # Reference https://github.com/Francesco149/pyttanko/blob/master/pyttanko.py#L265
-    def calculate_max_combo(self) -> None:
-        """Calculates a combo for map."""
-        combo = 0
-        timings = self.timing_points
-        index = -1
-        px_per_beat = None
-        next_offset = -float("inf")
-
-        for hitobject in self.hit_objects:
-            if not isinstance(hitobject, Slider):
-                combo += 1
-                continue
+        return parse_addition(line)
 
-            while next_offset != None and hitobject.start_time >= next_offset:
-                index += 1
-                if len(timings) > index + 1:
-                    next_offset = timings[index + 1].offset
-                else:
-                    next_offset = None
+    @property
+    def timeline(self) -> TimingTimeline:
+        """Timing points indexed for lookups, rebuilt when points change."""
+        if self.__timeline is None or len(self.__timeline) != len(self.timing_points):
+            self.__timeline = TimingTimeline(self.timing_points)
 
-                timing = timings[index]
-                sv_multiplier = 1.0
+        return self.__timeline
 
-                if not timing.timing_change and timing.beat_length < 0:
-                    sv_multiplier = (-100.0 / timing.beat_length)
+    @property
+    def slider_paths(self) -> SliderPaths:
+        """Flattened paths of all sliders, built on first use."""
+        if self.__slider_paths is None or len(self.__slider_paths) != len(self.hit_objects):
+            self.__slider_paths = SliderPaths.from_beatmap(self)
 
-                px_per_beat = self.slider_multiplier * 100.0 * sv_multiplier
-                if self.file_version < 8:
-                    px_per_beat /= sv_multiplier
+        return self.__slider_paths
 
-            num_beats = (
-                (hitobject.pixel_length * hitobject.repeat_count) / px_per_beat
-            )
+    @property
+    def slider_events(self) -> SliderEvents:
+        """Head/tick/repeat/tail events of all sliders with positions, built on first use."""
+        events = self.__slider_events
+        if events is None or len(events.offsets) != len(self.hit_objects) + 1:
+            events = self.__slider_events = SliderEvents.from_beatmap(self)
 
-            ticks = int(
-                math.ceil(
-                    (num_beats - 0.1) /
-                    hitobject.repeat_count * self.slider_tick_rate
-                )
-            )
+        return events.compute_positions(self.slider_paths)
+
+    def with_mods(self, mods: int) -> ModdedBeatmap:
+        """Lightweight view of map played with mods, see `mods.mod_variants` for many at once."""
+        return ModdedBeatmap(self, mods)
+
+    def calculate_difficulty(self, mods: int = 0) -> DifficultyAttributes:
+        """osu!standard star rating with mods, cached per difficulty changing mods."""
+        if self.__difficulty is None or self.__difficulty.beatmap is not self or len(self.__difficulty.times) != len(self.hit_objects):
+            self.__difficulty = DifficultyCalculator(self)
 
-            ticks -= 1
-            ticks *= hitobject.repeat_count
-            ticks += hitobject.repeat_count + 1
+        return self.__difficulty.calculate(mods)
 
-            combo += max(0, ticks)
+    def calculate_stacking(self, mods: int = 0) -> StackedPositions:
+        """Stacked hit object positions with HR/EZ applied to AR and CS, cached per those mods.
 
-        self.max_combo = combo
+        HR does not flip the returned positions, flip first and add
+        `heights * offset` for the stacked HR playfield.
+        """
+        mods &= Mods.HARDROCK | Mods.EASY
+        stacking = self.__stacking.get(mods)
+        if stacking is None or len(stacking) != len(self.hit_objects):
+            stats = apply_mods(mods, self.ar, self.od, self.cs, self.hp)
+            stacking = self.__stacking[mods] = apply_stacking(self, stats.ar, stats.cs)
+
+        return stacking
+
+    def calculate_pp(self, mods: int = 0, accuracy: Optional[float] = None, **score) -> PerformanceResult:
+        """osu!standard ppv2 of a score, see `performance.calculate_pp` for score fields."""
+        return calculate_pp(self.calculate_difficulty(mods), mods, accuracy, **score)
+
+    def get_timing_point(self, offset: int) -> Optional[TimingPoint]:
+        """Finds a timing point active at given offset."""
+        return self.timeline.active_at(offset)
+
+    def calculate_max_combo(self) -> None:
+        """Calculates a combo for map, one per object and slider event."""
+        # Events themselves are only generated once `slider_events` is used.
+        self.__slider_events = None
+        self.max_combo = count_combo(self)
 
     def calculate_minor_things(self) -> None:
         """Calculates rest of minor things."""
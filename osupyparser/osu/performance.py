@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import math
+from dataclasses import dataclass
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from .constants import Mods
+from .difficulty import DifficultyAttributes
+
+
+@dataclass
+class PerformanceResult:
+    """ppv2 of a score."""
+    total: float = 0.0
+    aim: float = 0.0
+    speed: float = 0.0
+    acc: float = 0.0
+    # Accuracy of the score, 0-1.
+    accuracy: float = 0.0
+    n300: int = 0
+    n100: int = 0
+    n50: int = 0
+    nmiss: int = 0
+    combo: int = 0
+    mods: int = 0
+
+
+def accuracy_of(n300: int, n100: int, n50: int, nmiss: int) -> float:
+    """Accuracy (0-1) of hit counts."""
+    hits = n300 + n100 + n50 + nmiss
+    if hits <= 0:
+        return 0.0
+
+    return (n50 * 50.0 + n100 * 100.0 + n300 * 300.0) / (hits * 300.0)
+
+
+def round_half_up(value: float) -> int:
+    """Rounds .5 up like pyttanko, built-in round() goes to the even integer."""
+    return int(math.floor(value + 0.5))
+
+
+def hits_for_accuracy(accuracy: float, nobjects: int, nmiss: int = 0) -> Tuple[int, int, int]:
+    """Closest (n300, n100, n50) giving accuracy percent."""
+    nmiss = min(nobjects, nmiss)
+    max300 = nobjects - nmiss
+    accuracy = max(0.0, min(accuracy_of(max300, 0, 0, nmiss) * 100.0, accuracy))
+
+    n50 = 0
+    n100 = round_half_up(-3.0 * ((accuracy * 0.01 - 1.0) * nobjects + nmiss) * 0.5)
+    if n100 > max300:
+        # Lower than all 100s, use 50s.
+        n100 = 0
+        n50 = min(max300, round_half_up(-6.0 * ((accuracy * 0.01 - 1.0) * nobjects + nmiss) * 0.5))
+
+    return nobjects - n100 - n50 - nmiss, n100, n50
+
+
+def pp_base(stars: float) -> float:
+    """Base pp of aim/speed stars."""
+    return (5.0 * max(1.0, stars / 0.0675) - 4.0) ** 3.0 / 100000.0
+
+
+# Reference https://github.com/Francesco149/pyttanko/blob/master/pyttanko.py#L1135
+def calculate_pp(
+    attributes: DifficultyAttributes,
+    mods: Optional[int] = None,
+    accuracy: Optional[float] = None,
+    n300: Optional[int] = None,
+    n100: int = 0,
+    n50: int = 0,
+    nmiss: int = 0,
+    combo: Optional[int] = None,
+    score_version: int = 1,
+) -> PerformanceResult:
+    """Calculates osu!standard ppv2 of a score.
+
+    `mods` default to mods of `attributes`, they should include the same
+    difficulty changing mods. With `accuracy` (percent) set, hit counts are
+    derived from it. Missing `n300` are all objects not hit otherwise,
+    missing `combo` is max combo minus misses.
+    """
+    if mods is None:
+        mods = attributes.mods
+    if score_version not in (1, 2):
+        raise ValueError(f"Unsupported score version! Excepted: 1 or 2, got {score_version}")
+
+    nobjects = max(1, attributes.nobjects)
+    max_combo = max(1, attributes.max_combo)
+    if accuracy is not None:
+        n300, n100, n50 = hits_for_accuracy(accuracy, nobjects, nmiss)
+    if n300 is None:
+        n300 = nobjects - n100 - n50 - nmiss
+    if combo is None:
+        combo = max_combo - nmiss
+
+    score_accuracy = accuracy_of(n300, n100, n50, nmiss)
+    ncircles = attributes.ncircles
+    if score_version == 1:
+        # Sliders and spinners are free 300s in scorev1.
+        real_accuracy = max(0.0, accuracy_of(n300 - attributes.nsliders - attributes.nspinners, n100, n50, nmiss))
+    else:
+        real_accuracy = score_accuracy
+        ncircles = nobjects
+
+    length_bonus = 0.95 + 0.4 * min(1.0, nobjects / 2000.0)
+    if nobjects > 2000:
+        length_bonus += math.log10(nobjects / 2000.0) * 0.5
+
+    miss_ratio = 1 - (nmiss / nobjects) ** 0.775
+    combo_break = combo ** 0.8 / max_combo ** 0.8
+    ar, od = attributes.ar, attributes.od
+
+    ar_bonus = 0.0
+    if ar > 10.33:
+        ar_bonus += 0.4 * (ar - 10.33)
+    elif ar < 8.0:
+        ar_bonus += 0.01 * (8.0 - ar)
+    ar_bonus = 1.0 + min(ar_bonus, ar_bonus * nobjects / 1000.0)
+
+    hd_bonus = 1.0
+    if mods & Mods.HIDDEN:
+        hd_bonus += 0.04 * (12.0 - ar)
+
+    aim = pp_base(attributes.aim) * length_bonus * combo_break * ar_bonus * hd_bonus
+    if nmiss > 0:
+        aim *= 0.97 * miss_ratio ** nmiss
+    if mods & Mods.FLASHLIGHT:
+        fl_bonus = 1.0 + 0.35 * min(1.0, nobjects / 200.0)
+        if nobjects > 200:
+            fl_bonus += 0.3 * min(1.0, (nobjects - 200) / 300.0)
+        if nobjects > 500:
+            fl_bonus += (nobjects - 500) / 1200.0
+        aim *= fl_bonus
+    od_squared = od * od
+    aim *= (0.5 + score_accuracy / 2.0) * (0.98 + od_squared / 2500.0)
+
+    speed = pp_base(attributes.speed) * length_bonus * combo_break * hd_bonus
+    if nmiss > 0:
+        speed *= 0.97 * miss_ratio ** (nmiss ** 0.875)
+    if ar > 10.33:
+        speed *= ar_bonus
+    speed *= (0.95 + od_squared / 750.0) * score_accuracy ** ((14.5 - max(od, 8.0)) / 2.0)
+    if n50 >= nobjects / 500.0:
+        speed *= 0.98 ** (n50 - nobjects / 500.0)
+
+    acc = 1.52163 ** od * real_accuracy ** 24.0 * 2.83
+    acc *= min(1.15, (ncircles / 1000.0) ** 0.3)
+    if mods & Mods.HIDDEN:
+        acc *= 1.08
+    if mods & Mods.FLASHLIGHT:
+        acc *= 1.02
+
+    multiplier = 1.12
+    if mods & Mods.NOFAIL:
+        multiplier *= max(0.9, 1.0 - 0.2 * nmiss)
+    if mods & Mods.SPUN_OUT:
+        multiplier *= 1.0 - (attributes.nspinners / nobjects) ** 0.85
+
+    return PerformanceResult(
+        total=(aim ** 1.1 + speed ** 1.1 + acc ** 1.1) ** (1.0 / 1.1) * multiplier,
+        aim=aim,
+        speed=speed,
+        acc=acc,
+        accuracy=score_accuracy,
+        n300=n300,
+        n100=n100,
+        n50=n50,
+        nmiss=nmiss,
+        combo=combo,
+        mods=mods,
+    )
+
+
+def calculate_pp_many(scores: Iterable[Sequence], score_version: int = 1) -> List[PerformanceResult]:
+    """Calculates pp of many (beatmap, mods, accuracy[, nmiss[, combo]]) scores.
+
+    Difficulty is computed once per beatmap and difficulty changing mods
+    (cached on the beatmap), each score then only costs the pp formula.
+    """
+    results = []
+    for beatmap, mods, accuracy, *rest in scores:
+        results.append(calculate_pp(
+            beatmap.calculate_difficulty(mods),
+            mods,
+            accuracy=accuracy,
+            nmiss=rest[0] if rest else 0,
+            combo=rest[1] if len(rest) > 1 else None,
+            score_version=score_version,
+        ))
+
+    return results
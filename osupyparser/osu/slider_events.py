@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import math
+from array import array
+from bisect import bisect_right
+from typing import Iterator
+from typing import Tuple
+from .constants import ObjectType
+from .objects import Slider
+
+# Kinds of slider events.
+HEAD = 0
+TICK = 1
+REPEAT = 2
+TAIL = 3
+
+# Slider tails are judged this much before slider end, as stable does.
+TAIL_LENIENCY = 36
+
+
+def iter_sliders(beatmap) -> Iterator[Tuple[int, int, int, int, float]]:
+    """(object index, start time, duration, repeat count, pixel length) of every slider."""
+    store = beatmap.hit_object_store
+    if store is not None:
+        for i in range(len(store)):
+            if store.kind[i] == ObjectType.SLIDER:
+                yield i, store.start_time[i], store.duration[i], store.repeat_count[i], store.pixel_length[i]
+        return
+
+    for i, hitobject in enumerate(beatmap.hit_objects):
+        if isinstance(hitobject, Slider):
+            yield i, hitobject.start_time, hitobject.duration, hitobject.repeat_count, hitobject.pixel_length
+
+
+# Reference https://github.com/Francesco149/pyttanko/blob/master/pyttanko.py#L265
+def iter_slider_ticks(beatmap) -> Iterator[Tuple[int, int, int, int, int, float]]:
+    """(object index, start time, duration, repeat count, ticks per span, tick spacing) of every slider.
+
+    Ticks per span is -1 for sliders too short for a tail. Timing points
+    are followed with pointers while sliders are in time order, out of
+    order sliders fall back to a binary search.
+
+    Slider duration always follows slider velocity, while maps older than
+    file version 8 place ticks as if it was 1. Their ticks are then spaced
+    `beat_length / tick_rate / sv` ms apart, so they still fit the slider.
+    """
+    timeline = beatmap.timeline
+    offsets, sv_values = timeline.offsets, timeline.sv
+    bpm_offsets, beat_lengths = timeline.uninherited_offsets, timeline.beat_lengths
+    use_sv = beatmap.file_version >= 8
+    tick_rate = beatmap.slider_tick_rate
+    slider_multiplier = beatmap.slider_multiplier
+
+    point = bpm_point = -1
+    last_start = -math.inf
+
+    for index, start, duration, repeat_count, pixel_length in iter_sliders(beatmap):
+        if start < last_start:
+            point = bisect_right(offsets, start) - 1
+            bpm_point = bisect_right(bpm_offsets, start) - 1
+        else:
+            while point + 1 < len(offsets) and offsets[point + 1] <= start:
+                point += 1
+            while bpm_point + 1 < len(bpm_offsets) and bpm_offsets[bpm_point + 1] <= start:
+                bpm_point += 1
+        last_start = start
+
+        sv = sv_values[point] if point >= 0 else 1.0
+        tick_sv = sv if use_sv else 1.0
+        beat_length = beat_lengths[max(0, bpm_point)] if beat_lengths else timeline.beat_length_at(start)
+
+        num_beats = pixel_length * repeat_count / (slider_multiplier * 100.0 * tick_sv)
+        ticks = math.ceil((num_beats - 0.1) / repeat_count * tick_rate) - 1
+        if ticks * repeat_count + repeat_count + 1 <= 1:
+            ticks = -1
+        else:
+            ticks = max(0, ticks)
+
+        yield index, start, duration, repeat_count, ticks, beat_length / tick_rate * tick_sv / sv
+
+
+def count_combo(beatmap) -> int:
+    """Max combo of parsed OsuFile, counting slider events without generating them."""
+    combo = len(beatmap.hit_objects)
+    for _, _, _, repeat_count, ticks, _ in iter_slider_ticks(beatmap):
+        if ticks >= 0:
+            # Head is already counted with the object.
+            combo += ticks * repeat_count + repeat_count
+    return combo
+
+
+class SliderEvents:
+    """Head, tick, repeat and tail events of all sliders in flat arrays.
+
+    Events of hit object i are `offsets[i]:offsets[i + 1]`, in time order,
+    other objects have none. `progress` is the position along slider path
+    (0-1 of one pass, going back on reverse spans). Positions (`x`, `y`)
+    need slider paths and are only filled by `compute_positions`.
+
+    Tick counts follow stable, so every event is worth one combo.
+    """
+
+    def __init__(self) -> None:
+        self.time: array = array("d")
+        self.kind: array = array("B")
+        # Hit object index of the slider.
+        self.slider: array = array("I")
+        self.progress: array = array("d")
+        self.x: array = array("d")
+        self.y: array = array("d")
+        self.offsets: array = array("I", [0])
+        # Amount of sliders.
+        self.sliders: int = 0
+
+    @classmethod
+    def from_beatmap(cls, beatmap) -> "SliderEvents":
+        """Generates events of parsed OsuFile sliders, see `iter_slider_ticks`."""
+        events = cls()
+        time, kind, slider, progress, event_offsets = events.time, events.kind, events.slider, events.progress, events.offsets
+        last_index = -1
+
+        for index, start, duration, repeat_count, ticks, tick_spacing in iter_slider_ticks(beatmap):
+            # Objects before this slider have no events.
+            event_offsets.extend([len(time)] * (index - last_index - 1))
+            last_index = index
+
+            if ticks < 0:
+                # Too short for a tail, only the head counts.
+                time.append(start)
+                kind.append(HEAD)
+                progress.append(0.0)
+                count = 1
+            else:
+                count = ticks * repeat_count + repeat_count + 1
+                span_duration = duration / repeat_count
+                tick_offsets = [ tick * tick_spacing for tick in range(1, ticks + 1) ]
+                forward = [ offset / span_duration if span_duration else 0.0 for offset in tick_offsets ]
+                # Reverse spans meet the same ticks in opposite order.
+                backward = [ span_duration - offset for offset in reversed(tick_offsets) ]
+
+                time.append(start)
+                progress.append(0.0)
+                for span in range(repeat_count):
+                    span_start = start + span * span_duration
+                    if span % 2:
+                        time.extend([ span_start + offset for offset in backward ])
+                        progress.extend(reversed(forward))
+                    else:
+                        time.extend([ span_start + offset for offset in tick_offsets ])
+                        progress.extend(forward)
+
+                    if span < repeat_count - 1:
+                        time.append(span_start + span_duration)
+                        progress.append(0.0 if span % 2 else 1.0)
+
+                tail_time = max(start + duration / 2.0, start + duration - TAIL_LENIENCY)
+                time.append(tail_time)
+                # Progress of tail, which may sit on an earlier span of short sliders.
+                span = min(repeat_count - 1, int((tail_time - start) / span_duration)) if span_duration else 0
+                tail_progress = (tail_time - start - span * span_duration) / span_duration if span_duration else 1.0
+                progress.append(1.0 - tail_progress if span % 2 else tail_progress)
+
+                kind.append(HEAD)
+                kind.extend(([TICK] * ticks + [REPEAT]) * (repeat_count - 1))
+                kind.extend([TICK] * ticks)
+                kind.append(TAIL)
+
+            slider.extend([index] * count)
+            event_offsets.append(len(time))
+            events.sliders += 1
+
+        event_offsets.extend([len(time)] * (len(beatmap.hit_objects) - last_index - 1))
+        return events
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __repr__(self) -> str:
+        return f"<SliderEvents sliders={self.sliders} events={len(self)}>"
+
+    def events_of(self, index: int) -> range:
+        """Event indices of hit object."""
+        return range(self.offsets[index], self.offsets[index + 1])
+
+    def max_combo(self, objects: int) -> int:
+        """Max combo of map with given amount of hit objects, every event counts once."""
+        return objects - self.sliders + len(self)
+
+    @property
+    def has_positions(self) -> bool:
+        """Whether `compute_positions` filled x/y."""
+        return len(self.x) == len(self)
+
+    def compute_positions(self, paths) -> "SliderEvents":
+        """Fills x/y of all events from SliderPaths in one batched lookup."""
+        if not self.has_positions:
+            xs, ys = paths.positions_at(self.slider, self.progress)
+            self.x, self.y = array("d", xs), array("d", ys)
+
+        return self
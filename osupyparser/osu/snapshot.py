@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import math
+import struct
+from array import array
+from .objects import TimingPoint
+from .store import HitObjectStore
+from .store import STORE_COLUMNS
+from ..snapshot import SnapshotReader
+from ..snapshot import SnapshotWriter
+from ..snapshot import KIND_BEATMAP
+
+# Scalar fields of OsuFile, (attribute, struct code).
+BEATMAP_FIELDS = (
+    ("file_version", "i"),
+    ("audio_lead_in", "i"),
+    ("preview_time", "i"),
+    ("countdown", "i"),
+    ("stack_leniency", "d"),
+    ("mode", "i"),
+    ("letterbox_in_breaks", "?"),
+    ("widescreen_storyboard", "?"),
+    ("distance_spacing", "d"),
+    ("beat_divisor", "i"),
+    ("grid_size", "i"),
+    ("timeline_zoom", "d"),
+    ("beatmap_id", "i"),
+    ("beatmap_set_id", "i"),
+    ("hp", "d"),
+    ("cs", "d"),
+    ("od", "d"),
+    ("ar", "d"),
+    ("slider_multiplier", "d"),
+    ("slider_tick_rate", "d"),
+    ("has_video", "?"),
+    ("break_time", "q"),
+    ("max_combo", "i"),
+    ("bpm", "i"),
+    ("total_hits", "i"),
+    ("play_time", "q"),
+    ("drain_time", "q"),
+    ("ncircles", "i"),
+    ("nsliders", "i"),
+    ("nspinners", "i"),
+)
+BEATMAP_LAYOUT = struct.Struct("<" + "".join(code for _, code in BEATMAP_FIELDS))
+
+BEATMAP_STRINGS = (
+    "audio_filename",
+    "sample_set",
+    "title",
+    "title_unicode",
+    "artist",
+    "artist_unicode",
+    "creator",
+    "version",
+    "source",
+    "tags",
+    "video_file",
+    "background_file",
+    "md5",
+)
+
+# TimingPoint field -> array typecode. Optional bools are 0/1, 2 for None,
+# missing velocity/bpm are NaN.
+TIMING_COLUMNS = {
+    "offset": "d",
+    "beat_length": "d",
+    "time_signature": "i",
+    "sample_set_id": "i",
+    "custom_sample_index": "i",
+    "sample_volume": "i",
+    "timing_change": "b",
+    "kiai_time_active": "b",
+    "velocity": "d",
+    "bpm": "d",
+}
+OPTIONAL_BOOL = {None: 2, False: 0, True: 1}
+
+
+def write_beatmap(beatmap) -> bytes:
+    """Lays parsed OsuFile out into a snapshot."""
+    writer = SnapshotWriter(KIND_BEATMAP)
+    writer.add_struct("fields", BEATMAP_LAYOUT, tuple(
+        getattr(beatmap, name) for name, _ in BEATMAP_FIELDS))
+    writer.add_strings("strings", [getattr(beatmap, name) for name in BEATMAP_STRINGS])
+    writer.add_strings("sections", sorted(beatmap.parsed_sections))
+    writer.add_strings("extra", [
+        value
+        for section, fields in beatmap.extra_fields.items()
+        for key, field in fields.items()
+        for value in (section, key, field)
+    ])
+    writer.add_array("breaks", array("q", (
+        time for break_time in beatmap.break_times for time in break_time)))
+    writer.add_strings("colnames", list(beatmap.colours))
+    writer.add_array("colours", array("i", (
+        channel for rgb in beatmap.colours.values() for channel in rgb)))
+
+    for i, (name, code) in enumerate(TIMING_COLUMNS.items()):
+        values = [getattr(point, name) for point in beatmap.timing_points]
+        if code == "b":
+            values = [OPTIONAL_BOOL[value] for value in values]
+        elif name in ("velocity", "bpm"):
+            values = [math.nan if value is None else value for value in values]
+        writer.add_array(f"tp{i}", array(code, values))
+
+    store = beatmap.hit_object_store
+    if store is None:
+        store = HitObjectStore.from_objects(beatmap.hit_objects)
+    for i, name in enumerate(STORE_COLUMNS):
+        writer.add_array(f"ho{i}", getattr(store, name))
+    writer.add_strings("hoextras", store.extras_table)
+
+    return writer.to_bytes()
+
+
+def read_beatmap(beatmap, reader: SnapshotReader):
+    """Fills OsuFile from snapshot, hit objects stay in the buffer."""
+    for (name, _), value in zip(BEATMAP_FIELDS, reader.read_struct("fields", BEATMAP_LAYOUT)):
+        setattr(beatmap, name, value)
+    for name, value in zip(BEATMAP_STRINGS, reader.read_strings("strings")):
+        setattr(beatmap, name, value)
+    beatmap.parsed_sections = set(reader.read_strings("sections"))
+
+    extra = reader.read_strings("extra")
+    for i in range(0, len(extra), 3):
+        beatmap.extra_fields.setdefault(extra[i], {})[extra[i + 1]] = extra[i + 2]
+
+    breaks = reader.read_array("breaks", "q")
+    beatmap.break_times = [[breaks[i], breaks[i + 1]] for i in range(0, len(breaks), 2)]
+
+    colours = reader.read_array("colours", "i")
+    beatmap.colours = {
+        name: (colours[i * 3], colours[i * 3 + 1], colours[i * 3 + 2])
+        for i, name in enumerate(reader.read_strings("colnames"))
+    }
+
+    columns = [
+        reader.read_array(f"tp{i}", code) for i, code in enumerate(TIMING_COLUMNS.values())
+    ]
+    optional_bool = {code: value for value, code in OPTIONAL_BOOL.items()}
+    for values in zip(*columns):
+        point = dict(zip(TIMING_COLUMNS, values))
+        point["timing_change"] = optional_bool[point["timing_change"]]
+        point["kiai_time_active"] = optional_bool[point["kiai_time_active"]]
+        if math.isnan(point["velocity"]):
+            point["velocity"] = None
+        point["bpm"] = None if math.isnan(point["bpm"]) else round(point["bpm"])
+        beatmap.timing_points.append(TimingPoint(**point))
+
+    store = HitObjectStore.from_columns(
+        {name: reader.read_array(f"ho{i}", code) for i, (name, code) in enumerate(STORE_COLUMNS.items())},
+        reader.read_strings("hoextras"),
+    )
+    beatmap.hit_object_store = beatmap.hit_objects = store
+    return beatmap
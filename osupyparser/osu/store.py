@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+from array import array
+from collections.abc import Sequence
+from typing import Dict
+from typing import List
+from typing import Optional
+from .objects import Position
+from .objects import Circle
+from .objects import Slider
+from .objects import Spinner
+from .objects import HitObject
+from .objects import Additions
+from .objects import Edge
+from .constants import ObjectType
+from .constants import CURVE_TYPES
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional.
+    numpy = None
+
+SAMPLE_SETS = {
+    "1": "Normal",
+    "2": "Soft",
+    "3": "Drum"
+}
+SAMPLE_SET_IDS = {name: sample_id for sample_id, name in SAMPLE_SETS.items()}
+
+# Column name -> array typecode.
+STORE_COLUMNS = {
+    "x": "i",
+    "y": "i",
+    "start_time": "i",
+    "end_time": "i",
+    # Raw type, also holds new combo and combo offset bits.
+    "type_flags": "H",
+    # ObjectType.CIRCLE/SLIDER/SPINNER, 0 for unknown objects.
+    "kind": "B",
+    "sound": "H",
+    # Slider only columns, zero for other objects.
+    "repeat_count": "i",
+    "pixel_length": "d",
+    "duration": "i",
+    "curve_type": "B",
+    # Slider control points of object i are point_x/point_y[point_offsets[i]:point_offsets[i + 1]].
+    "point_offsets": "I",
+    "point_x": "i",
+    "point_y": "i",
+    # Index into extras_table, the additions/edges text of object.
+    "extras": "I",
+}
+
+
+def parse_addition(line: str) -> Optional[Additions]:
+    """Parses addictional hitobject data."""
+    if not line:
+        return None
+
+    data = line.split(":")
+    addition = {}
+    if not data:
+        return None
+    if len(data) > 0:
+        addition['normal'] = SAMPLE_SETS.get(data[0], None)
+    if len(data) > 1:
+        addition['additional'] = SAMPLE_SETS.get(data[1], None)
+    if len(data) > 2:
+        addition['custom_sample_index'] = int(data[2])
+    if len(data) > 3:
+        addition['volume'] = max(0, int(data[3]))
+    if len(data) > 4:
+        addition['filename'] = data[4]
+
+    return Additions(**addition)
+
+
+def object_kind(hitobject: HitObject) -> int:
+    """ObjectType.CIRCLE/SLIDER/SPINNER of hit object dataclass, 0 if unknown."""
+    if isinstance(hitobject, Slider):
+        return ObjectType.SLIDER
+    elif isinstance(hitobject, Spinner):
+        return ObjectType.SPINNER
+    elif isinstance(hitobject, Circle):
+        return ObjectType.CIRCLE
+
+    return 0
+
+
+def format_addition(addition: Optional[Additions]) -> str:
+    """Formats additions back into hitobject text, inverse of parse_addition."""
+    if addition is None:
+        return ""
+
+    data = [SAMPLE_SET_IDS.get(addition.normal, "0")]
+    if addition.additional != "":
+        data.append(SAMPLE_SET_IDS.get(addition.additional, "0"))
+    if addition.custom_sample_index != "":
+        data += [str(addition.custom_sample_index), str(addition.volume)]
+    if addition.filename is not None:
+        data.append(addition.filename)
+
+    return ":".join(data)
+
+
+def format_extras(hitobject: HitObject) -> str:
+    """Formats additions and edges of hit object, as kept in extras_table."""
+    if isinstance(hitobject, Slider):
+        return ",".join((
+            "|".join(edge.sound_types for edge in hitobject.edges if edge.sound_types is not None),
+            "|".join(format_addition(edge.additions) for edge in hitobject.edges),
+            format_addition(hitobject.additions),
+        ))
+    if isinstance(hitobject, (Circle, Spinner)):
+        return format_addition(hitobject.additions)
+
+    return ""
+
+
+def parse_edges(repeat_count: int, sounds: str, additions: str) -> List[Edge]:
+    """Parses slider edge hitsounds and additions."""
+    edge_sounds = sounds.split("|")
+    edge_additions = additions.split("|")
+    edges = []
+
+    for i in range(0, repeat_count + 1):
+        edge_addition = None
+        sound_edge_enum = None
+        if i < len(edge_additions):
+            edge_addition = parse_addition(edge_additions[i])
+
+        if i < len(edge_sounds):
+            sound_edge_enum = edge_sounds[i]
+
+        edges.append(Edge(sound_edge_enum, edge_addition))
+
+    return edges
+
+
+class HitObjectStore(Sequence):
+    """Compact struct-of-arrays storage of hit objects.
+
+    Every field lives in a typed `array.array` column, slider control
+    points in flat arrays indexed by `point_offsets`. Additions and edge
+    texts are interned in `extras_table`. Indexing builds the usual hit
+    object dataclasses on access.
+    """
+
+    def __init__(self) -> None:
+        for name, code in STORE_COLUMNS.items():
+            setattr(self, name, array(code))
+        self.point_offsets.append(0)
+
+        self.extras_table: List[str] = [""]
+        self.__extras_ids: Dict[str, int] = {"": 0}
+        # Objects store was built from, if any.
+        self.source: Optional[List[HitObject]] = None
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Sequence], extras_table: List[str]) -> "HitObjectStore":
+        """Builds store over existing columns (arrays or memoryviews), without copying."""
+        store = cls()
+        for name in STORE_COLUMNS:
+            setattr(store, name, columns[name])
+
+        store.extras_table = extras_table
+        store.__extras_ids = {extras: i for i, extras in enumerate(extras_table)}
+        return store
+
+    @classmethod
+    def from_objects(cls, objects: List[HitObject]) -> "HitObjectStore":
+        """Builds arrays from parsed hit object dataclasses."""
+        store = cls()
+        store.source = objects
+
+        for hitobject in objects:
+            kind = object_kind(hitobject)
+
+            store.x.append(hitobject.pos.x)
+            store.y.append(hitobject.pos.y)
+            store.start_time.append(hitobject.start_time)
+            store.end_time.append(getattr(hitobject, "end_time", hitobject.start_time))
+            store.type_flags.append(kind | (ObjectType.NEW_COMBO if hitobject.new_combo else 0))
+            store.kind.append(kind)
+            store.sound.append(hitobject.sound_enum)
+            store.extras.append(store.intern_extras(format_extras(hitobject)))
+
+            if kind == ObjectType.SLIDER:
+                store.repeat_count.append(hitobject.repeat_count)
+                store.pixel_length.append(hitobject.pixel_length)
+                store.duration.append(hitobject.duration)
+                store.curve_type.append(ord(hitobject.curve_type[0]) if hitobject.curve_type else 0)
+                for point in hitobject.points:
+                    store.point_x.append(point.x)
+                    store.point_y.append(point.y)
+            else:
+                store.repeat_count.append(0)
+                store.pixel_length.append(0.0)
+                store.duration.append(0)
+                store.curve_type.append(0)
+            store.point_offsets.append(len(store.point_x))
+
+        return store
+
+    def intern_extras(self, extras: str) -> int:
+        """Index of extras text in extras_table, adding it if new."""
+        extras_id = self.__extras_ids.get(extras)
+        if extras_id is None:
+            extras_id = self.__extras_ids[extras] = len(self.extras_table)
+            self.extras_table.append(extras)
+
+        return extras_id
+
+    def append_fields(self, data: List[str], duration: int = 0) -> None:
+        """Appends hit object from split [HitObjects] line."""
+        _type = int(data[3])
+        start_time = int(data[2])
+        end_time = start_time
+        repeat_count = 0
+        pixel_length = 0.0
+        curve_type = 0
+
+        if _type & ObjectType.CIRCLE:
+            kind = ObjectType.CIRCLE
+            tail = data[5:]
+        elif _type & ObjectType.SPINNER:
+            kind = ObjectType.SPINNER
+            end_time = int(data[5])
+            tail = data[6:]
+        elif _type & ObjectType.SLIDER:
+            kind = ObjectType.SLIDER
+            points = ('' if not len(data) > 5 else data[5]).split("|")
+            if points[0]:
+                curve_type = ord(points[0][0])
+            for point in points[1:]:
+                x, y = point.split(":")
+                self.point_x.append(int(x))
+                self.point_y.append(int(y))
+
+            repeat_count = int(data[6])
+            pixel_length = float(data[7])
+            end_time = start_time + duration
+            tail = data[8:]
+        else:
+            # Might be some hitobject I dont know about..
+            kind = 0
+            tail = []
+
+        extras_id = self.intern_extras(",".join(tail))
+
+        self.x.append(int(data[0]))
+        self.y.append(int(data[1]))
+        self.start_time.append(start_time)
+        self.end_time.append(end_time)
+        self.type_flags.append(_type)
+        self.kind.append(kind)
+        self.sound.append(int(data[4]))
+        self.repeat_count.append(repeat_count)
+        self.pixel_length.append(pixel_length)
+        self.duration.append(duration if kind == ObjectType.SLIDER else 0)
+        self.curve_type.append(curve_type)
+        self.point_offsets.append(len(self.point_x))
+        self.extras.append(extras_id)
+
+    def __len__(self) -> int:
+        return len(self.start_time)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.object_at(i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("hit object index out of range")
+
+        return self.object_at(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.object_at(i)
+
+    def __repr__(self) -> str:
+        return f"<HitObjectStore objects={len(self)}>"
+
+    def points_of(self, index: int) -> List[Position]:
+        """Slider control points of given object."""
+        start, end = self.point_offsets[index], self.point_offsets[index + 1]
+        return [
+            Position(x, y) for x, y in zip(self.point_x[start:end], self.point_y[start:end])
+        ]
+
+    def object_at(self, index: int) -> HitObject:
+        """Builds hit object dataclass for given index."""
+        if self.source is not None:
+            return self.source[index]
+
+        kind = self.kind[index]
+        pos = Position(self.x[index], self.y[index])
+        start_time = self.start_time[index]
+        new_combo = (self.type_flags[index] & ObjectType.NEW_COMBO) == 4
+        sound = self.sound[index]
+        tail = self.extras_table[self.extras[index]].split(",")
+
+        if kind == ObjectType.CIRCLE:
+            return Circle(
+                pos=pos,
+                start_time=start_time,
+                new_combo=new_combo,
+                sound_enum=sound,
+                additions=parse_addition(tail[0])
+            )
+        elif kind == ObjectType.SPINNER:
+            return Spinner(
+                pos=pos,
+                start_time=start_time,
+                new_combo=new_combo,
+                sound_enum=sound,
+                end_time=self.end_time[index],
+                additions=parse_addition(tail[0])
+            )
+        elif kind == ObjectType.SLIDER:
+            points = self.points_of(index)
+            repeat_count = self.repeat_count[index]
+            curve_type = self.curve_type[index]
+            return Slider(
+                pos=pos,
+                start_time=start_time,
+                new_combo=new_combo,
+                sound_enum=sound,
+                repeat_count=repeat_count,
+                pixel_length=self.pixel_length[index],
+                edges=parse_edges(
+                    repeat_count, tail[0], '' if not len(tail) > 1 else tail[1]),
+                points=points,
+                duration=self.duration[index],
+                end_time=self.end_time[index],
+                curve_type=CURVE_TYPES.get(chr(curve_type) if curve_type else ""),
+                end_position=points[-1],
+                additions=None if not len(tail) > 2 else parse_addition(tail[2])
+            )
+
+        return HitObject(
+            pos=pos,
+            start_time=start_time,
+            new_combo=new_combo,
+            sound_enum=sound
+        )
+
+    def column(self, name: str) -> memoryview:
+        """Returns zero-copy view of given column."""
+        if name not in STORE_COLUMNS:
+            raise KeyError(f"Unknown hit object column: {name}")
+
+        return memoryview(getattr(self, name))
+
+    def to_numpy(self, name: Optional[str] = None):
+        """Returns zero-copy NumPy view of a column (or dict of all columns)."""
+        if numpy is None:
+            raise ImportError("NumPy is required for to_numpy().")
+
+        if name is None:
+            return {col: numpy.frombuffer(self.column(col), dtype=code) for col, code in STORE_COLUMNS.items()}
+
+        return numpy.frombuffer(self.column(name), dtype=STORE_COLUMNS[name])
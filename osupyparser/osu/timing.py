@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from array import array
+from bisect import bisect_right
+from typing import List
+from typing import Optional
+from .objects import TimingPoint
+
+# Beat length used when map has no uninherited timing point.
+DEFAULT_BEAT_LENGTH = 1000.0
+# Slider velocity multiplier is clamped by the game.
+MIN_SV = 0.1
+MAX_SV = 10.0
+
+
+def is_uninherited(point: TimingPoint) -> bool:
+    """Whether timing point is a BPM (red) line."""
+    if point.timing_change is None:
+        # Old maps have no such field, negative beat length means inherited.
+        return point.beat_length > 0
+
+    return point.timing_change
+
+
+class TimingTimeline:
+    """Timing points sorted by offset for O(log n) lookups.
+
+    Uninherited (BPM) and inherited (SV) lines are kept in separate offset
+    arrays. Points with the same offset keep their file order, the later
+    one wins.
+    """
+
+    def __init__(self, timing_points: List[TimingPoint]) -> None:
+        self.points: List[TimingPoint] = sorted(
+            timing_points, key=lambda point: point.offset)
+        self.offsets: array = array("d")
+        # Slider velocity in effect from each point on.
+        self.sv: array = array("d")
+
+        self.uninherited: List[TimingPoint] = []
+        self.uninherited_offsets: array = array("d")
+        self.beat_lengths: array = array("d")
+
+        self.inherited: List[TimingPoint] = []
+        self.inherited_offsets: array = array("d")
+        self.inherited_sv: array = array("d")
+
+        for point in self.points:
+            self.offsets.append(point.offset)
+            if is_uninherited(point):
+                self.uninherited.append(point)
+                self.uninherited_offsets.append(point.offset)
+                self.beat_lengths.append(point.beat_length)
+                # BPM line resets velocity.
+                self.sv.append(1.0)
+            else:
+                sv = 1.0
+                if point.beat_length < 0:
+                    sv = min(MAX_SV, max(MIN_SV, -100.0 / point.beat_length))
+                self.inherited.append(point)
+                self.inherited_offsets.append(point.offset)
+                self.inherited_sv.append(sv)
+                self.sv.append(sv)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def index_at(self, time: float) -> int:
+        """Index of point active at given time, -1 if before all points."""
+        return bisect_right(self.offsets, time) - 1
+
+    def active_at(self, time: float) -> Optional[TimingPoint]:
+        """Finds timing point active at given time (first one if before all)."""
+        if not self.points:
+            return None
+
+        return self.points[max(0, self.index_at(time))]
+
+    def uninherited_at(self, time: float) -> Optional[TimingPoint]:
+        """Finds BPM line active at given time (first one if before all)."""
+        if not self.uninherited:
+            return None
+
+        index = bisect_right(self.uninherited_offsets, time) - 1
+        return self.uninherited[max(0, index)]
+
+    def beat_length_at(self, time: float) -> float:
+        """Beat length (ms) at given time."""
+        if not self.beat_lengths:
+            return DEFAULT_BEAT_LENGTH
+
+        index = bisect_right(self.uninherited_offsets, time) - 1
+        return self.beat_lengths[max(0, index)]
+
+    def sv_at(self, time: float) -> float:
+        """Slider velocity multiplier at given time."""
+        index = self.index_at(time)
+        if index < 0:
+            return 1.0
+
+        return self.sv[index]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Optional instrumentation of parsing.
+
+Pass an observer as `observer=` to `OsuFile.parse_file`/`from_*` or
+`ReplayFile.from_*`. Parsers only check for it at section and stage
+boundaries, so parsing without one costs nothing extra.
+"""
+import time
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+
+
+class ParseObserver:
+    """Receives parse events, all hooks do nothing by default."""
+
+    def on_section(self, name: str, lines: int, seconds: float) -> None:
+        """Section of .osu file was read, `lines` includes blank ones."""
+
+    def on_stage(self, name: str, seconds: float) -> None:
+        """Parse stage finished, e.g. "header", "lzma", "frames", "max_combo"."""
+
+    def on_count(self, name: str, value: int) -> None:
+        """Amount of something parsed, e.g. "frames", "hit_objects", "bytes_decompressed"."""
+
+
+class ParseProfiler(ParseObserver):
+    """Observer collecting all events, usable as context manager.
+
+    Repeated events are summed up, so one profiler can watch many parses.
+    """
+
+    def __init__(self) -> None:
+        # Section name -> {"lines": int, "seconds": float}.
+        self.sections: Dict[str, Dict[str, float]] = {}
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # Wall time spent inside `with` block.
+        self.total: float = 0.0
+        self.__start: Optional[float] = None
+
+    def __enter__(self) -> "ParseProfiler":
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.total += time.perf_counter() - self.__start
+        self.__start = None
+
+    def on_section(self, name: str, lines: int, seconds: float) -> None:
+        section = self.sections.setdefault(name, {"lines": 0, "seconds": 0.0})
+        section["lines"] += lines
+        section["seconds"] += seconds
+
+    def on_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def on_count(self, name: str, value: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        """All collected figures, JSON serialisable."""
+        return {
+            "total": self.total,
+            "sections": self.sections,
+            "stages": self.stages,
+            "counts": self.counts,
+        }
+
+
+class SectionTimer:
+    """Tracks line counts and wall time of .osu sections for an observer."""
+
+    def __init__(self, observer: ParseObserver) -> None:
+        self.observer: ParseObserver = observer
+        self.lines: int = 0
+        self.bytes: int = 0
+        self.__section: Optional[str] = None
+        self.__section_lines: int = 0
+        self.__section_start: float = time.perf_counter()
+
+    def count(self, lines: Iterable[bytes]) -> Iterator[bytes]:
+        """Wraps line iterator, counting lines and bytes read."""
+        for line in lines:
+            self.lines += 1
+            self.bytes += len(line)
+            yield line
+
+    def enter(self, name: str) -> None:
+        """Closes current section and starts next one, called after its header line."""
+        self.__finish(self.lines - 1)
+        self.__section = name
+        self.__section_lines = self.lines
+
+    def close(self) -> None:
+        """Closes last section."""
+        self.__finish(self.lines)
+        self.__section = None
+
+    def __finish(self, lines: int) -> None:
+        now = time.perf_counter()
+        if self.__section is not None:
+            self.observer.on_section(self.__section, lines - self.__section_lines, now - self.__section_start)
+        self.__section_start = now
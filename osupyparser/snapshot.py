@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Versioned little-endian binary snapshots of parsed data.
+
+Layout:
+    header     <4sHHI   magic, format version, kind, section count
+    directory  <8sQQ    per section: name, offset, size in bytes
+    sections   each starting at 8 byte aligned offset
+
+Sections hold either a packed struct of scalar fields, a string table
+(<I count, <I offsets[count + 1], utf-8 blob) or a raw typed array.
+Arrays are read back as memoryviews over the buffer, so a memory mapped
+snapshot is usable without a deserialisation pass.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+
+SNAPSHOT_MAGIC = b"OPSN"
+SNAPSHOT_VERSION = 1
+
+# Snapshot kinds.
+KIND_BEATMAP = 1
+KIND_REPLAY = 2
+
+HEADER = struct.Struct("<4sHHI")
+DIRECTORY_ENTRY = struct.Struct("<8sQQ")
+COUNT = struct.Struct("<I")
+ALIGNMENT = 8
+
+# Arrays are stored little-endian, big-endian hosts swap them.
+NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def _padding(size: int) -> int:
+    return -size % ALIGNMENT
+
+
+class SnapshotWriter:
+    """Collects sections and lays them out into a snapshot."""
+
+    def __init__(self, kind: int) -> None:
+        self.kind: int = kind
+        self.__sections: List[Tuple[str, bytes]] = []
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        """Adds raw section."""
+        self.__sections.append((name, data))
+
+    def add_struct(self, name: str, layout: struct.Struct, values: tuple) -> None:
+        """Adds section of packed scalar fields."""
+        self.add_bytes(name, layout.pack(*values))
+
+    def add_array(self, name: str, data: Union[array, memoryview]) -> None:
+        """Adds typed array section."""
+        if not NATIVE_LITTLE_ENDIAN:
+            data = array(data.typecode if isinstance(data, array) else data.format, data)
+            data.byteswap()
+        self.add_bytes(name, bytes(data))
+
+    def add_strings(self, name: str, strings: List[str]) -> None:
+        """Adds string table section."""
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = array("I", [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        if not NATIVE_LITTLE_ENDIAN:
+            offsets.byteswap()
+
+        self.add_bytes(name, COUNT.pack(len(encoded)) + bytes(offsets) + b"".join(encoded))
+
+    def write(self, stream: BinaryIO) -> None:
+        """Writes the snapshot into binary file object."""
+        stream.write(self.to_bytes())
+
+    def to_bytes(self) -> bytes:
+        """Builds the snapshot."""
+        output = bytearray()
+        output += HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.kind, len(self.__sections))
+
+        offset = HEADER.size + DIRECTORY_ENTRY.size * len(self.__sections)
+        offset += _padding(offset)
+        for name, data in self.__sections:
+            output += DIRECTORY_ENTRY.pack(name.encode("ascii"), offset, len(data))
+            offset += len(data) + _padding(len(data))
+
+        for _, data in self.__sections:
+            output += b"\0" * _padding(len(output))
+            output += data
+        output += b"\0" * _padding(len(output))
+
+        return bytes(output)
+
+
+class SnapshotReader:
+    """Gives access to sections of a snapshot buffer."""
+
+    def __init__(self, data: Buffer, kind: int) -> None:
+        self.buffer: memoryview = memoryview(data).cast("B")
+        if len(self.buffer) < HEADER.size:
+            raise ValueError("Snapshot is too short!")
+
+        magic, version, snapshot_kind, count = HEADER.unpack_from(self.buffer)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Unknown snapshot magic! Excepted: {SNAPSHOT_MAGIC}, got {magic}")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version! Excepted: {SNAPSHOT_VERSION}, got {version}")
+        if snapshot_kind != kind:
+            raise ValueError(f"Wrong snapshot kind! Excepted: {kind}, got {snapshot_kind}")
+
+        self.sections: Dict[str, Tuple[int, int]] = {}
+        for i in range(count):
+            name, offset, size = DIRECTORY_ENTRY.unpack_from(
+                self.buffer, HEADER.size + i * DIRECTORY_ENTRY.size)
+            self.sections[name.rstrip(b"\0").decode("ascii")] = (offset, size)
+
+    @classmethod
+    def from_source(cls, source: Union[str, Buffer], kind: int) -> "SnapshotReader":
+        """Opens snapshot from buffer, or memory maps it from file path."""
+        if isinstance(source, str):
+            with open(source, "rb") as stream:
+                source = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return cls(source, kind)
+
+    def section(self, name: str) -> memoryview:
+        """Raw bytes of a section."""
+        offset, size = self.sections[name]
+        return self.buffer[offset:offset + size]
+
+    def read_struct(self, name: str, layout: struct.Struct) -> tuple:
+        """Unpacks scalar fields section."""
+        return layout.unpack_from(self.section(name))
+
+    def read_array(self, name: str, typecode: str) -> Union[memoryview, array]:
+        """Typed view of an array section (copy on big-endian hosts)."""
+        view = self.section(name).cast(typecode)
+        if NATIVE_LITTLE_ENDIAN:
+            return view
+
+        data = array(typecode, view)
+        data.byteswap()
+        return data
+
+    def read_strings(self, name: str) -> List[str]:
+        """Decodes string table section."""
+        data = self.section(name)
+        count = COUNT.unpack_from(data)[0]
+        offsets = struct.unpack_from(f"<{count + 1}I", data, COUNT.size)
+        blob = data[COUNT.size * (count + 2):]
+        return [str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(count)]
@@ -1,4 +1,26 @@
 from osupyparser import OsuFile
+from osupyparser import TimingTimeline
+from osupyparser import HitObjectStore
+from osupyparser import SliderPath
+from osupyparser import BeatmapCache
+from osupyparser import BeatmapIndex
+from osupyparser import ParseProfiler
+from osupyparser import Mods
+from osupyparser import calculate_pp_many
+from osupyparser import mod_variants
+from osupyparser import SliderEvents
+from osupyparser.osu.performance import hits_for_accuracy
+from osupyparser.osu.slider_events import HEAD
+from osupyparser.osu.slider_events import TICK
+from osupyparser.osu.slider_events import REPEAT
+from osupyparser.osu.slider_events import TAIL
+from benchmarks.generators import generate_beatmap
+from unittest import mock
+import tempfile
+import pickle
+import os
+import asyncio
+import shutil
 import time
 import unittest
 
@@ -22,6 +44,341 @@ class TestBeatmap(unittest.TestCase):
         data = OsuFile("tests//testLazerUTF8BOM.osu").parse_file()
         self.assertTrue(data.__dict__)
 
+    def test_selected_sections(self):
+        full = OsuFile("tests//testv2.osu").parse_file()
+        data = OsuFile("tests//testv2.osu").parse_file(sections={"Metadata", "Difficulty"})
+        self.assertEqual(data.title, full.title)
+        self.assertEqual(data.ar, full.ar)
+        # Rest of the file is only read for md5 when asked to.
+        self.assertEqual(data.md5, "")
+        self.assertEqual(OsuFile("tests//testv2.osu").parse_file(sections={"Metadata", "Difficulty"}, full_md5= True).md5, full.md5)
+        with open("tests//testv2.osu", "rb") as stream:
+            lines = iter(stream.readlines())
+        OsuFile.from_lines(lines, sections={"General"})
+        self.assertIsNotNone(next(lines, None))
+        self.assertEqual(data.audio_filename, "")
+        self.assertEqual(data.hit_objects, [])
+        self.assertEqual(data.max_combo, 0)
+        self.assertEqual(data.parsed_sections, {"metadata", "difficulty"})
+
+    def test_from_bytes_stream_lines(self):
+        full = OsuFile("tests//testLazerUTF8BOM.osu").parse_file()
+        with open("tests//testLazerUTF8BOM.osu", "rb") as stream:
+            buffer = stream.read()
+            stream.seek(0)
+            from_stream = OsuFile.from_stream(stream)
+        from_bytes = OsuFile.from_bytes(buffer)
+        with open("tests//testLazerUTF8BOM.osu", encoding= "utf-8", newline= "") as stream:
+            from_lines = OsuFile.from_lines(stream)
+
+        for data in (from_stream, from_bytes, from_lines):
+            self.assertEqual(data.md5, full.md5)
+            self.assertEqual(data.title, full.title)
+            self.assertEqual(data.max_combo, full.max_combo)
+            self.assertEqual(len(data.hit_objects), len(full.hit_objects))
+
+        self.assertRaises(ValueError, OsuFile.from_bytes, b"not a beatmap")
+        self.assertRaises(ValueError, OsuFile().parse_file)
+
+    def test_timing_timeline(self):
+        data = OsuFile("tests//test.osu").parse_file()
+        timeline = data.timeline
+        self.assertIsInstance(timeline, TimingTimeline)
+        self.assertEqual(timeline.beat_length_at(50000), 327.868852459016)
+        self.assertEqual(timeline.sv_at(1240), 0.5)
+        self.assertEqual(timeline.sv_at(22223), 1.0)
+        self.assertEqual(timeline.sv_at(0), 1.0)
+        self.assertEqual(data.get_timing_point(85174).offset, 85174)
+        self.assertEqual(data.get_timing_point(11000).offset, 10502)
+
+        slider = data.hit_objects[0]
+        self.assertEqual(slider.duration, 984)
+        self.assertEqual(slider.end_time, 2224)
+        self.assertEqual(data.max_combo, 549)
+
+    def test_key_value_schema(self):
+        data = OsuFile.from_lines([
+            "osu file format v14\n",
+            "[General]\n",
+            "StackLeniency: 0.7\n",
+            "EpilepsyWarning: 1\n",
+            "[Metadata]\n",
+            "TitleUnicode:Title: With Colon\n",
+            "Title:Plain\n",
+        ])
+        self.assertEqual(data.stack_leniency, 0.7)
+        self.assertEqual(data.title, "Plain")
+        self.assertEqual(data.title_unicode, "Title: With Colon")
+        self.assertEqual(data.extra_fields, {"general": {"EpilepsyWarning": "1"}})
+
+    def test_compact_store(self):
+        full = OsuFile("tests//testv2.osu").parse_file()
+        data = OsuFile("tests//testv2.osu").parse_file(compact= True)
+        store = data.hit_object_store
+        self.assertIsInstance(store, HitObjectStore)
+        self.assertIs(data.hit_objects, store)
+        self.assertEqual(list(store), full.hit_objects)
+        self.assertEqual(store[-1], full.hit_objects[-1])
+        self.assertEqual(data.max_combo, full.max_combo)
+        self.assertEqual(store.column("start_time").format, "i")
+
+        rebuilt = HitObjectStore.from_objects(full.hit_objects)
+        self.assertEqual(list(rebuilt.end_time), list(store.end_time))
+
+    def test_slider_paths(self):
+        data = OsuFile("tests//test.osu").parse_file()
+        paths = data.slider_paths
+        self.assertEqual(len(paths), len(data.hit_objects))
+
+        for hitobject, path in zip(data.hit_objects, paths.paths):
+            if path is not None:
+                self.assertAlmostEqual(path.distance, hitobject.pixel_length)
+                x, y = path.position_at(0)
+                self.assertAlmostEqual(x, hitobject.pos.x)
+                self.assertAlmostEqual(y, hitobject.pos.y)
+
+        xs, ys = paths.positions_at([0, 0], [0.0, 1.0])
+        self.assertEqual((xs[1], ys[1]), paths[0].end_position)
+
+        # Batches mixing sliders with other objects are rejected, not misread.
+        circle = next(i for i, path in enumerate(paths.paths) if path is None)
+        slider = max(i for i, path in enumerate(paths.paths) if path is not None)
+        xs, ys = paths.positions_at([0, slider], [1.0, 0.0])
+        self.assertEqual((xs[1], ys[1]), paths[slider].position_at(0.0))
+        self.assertRaises(ValueError, paths.positions_at, [slider, circle], [0.5, 0.5])
+        self.assertRaises(IndexError, paths.positions_at, [len(paths)], [0.5])
+        self.assertRaises(IndexError, paths.positions_at, [-1], [0.5])
+        self.assertEqual(paths[0].position_along(1.0, 2), paths[0].position_at(0))
+
+        line = SliderPath("Linear", [(0, 0), (100, 0)], 150)
+        self.assertEqual(line.end_position, (150.0, 0.0))
+        arc = SliderPath("P", [(0, 0), (50, 50), (100, 0)])
+        self.assertAlmostEqual(arc.position_at(0.5)[1], 50.0)
+
+    def test_beatmap_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = BeatmapCache(max_entries= 1, directory= directory)
+            first = cache.parse_file("tests//test.osu")
+            self.assertIs(cache.parse_file("tests//test.osu"), first)
+            cache.parse_file("tests//testv2.osu")
+            self.assertEqual((cache.stats.hits, cache.stats.misses, cache.stats.evictions), (1, 2, 1))
+
+            from_disk = cache.parse_file("tests//test.osu")
+            self.assertEqual(cache.stats.disk_hits, 1)
+            self.assertEqual(from_disk.max_combo, first.max_combo)
+
+            with mock.patch("osupyparser.osu.cache.PARSER_VERSION", -1):
+                fresh = BeatmapCache(directory= directory)
+                self.assertIsNone(fresh.get(first.md5))
+                self.assertEqual(fresh.stats.invalidations, 1)
+
+        # Beatmaps pickled before lazy caches were added still load.
+        state = dict(first.__dict__)
+        for name in ("_OsuFile__difficulty", "_OsuFile__slider_events", "_OsuFile__stacking"):
+            del state[name]
+        stale = OsuFile.__new__(OsuFile)
+        stale.__dict__.update(state)
+        old = pickle.loads(pickle.dumps(stale))
+        self.assertGreater(old.calculate_difficulty().stars, 0)
+        self.assertEqual(len(old.calculate_stacking()), len(old.hit_objects))
+        self.assertEqual(old.slider_events.max_combo(len(old.hit_objects)), old.max_combo)
+
+    def test_snapshot(self):
+        data = OsuFile("tests//testv2.osu").parse_file()
+        snapshot = OsuFile.from_snapshot(data.to_snapshot())
+        self.assertEqual(list(snapshot.hit_objects), list(data.hit_objects))
+        self.assertEqual(snapshot.timing_points, data.timing_points)
+        self.assertEqual(snapshot.colours, data.colours)
+        self.assertEqual((snapshot.md5, snapshot.max_combo, snapshot.title), (data.md5, data.max_combo, data.title))
+
+        with self.assertRaises(ValueError):
+            OsuFile.from_snapshot(b"OSU!" + bytes(8))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "testv2.snapshot")
+            with open(path, "wb") as stream:
+                stream.write(data.to_snapshot())
+            self.assertEqual(OsuFile.from_snapshot(path).hit_objects[5], data.hit_objects[5])
+
+    def test_beatmap_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            songs = os.path.join(directory, "Songs")
+            os.makedirs(os.path.join(songs, "set"))
+            shutil.copy("tests//test.osu", os.path.join(songs, "set", "test.osu"))
+            shutil.copy("tests//testv2.osu", os.path.join(songs, "testv2.osu"))
+            index_path = os.path.join(directory, "index.json")
+
+            index = BeatmapIndex(index_path)
+            self.assertEqual(index.scan(songs, workers= 2, executor= "thread").scanned, 2)
+            md5 = OsuFile("tests//testv2.osu").parse_file().md5
+            record = index.get(md5)
+            self.assertEqual((record.path, record.title, record.od), (os.path.join(songs, "testv2.osu"), "SAVE (Encore)", 9.5))
+
+            os.remove(os.path.join(songs, "set", "test.osu"))
+            index = BeatmapIndex(index_path)
+            stats = index.scan(songs, executor= "thread")
+            self.assertEqual((stats.scanned, stats.reused, stats.removed), (0, 1, 1))
+            self.assertIn(md5, index)
+            self.assertEqual(len(index), 1)
+
+            # Duplicate difficulty files share md5, removing one keeps the other.
+            shutil.copy("tests//testv2.osu", os.path.join(songs, "copy.osu"))
+            self.assertEqual(index.scan(songs, executor= "thread").scanned, 1)
+            index.remove(index.get(md5).path)
+            self.assertIn(md5, index)
+            self.assertEqual(len(index), 1)
+            index.remove(index.get(md5).path)
+            self.assertNotIn(md5, index)
+
+    def test_parse_async(self):
+        data = asyncio.run(OsuFile("tests//test.osu").parse_async(compact= True))
+        self.assertEqual(data.max_combo, 549)
+        self.assertEqual(data.md5, OsuFile("tests//test.osu").parse_file().md5)
+
+    def test_generated_beatmap(self):
+        data = generate_beatmap(objects= 500, sv_points= 50, seed= 3)
+        self.assertEqual(data, generate_beatmap(objects= 500, sv_points= 50, seed= 3))
+        beatmap = OsuFile.from_bytes(data)
+        self.assertEqual(len(beatmap.hit_objects), 500)
+        self.assertEqual(len(beatmap.timing_points), 51)
+        self.assertGreater(beatmap.max_combo, 500)
+
+    def test_profiler(self):
+        with ParseProfiler() as profiler:
+            OsuFile("tests//test.osu").parse_file(observer= profiler)
+        self.assertEqual(profiler.sections["hitobjects"]["lines"], 303)
+        self.assertEqual(profiler.counts["hit_objects"], 303)
+        self.assertEqual(profiler.counts["bytes"], os.path.getsize("tests//test.osu"))
+        self.assertIn("max_combo", profiler.stages)
+        self.assertGreater(profiler.total, 0)
+
+    def test_difficulty(self):
+        # Reference values from pyttanko 2.1.0.
+        data = OsuFile("tests//test.osu").parse_file()
+        attributes = data.calculate_difficulty()
+        self.assertAlmostEqual(attributes.stars, 6.265836, places= 5)
+        self.assertAlmostEqual(attributes.aim, 3.448215, places= 5)
+        self.assertAlmostEqual(attributes.speed, 2.187028, places= 5)
+        self.assertAlmostEqual(data.calculate_pp().total, 298.13472, places= 4)
+
+        mods = Mods.HIDDEN | Mods.HARDROCK | Mods.DOUBLE_TIME
+        self.assertAlmostEqual(data.calculate_difficulty(mods).stars, 9.373649, places= 5)
+        self.assertIs(data.calculate_difficulty(Mods.HARDROCK | Mods.DOUBLE_TIME), data.calculate_difficulty(mods))
+
+        score = data.calculate_pp(mods, 95.5, nmiss= 3)
+        self.assertEqual((score.n300, score.n100, score.n50), (284, 16, 0))
+        self.assertAlmostEqual(score.total, 755.311726, places= 4)
+
+        compact = OsuFile("tests//testv2.osu").parse_file(compact= True)
+        results = calculate_pp_many([(compact, 0, 100.0), (compact, Mods.EASY | Mods.HALF_TIME, 95.5, 3), (data, mods, 95.5, 3)])
+        self.assertAlmostEqual(results[0].total, 410.584784, places= 4)
+        self.assertAlmostEqual(results[1].total, 92.878233, places= 4)
+        self.assertEqual(results[2], score)
+
+        # Halves round up like pyttanko: 4.5 100s become 5, not 4.
+        self.assertEqual(hits_for_accuracy(50.0, 6), (1, 5, 0))
+        self.assertEqual(hits_for_accuracy(100.0, 6, 1), (5, 0, 0))
+
+    def test_slider_events(self):
+        for compact in (False, True):
+            data = OsuFile("tests//test.osu").parse_file(compact= compact)
+            events = data.slider_events
+            self.assertIsInstance(events, SliderEvents)
+            self.assertEqual((events.sliders, len(events)), (141, 387))
+            self.assertEqual(events.max_combo(len(data.hit_objects)), data.max_combo)
+            self.assertEqual(list(events.kind[:5]), [HEAD, TICK, REPEAT, TICK, TAIL])
+            self.assertEqual(list(events.events_of(0)), [0, 1, 2, 3, 4])
+            self.assertEqual(len(events.events_of(6)), 0)
+
+            slider = data.hit_objects[0]
+            self.assertEqual(events.time[0], slider.start_time)
+            self.assertEqual((events.x[0], events.y[0]), (slider.pos.x, slider.pos.y))
+            # Repeat sits at path end, tail is judged 36ms before slider end.
+            self.assertEqual(events.progress[2], 1.0)
+            self.assertEqual(events.time[4], slider.end_time - 36)
+
+        for data in (OsuFile("tests//testv2.osu").parse_file(), OsuFile("tests//testLazerUTF8BOM.osu").parse_file(compact= True)):
+            self.assertEqual(data.slider_events.max_combo(len(data.hit_objects)), data.max_combo)
+
+        # Old maps space ticks ignoring SV, but still within SV scaled duration.
+        for version, times in ((7, [1000, 1250, 1500, 1714]), (14, [1000, 1500, 1714])):
+            data = OsuFile.from_lines([
+                f"osu file format v{version}",
+                "[Difficulty]", "SliderMultiplier:1", "SliderTickRate:1",
+                "[TimingPoints]", "0,500,4,2,0,60,1,0", "0,-50,4,2,0,60,0,0",
+                "[HitObjects]", "100,100,1000,2,0,L|400:100,1,300",
+            ])
+            self.assertEqual(data.hit_objects[0].end_time, 1750)
+            self.assertEqual(list(data.slider_events.time), times)
+            self.assertEqual(data.max_combo, len(times))
+
+    def test_stacking(self):
+        for version in (5, 14):
+            data = OsuFile.from_lines([
+                f"osu file format v{version}",
+                "[General]", "StackLeniency: 0.7",
+                "[Difficulty]", "CircleSize:4", "ApproachRate:9", "SliderMultiplier:1", "SliderTickRate:1",
+                "[TimingPoints]", "0,500,4,2,0,60,1,0",
+                "[HitObjects]",
+                "100,100,1000,1,0,0:0:0:0:",
+                "100,100,1100,1,0,0:0:0:0:",
+                "100,100,1200,1,0,0:0:0:0:",
+                "300,300,2000,2,0,L|400:300,1,100",
+                "400,300,2600,1,0,0:0:0:0:",
+                "100,100,9000,1,0,0:0:0:0:",
+            ])
+            stacking = data.calculate_stacking()
+            # Stacks under slider end go the other way, objects far apart in time don't stack.
+            self.assertEqual(list(stacking.heights), [2, 1, 0, 0, -1, 0])
+            self.assertAlmostEqual(stacking.offset, -3.648)
+            self.assertAlmostEqual(stacking.x[0], 100 - 2 * 3.648)
+            self.assertAlmostEqual(stacking.y[4], 300 + 3.648)
+
+        # Old maps restart the stack window from the start of the last stacked object, not its end.
+        data = OsuFile.from_lines([
+            "osu file format v5",
+            "[General]", "StackLeniency: 0.7",
+            "[Difficulty]", "CircleSize:4", "ApproachRate:9", "SliderMultiplier:1", "SliderTickRate:1",
+            "[TimingPoints]", "0,500,4,2,0,60,1,0",
+            "[HitObjects]",
+            "100,100,1000,1,0,0:0:0:0:",
+            "100,100,1100,2,0,L|100:300,1,200",
+            "100,100,2300,1,0,0:0:0:0:",
+        ])
+        self.assertEqual(list(data.calculate_stacking().heights), [1, 1, 0])
+
+        data = OsuFile("tests//test.osu").parse_file()
+        stacking = data.calculate_stacking()
+        self.assertIs(data.calculate_stacking(Mods.DOUBLE_TIME), stacking)
+        self.assertEqual(list(stacking.heights), list(OsuFile("tests//test.osu").parse_file(compact= True).calculate_stacking().heights))
+        self.assertEqual(sum(1 for height in stacking.heights if height), 26)
+
+    def test_mod_views(self):
+        data = OsuFile("tests//test.osu").parse_file()
+        view = data.with_mods(Mods.HARDROCK | Mods.DOUBLE_TIME)
+        self.assertEqual((round(view.ar, 2), round(view.cs, 2), view.time_scale), (11.0, 5.46, 1 / 1.5))
+        self.assertEqual(view.title, data.title)
+        self.assertEqual(view.hit_objects[0].pos.y, 73) # Hit objects are never touched.
+        self.assertEqual(view.position_of(0), (220, 311))
+        self.assertEqual(list(view.y[:3]), [311, 164, 134])
+        self.assertAlmostEqual(view.start_times[0], 1240 / 1.5)
+        self.assertEqual(view.start_time_of(0), view.start_times[0])
+        self.assertEqual(view.calculate_difficulty(), data.calculate_difficulty(Mods.HARDROCK | Mods.DOUBLE_TIME))
+
+        variants = mod_variants(data, [Mods.NOMOD, Mods.HARDROCK, Mods.DOUBLE_TIME, Mods.HIDDEN | Mods.DOUBLE_TIME, Mods.HARDROCK | Mods.DOUBLE_TIME])
+        self.assertIs(variants[Mods.NOMOD].start_times, variants[Mods.HARDROCK].start_times)
+        self.assertIs(variants[Mods.DOUBLE_TIME].start_times, variants[Mods.HIDDEN | Mods.DOUBLE_TIME].start_times)
+        self.assertIs(variants[Mods.HARDROCK].y, variants[Mods.HARDROCK | Mods.DOUBLE_TIME].y)
+        self.assertEqual(list(variants[Mods.NOMOD].y[:3]), [73, 220, 250])
+
+        # Views of non compact maps only pack hit objects once columns are read.
+        with mock.patch.object(HitObjectStore, "from_objects", wraps= HitObjectStore.from_objects) as from_objects:
+            view = data.with_mods(Mods.HARDROCK)
+            self.assertAlmostEqual(view.od, min(10.0, data.od * 1.4))
+            from_objects.assert_not_called()
+            self.assertEqual(list(view.y[:3]), [311, 164, 134])
+            from_objects.assert_called_once()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,25 @@
 from osupyparser import ReplayFile
+from osupyparser import OsuFile
+from osupyparser import ReplayFrames
+from osupyparser import parse_many
+from osupyparser import parse_many_async
+from osupyparser import ParseProfiler
+from osupyparser.osr.iobytes import BinaryRotator
+from osupyparser import OsuReplayFrame
+from osupyparser import ManiaReplayFrame
+from osupyparser import judge_replay
+from osupyparser import Mods
+from benchmarks.generators import generate_replay
+from benchmarks.generators import generate_autoplay
 import unittest
+import tempfile
+import os
+from unittest import mock
+from array import array
 import time
+import struct
+import io
+import asyncio
 
 
 class TestReplay(unittest.TestCase):
@@ -14,6 +33,281 @@ class TestReplay(unittest.TestCase):
             print(f"{d}: {e}")
         print(f"Parsed in {round((end - start) * 1000, 2)}ms")
 
+    def test_columnar_frames(self):
+        data = ReplayFile.from_file("tests//test.osr")
+        frames = data.frames
+        self.assertIsInstance(frames, ReplayFrames)
+        self.assertIsInstance(frames[0], OsuReplayFrame)
+        self.assertEqual(frames[-1].delta, frames.delta[-1])
+        self.assertEqual(frames.time[-1], sum(frames.delta))
+        self.assertEqual(frames.column("x").format, "d")
+        self.assertEqual(len(list(frames)), len(frames))
+
+    def test_frames_from_text(self):
+        frames = ReplayFrames(3)
+        seed = frames.extend_text("0|5|0|0,10|3|0|0,-12345|0|0|42,", 20210809)
+        self.assertEqual(seed, 42)
+        self.assertEqual(list(frames), [ManiaReplayFrame(0, 5), ManiaReplayFrame(10, 3)])
+        self.assertEqual(list(frames.time), [0, 10])
+
+    def test_iter_frames(self):
+        data = ReplayFile.from_file("tests//test.osr")
+        frames = list(data.frames)
+
+        self.assertEqual(list(ReplayFile.iter_frames("tests//test.osr")), frames)
+
+        first = next(ReplayFile.iter_frames("tests//test.osr"))
+        self.assertEqual(first, frames[0])
+
+        batches = list(ReplayFile.iter_frames("tests//test.osr", batches= True))
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(batches[-1].time[-1], data.frames.time[-1])
+        self.assertEqual([ b.seed for b in batches if b.seed is not None ], [data.seed])
+
+        # Seed is not a frame, it is kept on the replay header instead.
+        header = ReplayFile()
+        with open("tests//test.osr", "rb") as stream:
+            streamed = list(ReplayFile.iter_frames(stream.read(), replay= header))
+        self.assertEqual(streamed, frames)
+        self.assertEqual((header.player_name, header.seed), (data.player_name, data.seed))
+        self.assertEqual(header.lzma_length, data.lzma_length)
+
+    def test_lazy_frames(self):
+        data = ReplayFile.from_file("tests//test.osr", frames= "lazy")
+        self.assertFalse(data.frames.loaded)
+        self.assertEqual(data.score_id, 517048416)
+        self.assertEqual(len(data.frames), 14563)
+        self.assertTrue(data.frames.loaded)
+        self.assertEqual(data.seed, 718104)
+
+    def test_skip_frames(self):
+        data = ReplayFile.from_file("tests//test.osr", frames= "skip")
+        self.assertEqual(len(data.frames), 0)
+        self.assertEqual(data.score_id, 517048416)
+        self.assertEqual(data.lzma_length, 65921)
+        self.assertRaises(ValueError, ReplayFile.from_file, "tests//test.osr", frames= "none")
+
+    def test_independent_instances(self):
+        first = ReplayFile.from_file("tests//test.osr")
+        second = ReplayFile.from_file("tests//test.osr", frames= "skip")
+        self.assertIsNot(first, second)
+        self.assertIsInstance(first, ReplayFile)
+        self.assertEqual(len(first.frames), 14563)
+        self.assertEqual(len(second.frames), 0)
+
+    def test_parse_many(self):
+        paths = ["tests//test.osr"] * 4
+        results = list(parse_many(paths, workers= 2))
+        self.assertEqual([ path for path, _ in results ], paths)
+        self.assertEqual(len({ id(replay) for _, replay in results }), 4)
+        self.assertTrue(all(len(replay.frames) == 14563 for _, replay in results))
+
+        unordered = list(parse_many(paths, workers= 2, executor= "process", ordered= False, frames= "lazy"))
+        self.assertEqual(len(unordered), 4)
+        self.assertTrue(all(replay.seed == 718104 for _, replay in unordered))
+
+    def test_from_mmap(self):
+        data = ReplayFile.from_mmap("tests//test.osr")
+        self.assertEqual(data.player_name, "lenforiee")
+        self.assertEqual(data.n300, 871)
+        self.assertEqual(data.max_combo, 294)
+        self.assertEqual(len(data.frames), 14563)
+
+        with open("tests//test.osr", "rb") as stream:
+            data = ReplayFile.from_mmap(stream, frames= "lazy")
+        self.assertEqual(data.seed, 0)
+        self.assertEqual(len(data.frames), 14563)
+
+        with open("tests//test.osr", "rb") as stream:
+            truncated = stream.read(100)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "truncated.osr")
+            with open(path, "wb") as stream:
+                stream.write(truncated)
+            with mock.patch.object(BinaryRotator, "close", autospec= True) as close:
+                self.assertRaises(struct.error, ReplayFile.from_mmap, path)
+            close.assert_called_once()
+
+    def test_binary_rotator(self):
+        reader = BinaryRotator(struct.pack("<dfhB", 1.5, 0.25, -2, 0) + b"\x0b\x03abc")
+        self.assertEqual(reader.read_f64(), 1.5)
+        self.assertEqual(reader.read_f32(), 0.25)
+        self.assertEqual(reader.read_i16(), -2)
+        self.assertEqual(reader.read_string(), "")
+        self.assertEqual(reader.read_string(), "abc")
+
+        reader = BinaryRotator(b"\x00\x0b\x00\x0b\x01a")
+        self.assertEqual([ reader.read_optional_string() for _ in range(3) ], [None, "", "a"])
+
+    def test_snapshot(self):
+        data = ReplayFile.from_file("tests//test.osr")
+        snapshot = ReplayFile.from_snapshot(data.to_snapshot())
+        self.assertEqual((snapshot.player_name, snapshot.score_id, snapshot.seed), (data.player_name, 517048416, 718104))
+        self.assertEqual(list(snapshot.frames), list(data.frames))
+        self.assertEqual(snapshot.frames.time[-1], 205885)
+
+        with self.assertRaises(ValueError):
+            OsuFile.from_snapshot(data.to_snapshot())
+
+    def test_to_bytes(self):
+        data = ReplayFile.from_file("tests//test.osr")
+        encoded = data.to_bytes()
+        replay = ReplayFile.from_bytes(encoded)
+        self.assertEqual(encoded[:data.lzma_offset - 4], open("tests//test.osr", "rb").read()[:data.lzma_offset - 4])
+        self.assertEqual((replay.player_name, replay.score_id, replay.seed), ("lenforiee", 517048416, 718104))
+        self.assertEqual(list(replay.frames), list(data.frames))
+        self.assertEqual(replay.to_bytes(), encoded)
+
+        stream = io.BytesIO()
+        replay.write(stream, preset= 9)
+        self.assertEqual(len(ReplayFile.from_bytes(stream.getvalue()).frames), 14563)
+
+        with self.assertRaises(ValueError):
+            ReplayFile.from_file("tests//test.osr", frames= "skip").to_bytes()
+
+        # Empty strings keep their encoding, absent (0x00) or present (0x0b 0x00).
+        data.replay_md5 = ""
+        absent = data.to_bytes()
+        data.empty_strings = {"replay_md5"}
+        present = data.to_bytes()
+        self.assertEqual(len(present), len(absent) + 1)
+        for encoded in (absent, present):
+            replay = ReplayFile.from_bytes(encoded)
+            self.assertEqual(replay.replay_md5, "")
+            self.assertEqual(replay.to_bytes(), encoded)
+            self.assertEqual(ReplayFile.from_snapshot(replay.to_snapshot()).to_bytes(), encoded)
+
+        # Frame data holding only the seed frame decodes to no frames, but is still written.
+        data.frames = ReplayFrames(0)
+        replay = ReplayFile.from_bytes(data.to_bytes())
+        self.assertEqual((len(replay.frames), replay.seed), (0, 718104))
+        self.assertEqual(replay.to_bytes(), data.to_bytes())
+
+    def test_async(self):
+        async def parse():
+            replay = await ReplayFile.from_file_async("tests//test.osr")
+            results = [ result async for result in parse_many_async(["tests//test.osr"] * 3, concurrency= 2, frames= "skip") ]
+            return replay, results
+
+        replay, results = asyncio.run(parse())
+        self.assertEqual((replay.player_name, replay.seed, len(replay.frames)), ("lenforiee", 718104, 14563))
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result.n300 == 871 for _, result in results))
+
+    def test_generated_replays(self):
+        for mode in range(4):
+            data = ReplayFile.from_bytes(generate_replay(mode, duration= 10000, seed= 7))
+            self.assertEqual((data.mode, data.seed, len(data.frames)), (mode, 7, 625))
+            self.assertEqual(data.frames.time[-1], 10000)
+
+    def test_profiler(self):
+        profiler = ParseProfiler()
+        data = ReplayFile.from_file("tests//test.osr", frames= "lazy", observer= profiler)
+        self.assertNotIn("frames", profiler.counts)
+        self.assertEqual(len(data.frames), 14563)
+        self.assertEqual(profiler.counts["frames"], 14563)
+        self.assertEqual(profiler.counts["bytes_compressed"], 65921)
+        self.assertEqual(set(profiler.stages), {"header", "lzma", "frames"})
+
+    def test_timeline(self):
+        data = ReplayFile.from_file("tests//test.osr")
+        timeline = data.timeline
+        self.assertIs(data.timeline, timeline)
+        # Two placeholder frames and the skip frame only count towards time.
+        self.assertEqual((len(timeline), timeline.indices[0], timeline.start, timeline.end), (14560, 3, -1384, 205885))
+        self.assertEqual(timeline.frame_at(-1384), data.frames[3])
+        self.assertIsNone(timeline.frame_at(-1385))
+        self.assertEqual(timeline.keys_at(-1384), 11)
+        self.assertEqual(timeline.position_at(-5000), (272.0, 192.4444))
+        self.assertEqual(timeline.position_at(0), (359.11115, 192.0))
+
+        frames = timeline.frames_between(1000, 2000)
+        self.assertEqual(len(frames), 68)
+        self.assertTrue(all(1000 <= data.frames.time[i] <= 2000 for i in timeline.indices_between(1000, 2000)))
+        xs, ys = timeline.positions_at([-5000, 0])
+        self.assertEqual((xs, ys), ([272.0, 359.11115], [192.4444, 192.0]))
+
+    def test_key_intervals(self):
+        data = ReplayFile.from_file("tests//test.osr")
+        intervals = data.key_intervals()
+        self.assertEqual(intervals.names, ("M1", "M2", "K1", "K2", "smoke"))
+        self.assertEqual([ len(starts) for starts in intervals.starts ], [32, 0, 539, 526, 0])
+        self.assertEqual(list(intervals.starts[2][:3]), [-1335, -1183, 369])
+        self.assertEqual(list(intervals.hold_durations("K1")[:3]), [129, 112, 218])
+
+        stats = intervals.stats("K2")
+        self.assertEqual((stats.presses, stats.min_hold, stats.max_hold), (526, 5, 2222))
+        self.assertEqual(intervals.stats("smoke").presses, 0)
+        self.assertEqual(intervals.presses, 32 + 539 + 526)
+        self.assertGreater(intervals.key_rate, stats.key_rate)
+
+        for mode in range(4):
+            data = ReplayFile.from_bytes(generate_replay(mode, duration= 10000, seed= 7))
+            intervals = data.key_intervals()
+            self.assertTrue(all(len(starts) == len(ends) for starts, ends in zip(intervals.starts, intervals.ends)))
+            self.assertTrue(all(start <= end for key in range(len(intervals)) for start, end in zip(*intervals.intervals(key))))
+        self.assertEqual(intervals.names[0], "column1")
+
+    def test_judgement(self):
+        beatmap = OsuFile("tests//test.osu").parse_file()
+        for mods in (Mods.NOMOD, Mods.HARDROCK):
+            replay = generate_autoplay(beatmap, mods)
+            result = judge_replay(replay, beatmap)
+            self.assertEqual((result.n300, result.nmiss, result.max_combo), (303, 0, 549))
+
+        # Unflipped play with HR misses most objects.
+        replay.mods = Mods.NOMOD
+        self.assertGreater(judge_replay(replay, beatmap).nmiss, 200)
+
+        replay = generate_autoplay(beatmap, Mods.HARDROCK, offset= 50)
+        self.assertEqual(replay.frames.time[-1], sum(replay.frames.delta))
+        result = judge_replay(replay, beatmap)
+        self.assertEqual(set(result.hit_errors), {0, 50}) # Spinners have no hit error.
+        self.assertEqual((result.n300, result.n100, result.nmiss), (133, 170, 0))
+        self.assertEqual(result.mismatches(replay)["n100"], (0, 170))
+
+    def test_judgement_hand_built(self):
+        # OD 5: 50/100/150ms windows, CS 4: 36.48 radius, slider ticks once at 5500.
+        beatmap = OsuFile.from_lines([
+            "osu file format v14",
+            "[Difficulty]", "CircleSize:4", "OverallDifficulty:5", "ApproachRate:9", "SliderMultiplier:1", "SliderTickRate:1",
+            "[TimingPoints]", "0,500,4,2,0,60,1,0",
+            "[HitObjects]",
+            "100,100,1000,1,0,0:0:0:0:",
+            "200,100,2000,1,0,0:0:0:0:",
+            "300,100,3000,1,0,0:0:0:0:",
+            "400,100,4000,1,0,0:0:0:0:",
+            "100,300,5000,2,0,L|300:300,1,200",
+            "400,300,7000,1,0,0:0:0:0:",
+        ])
+        # (time, x, y, keys)
+        frames = [
+            (0, 0, 0, 0),
+            (1000, 100, 100, 5), (1010, 100, 100, 0), # 300
+            (2080, 200, 100, 10), (2090, 200, 100, 0), # 100
+            (3130, 300, 100, 5), (3140, 300, 100, 0), # 50
+            (4000, 400, 200, 10), (4010, 400, 200, 0), # Press outside of circle, miss.
+            (5000, 100, 300, 5), (5450, 100, 0, 5), # Slider head, cursor leaves before tick.
+            (5900, 300, 300, 5), (6100, 300, 300, 0), # Back in time for tail.
+            (7000, 400, 300, 10), (7010, 400, 300, 0), # 300
+        ]
+        times = [ frame[0] for frame in frames ]
+        replay = ReplayFile()
+        replay.frames = ReplayFrames.from_columns(0, {
+            "delta": array("i", (b - a for a, b in zip([0] + times, times))),
+            "x": array("d", (frame[1] for frame in frames)),
+            "y": array("d", (frame[2] for frame in frames)),
+            "keys": array("i", (frame[3] for frame in frames)),
+            "time": array("q", times),
+        })
+
+        result = judge_replay(replay, beatmap)
+        self.assertEqual(list(result.judgements), [300, 100, 50, 0, 100, 300])
+        self.assertEqual(list(result.hit_errors), [0, 80, 130, 0, 0, 0])
+        self.assertEqual((result.n300, result.n100, result.n50, result.nmiss), (2, 2, 1, 1))
+        # Missed circle and slider tick break combo: 3 circles, then slider tail and last circle.
+        self.assertEqual(result.max_combo, 3)
+
 
 if __name__ == '__main__':
     unittest.main()